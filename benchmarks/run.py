@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks of the docker wrapper. The commands are run against a fake docker executable that
+emulates containers with directories and the local bash, thus the results show the overhead of
+the wrapper and of spawning processes without a docker daemon::
+
+    python -m benchmarks.run --repeat 20 --sizes 1024,1048576 --json results.json
+    python -m benchmarks.run --baseline results.json --tolerance 0.25 read_file write_file
+
+It exits with 1 if the p50 latency of a benchmark regressed more than the tolerance compared to
+the baseline. CI compares with ``benchmarks/baseline.json``, see ``tox -e bench``. The baseline
+is refreshed with ``python -m benchmarks.run --json benchmarks/baseline.json`` when a change is
+expected to make a benchmark slower or faster.
+"""
+import argparse
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+
+from docker.manager import Docker
+from docker.metrics import percentile
+
+BIN_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bin')
+
+BENCHMARKS = OrderedDict()
+
+
+def benchmark(name, sized=False, **docker_kwargs):
+    """
+    Registers a benchmark. The function gets a started docker manager and the payload size, and
+    returns the operation that is timed.
+    """
+
+    def register(func):
+        BENCHMARKS[name] = (func, sized, docker_kwargs)
+        return func
+
+    return register
+
+
+def payload(size):
+    return (b'0123456789abcdef\n' * (size // 17 + 1))[:size]
+
+
+@benchmark('start_stop')
+def start_stop(docker, size):
+    return lambda: Docker(name_prefix='bench').start().stop()
+
+
+@benchmark('run')
+def run(docker, size):
+    return lambda: docker.run('true')
+
+
+@benchmark('run_argv', argv=True)
+def run_argv(docker, size):
+    return lambda: docker.run('true')
+
+
+@benchmark('run_session', session=True)
+def run_session(docker, size):
+    return lambda: docker.run('true')
+
+
+@benchmark('run_many')
+def run_many(docker, size):
+    return lambda: docker.run_many(['true'] * 10)
+
+
+@benchmark('write_file', sized=True)
+def write_file(docker, size):
+    content = payload(size).decode('utf-8')
+    return lambda: docker.write_file('file', content)
+
+
+@benchmark('read_file', sized=True)
+def read_file(docker, size):
+    docker.write_file('file', payload(size).decode('utf-8'))
+    return lambda: docker.read_file('file')
+
+
+@benchmark('write_file_from', sized=True)
+def write_file_from(docker, size):
+    content = payload(size)
+    return lambda: docker.write_file_from('file', io.BytesIO(content))
+
+
+@benchmark('read_file_to', sized=True)
+def read_file_to(docker, size):
+    docker.write_file('file', payload(size).decode('utf-8'))
+    return lambda: docker.read_file_to('file', io.BytesIO())
+
+
+@benchmark('put_files', sized=True)
+def put_files(docker, size):
+    content = payload(size)
+    return lambda: docker.put_files({'file': content}, 'directory')
+
+
+@benchmark('get_files', sized=True)
+def get_files(docker, size):
+    docker.put_files({'file': payload(size)}, 'directory')
+    return lambda: docker.get_files(['file'], 'directory')
+
+
+@benchmark('list_files')
+def list_files(docker, size):
+    docker.run('mkdir directory && touch directory/file{1..100}')
+    return lambda: docker.list_files('directory')
+
+
+@benchmark('walk')
+def walk(docker, size):
+    docker.run('mkdir -p directory/{1..10} && touch directory/{1..10}/file{1..10}')
+    return lambda: docker.walk('directory')
+
+
+@benchmark('sync_directory', sized=True)
+def sync_directory(docker, size):
+    source = tempfile.mkdtemp(dir=os.environ['FAKE_DOCKER_ROOT'])
+    for index in range(100):
+        with open(os.path.join(source, 'file{0}'.format(index)), 'wb') as fd:
+            fd.write(payload(size))
+    docker.sync_directory(source, 'directory')
+    counter = []
+
+    def resync():
+        counter.append(None)
+        with open(os.path.join(source, 'file0'), 'wb') as fd:
+            fd.write(payload(size - len(counter) % 2))
+        docker.sync_directory(source, 'directory')
+
+    return resync
+
+
+def measure(name, size, repeat):
+    """
+    Runs the benchmark in a new container.
+
+    :return: The latencies in seconds and throughput of the benchmark.
+    :rtype: dict
+    """
+    func, sized, docker_kwargs = BENCHMARKS[name]
+    with Docker(name_prefix='bench', **docker_kwargs) as docker:
+        operation = func(docker, size)
+        operation()
+        durations = []
+        for _ in range(repeat):
+            started = time.time()
+            operation()
+            durations.append(time.time() - started)
+
+    durations.sort()
+    total = sum(durations)
+    return OrderedDict([
+        ('name', name),
+        ('size', size if sized else None),
+        ('count', repeat),
+        ('mean', total / repeat),
+        ('p50', percentile(durations, 50)),
+        ('p99', percentile(durations, 99)),
+        ('ops', repeat / total if total else None),
+        ('throughput', size * repeat / total if sized and total else None),
+    ])
+
+
+def run_benchmarks(names, sizes, repeat):
+    """
+    Runs the benchmarks against the fake docker executable.
+
+    :rtype: list
+    """
+    root = tempfile.mkdtemp()
+    environment = dict(os.environ)
+    os.environ['FAKE_DOCKER_ROOT'] = root
+    os.environ['PATH'] = os.pathsep.join([BIN_DIRECTORY, os.environ.get('PATH', '')])
+    try:
+        results = []
+        for name in names:
+            for size in (sizes if BENCHMARKS[name][1] else [None]):
+                results.append(measure(name, size, repeat))
+        return results
+    finally:
+        os.environ.clear()
+        os.environ.update(environment)
+        shutil.rmtree(root)
+
+
+def find_regressions(results, baseline, tolerance):
+    """
+    :return: The results whose p50 latency is more than tolerance slower than the baseline.
+    :rtype: list
+    """
+    previous = dict(((result['name'], result['size']), result) for result in baseline)
+    regressions = []
+    for result in results:
+        old = previous.get((result['name'], result['size']))
+        if old is not None and result['p50'] > old['p50'] * (1 + tolerance):
+            regressions.append((result, old))
+    return regressions
+
+
+def format_results(results):
+    lines = ['{0:<18}{1:>10}{2:>8}{3:>12}{4:>12}{5:>10}{6:>10}'.format(
+        'benchmark', 'size', 'count', 'p50 (ms)', 'p99 (ms)', 'ops/s', 'MB/s'
+    )]
+    for result in results:
+        lines.append('{0:<18}{1:>10}{2:>8}{3:>12.2f}{4:>12.2f}{5:>10.1f}{6:>10}'.format(
+            result['name'],
+            result['size'] or '-',
+            result['count'],
+            result['p50'] * 1000,
+            result['p99'] * 1000,
+            result['ops'] or 0,
+            '{0:.1f}'.format(result['throughput'] / 1e6) if result['throughput'] else '-'
+        ))
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmarks of the docker wrapper.')
+    parser.add_argument('benchmarks', nargs='*',
+                        help='The benchmarks to run, all if not given: {0}.'.format(
+                            ', '.join(BENCHMARKS)))
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--sizes', default='1024,1048576',
+                        help='Comma separated payload sizes in bytes.')
+    parser.add_argument('--json', help='Write the results to this file.')
+    parser.add_argument('--baseline', help='Compare the results with this file.')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.benchmarks if name not in BENCHMARKS]
+    if unknown:
+        parser.error('unknown benchmarks: {0}'.format(', '.join(unknown)))
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    results = run_benchmarks(args.benchmarks or list(BENCHMARKS), sizes, args.repeat)
+    print(format_results(results))
+
+    if args.json:
+        with open(args.json, 'w') as fd:
+            json.dump(results, fd, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as fd:
+            regressions = find_regressions(results, json.load(fd), args.tolerance)
+        for result, old in regressions:
+            print('Regression in {0} ({1}): p50 {2:.2f} ms, was {3:.2f} ms'.format(
+                result['name'], result['size'] or '-', result['p50'] * 1000, old['p50'] * 1000
+            ))
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
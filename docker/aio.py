@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import logging
+
+from docker import errors, reaper
+from docker.helpers import ProcessResult
+from docker.manager import Docker
+
+logger = logging.getLogger(__name__)
+
+
+async def execute(cmd, stdin=''):
+    """
+    Runs the command in an asyncio subprocess. It is the asyncio counterpart of
+    :func:`docker.helpers.execute`.
+
+    :rtype: ProcessResult
+    """
+    result = ProcessResult(command=cmd)
+
+    logger.debug('Running command: "{0}"'.format(cmd))
+    pipes = dict(
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        close_fds=True
+    )
+    if isinstance(cmd, list):
+        process = await asyncio.create_subprocess_exec(*cmd, **pipes)
+    else:
+        process = await asyncio.create_subprocess_shell(cmd, **pipes)
+
+    if not isinstance(stdin, bytes):
+        stdin = stdin.encode('utf-8')
+    (stdout, stderr) = await process.communicate(stdin)
+    result.out_bytes = stdout
+    result.err_bytes = stderr
+    result.return_code = process.returncode
+    logger.debug('Finished running of: {0!r}'.format(result))
+    return result
+
+
+class AsyncDocker(object):
+    """
+    Asyncio counterpart of :class:`docker.manager.Docker`. All commands are run in asyncio
+    subprocesses, thus a single event loop can drive many containers at once.
+    """
+
+    def __init__(self, *args, **kwargs):
+        """
+        Creates an asyncio docker manager. It accepts the same arguments as
+        :class:`docker.manager.Docker`, except ``session`` and ``transport`` which are blocking.
+        """
+        self.docker = Docker(*args, **kwargs)
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc_value, exc_traceback):
+        await self.stop()
+
+    @property
+    def container_name(self):
+        return self.docker.container_name
+
+    async def run(self, command, working_directory='', stdin='', login=False, tty=False):
+        """
+        Runs the command with docker exec in the given working directory.
+
+        :rtype: ProcessResult
+        """
+        return await execute(
+            self.docker._get_exec_command(command, working_directory, login, tty),
+            stdin
+        )
+
+    async def read_file(self, path):
+        """
+        Reads the content of the file on the given path.
+
+        :rtype: str
+        :raises DockerFileNotFoundError: If given an invalid path
+        :raises DockerWrapperBaseError: For other errors
+        """
+        path = self.docker._get_working_directory(path)
+        result = await self.run('cat {0}'.format(path))
+        self.docker._check_result(result, path)
+        return result.out
+
+    async def write_file(self, path, content, append=False):
+        """
+        Write the given content to path.
+        Overwrites the file if append is set to False.
+
+        :rtype: ProcessResult
+        """
+        path = self.docker._get_working_directory(path)
+        modifier = '>>' if append else '>'
+        return await self.run('cat {0} {1}'.format(modifier, path), stdin=content)
+
+    async def file_exist(self, path):
+        """
+        :rtype: bool
+        """
+        path = self.docker._get_working_directory(path)
+        return (await self.run('test -f {0}'.format(path))).return_code == 0
+
+    async def directory_exist(self, path):
+        """
+        :rtype: bool
+        """
+        path = self.docker._get_working_directory(path)
+        return (await self.run('test -d {0}'.format(path))).return_code == 0
+
+    async def list_files(self, path, include_hidden=False):
+        """
+        List files on a given path.
+
+        :rtype: list
+        :raises DockerFileNotFoundError: If given an invalid path
+        :raises DockerWrapperBaseError: For other errors
+        """
+        path = self.docker._get_working_directory(path)
+        result = await self.run(self.docker._get_list_files_command(include_hidden), path)
+        self.docker._check_result(result, path)
+        return self.docker._parse_files(result.out)
+
+    async def list_directories(self, path, include_trailing_slash=True):
+        """
+        List directories on a given path.
+
+        :rtype: list
+        :raises DockerFileNotFoundError: If given an invalid path
+        :raises DockerWrapperBaseError: For other errors
+        """
+        path = self.docker._get_working_directory(path)
+        result = await self.run('ls -dm */', path)
+        self.docker._check_result(result, path)
+        return self.docker._parse_directories(result.out, include_trailing_slash)
+
+    async def start(self):
+        """
+        Starts a container based on the parameters passed to __init__.
+
+        :return: The docker object
+        """
+        reaper.register(self.container_name)
+        result = await execute(self.docker._get_start_command())
+
+        if not result.succeeded:
+            raise errors.DockerUnavailableError(
+                'Starting the docker container failed.\n{0}'.format(result.err)
+            )
+
+        return self
+
+    async def stop(self):
+        """
+        Stops the container started by this class instance.
+
+        :return: The docker object
+        """
+        await execute('docker rm -f {0}'.format(self.container_name))
+        reaper.unregister(self.container_name)
+        return self
@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+import json
+import logging
+import socket
+import struct
+import threading
+from collections import deque
+
+from docker import errors
+
+try:
+    from http.client import HTTPConnection, HTTPException
+    from urllib.parse import quote, urlencode
+except ImportError:
+    from urllib import quote, urlencode
+
+    from httplib import HTTPConnection, HTTPException
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOCKET_PATH = '/var/run/docker.sock'
+READ_SIZE = 65536
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class UnixHTTPConnection(HTTPConnection):
+    """
+    A http connection that talks to a unix socket instead of a tcp socket.
+    """
+
+    def __init__(self, socket_path, timeout=None):
+        HTTPConnection.__init__(self, 'localhost')
+        self.socket_path = socket_path
+        self.socket_timeout = timeout
+
+    def connect(self):
+        self.sock = connect_unix_socket(self.socket_path, self.socket_timeout)
+
+
+def connect_unix_socket(socket_path, timeout=None):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(socket_path)
+    except socket.error as error:
+        sock.close()
+        raise errors.DockerUnavailableError(
+            'Could not connect to {0}: {1}'.format(socket_path, error)
+        )
+    return sock
+
+
+class ConnectionPool(object):
+    """
+    Keeps idle keep-alive connections to a unix socket so they can be reused by later requests.
+    """
+
+    def __init__(self, socket_path, maxsize=10, timeout=None):
+        self.socket_path = socket_path
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self._idle = deque()
+        self._lock = threading.Lock()
+
+    def get(self):
+        """
+        :return: An idle connection if there is one and otherwise a new connection, together with
+                 a flag telling whether the connection has been used before.
+        :rtype: tuple
+        """
+        with self._lock:
+            if self._idle:
+                return self._idle.pop(), True
+        return UnixHTTPConnection(self.socket_path, self.timeout), False
+
+    def put(self, connection):
+        with self._lock:
+            if len(self._idle) < self.maxsize:
+                self._idle.append(connection)
+                return
+        connection.close()
+
+    def clear(self):
+        with self._lock:
+            while self._idle:
+                self._idle.pop().close()
+
+    def request(self, method, path, body=None, headers=None):
+        """
+        Sends a request on a pooled connection and reads the whole response. Requests on reused
+        connections are retried once on a fresh connection since the daemon might have closed
+        the idle connection.
+
+        :return: The status code and the body of the response.
+        :rtype: tuple
+        """
+        while True:
+            connection, reused = self.get()
+            try:
+                connection.request(method, path, body, headers or {})
+                response = connection.getresponse()
+                data = response.read()
+            except (socket.error, HTTPException):
+                connection.close()
+                if reused:
+                    continue
+                raise
+
+            if response.will_close:
+                connection.close()
+            else:
+                self.put(connection)
+            return response.status, data
+
+
+def get_pool(socket_path=DEFAULT_SOCKET_PATH, maxsize=10, timeout=None):
+    """
+    Gets the connection pool for the given socket. The pools are shared between all clients in
+    the process.
+
+    :rtype: ConnectionPool
+    """
+    with _pools_lock:
+        if socket_path not in _pools:
+            _pools[socket_path] = ConnectionPool(socket_path, maxsize, timeout)
+        return _pools[socket_path]
+
+
+def demultiplex(data):
+    """
+    Splits a multiplexed stream from the attach and exec endpoints into stdout and stderr.
+    Each frame starts with an eight byte header containing the stream type and the size.
+
+    :param data: The raw stream.
+    :type data: bytes
+    :return: The stdout and stderr data.
+    :rtype: tuple
+    """
+    streams = {1: bytearray(), 2: bytearray()}
+    offset = 0
+    while offset + 8 <= len(data):
+        stream_type, size = struct.unpack('>BxxxL', data[offset:offset + 8])
+        offset += 8
+        streams.get(stream_type, streams[1]).extend(data[offset:offset + size])
+        offset += size
+    return bytes(streams[1]), bytes(streams[2])
+
+
+class APIClient(object):
+    """
+    A small client for the Docker Engine API. Regular requests are sent on pooled keep-alive
+    connections, while streams that hijack the connection get a socket of their own.
+    """
+
+    def __init__(self, socket_path=DEFAULT_SOCKET_PATH, version=None, pool_size=10,
+                 timeout=None):
+        """
+        :param socket_path: The path to the docker daemon socket.
+        :type socket_path: str
+        :param version: The api version, e.g. '1.24'. The daemon default is used if not set.
+        :type version: str
+        :param pool_size: The max number of idle connections kept for the socket.
+        :type pool_size: int
+        :param timeout: Socket timeout in seconds.
+        :type timeout: float
+        """
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.prefix = '/v{0}'.format(version) if version else ''
+        self.pool = get_pool(socket_path, pool_size, timeout)
+
+    def url(self, path, params=None):
+        url = self.prefix + path
+        if params:
+            url += '?' + urlencode(params)
+        return url
+
+    def request(self, method, path, params=None, body=None):
+        """
+        Sends a request and decodes the json response.
+
+        :return: The status code and the decoded body, the body is None if it was empty.
+        :rtype: tuple
+        """
+        headers = {}
+        if body is not None:
+            body = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+
+        logger.debug('Docker API request: {0} {1}'.format(method, path))
+        try:
+            status, data = self.pool.request(method, self.url(path, params), body, headers)
+        except (socket.error, HTTPException) as error:
+            raise errors.DockerUnavailableError(
+                'Request to {0} failed: {1}'.format(self.socket_path, error)
+            )
+        try:
+            return status, json.loads(data.decode('utf-8')) if data else None
+        except ValueError:
+            return status, data.decode('utf-8')
+
+    @staticmethod
+    def check(status, data):
+        """
+        :return: The data if the status code tells that the request succeeded.
+        :raises DockerWrapperBaseError: If the daemon returned an error.
+        """
+        if status >= 400:
+            message = data.get('message') if isinstance(data, dict) else data
+            raise errors.DockerWrapperBaseError(message or 'Docker API error {0}'.format(status))
+        return data
+
+    def hijack(self, path, body, stdin=None):
+        """
+        Sends a request that hijacks the connection, writes stdin to the raw stream from a
+        background thread and reads until the daemon closes the connection.
+
+        :return: The raw stream sent by the daemon.
+        :rtype: bytes
+        """
+        payload = json.dumps(body).encode('utf-8')
+        request = (
+            'POST {0} HTTP/1.1\r\n'
+            'Host: docker\r\n'
+            'Content-Type: application/json\r\n'
+            'Content-Length: {1}\r\n'
+            'Connection: Upgrade\r\n'
+            'Upgrade: tcp\r\n'
+            '\r\n'
+        ).format(self.url(path), len(payload)).encode('ascii')
+
+        sock = connect_unix_socket(self.socket_path, self.timeout)
+        try:
+            sock.sendall(request + payload)
+            buffer = bytearray()
+            while b'\r\n\r\n' not in buffer:
+                data = sock.recv(READ_SIZE)
+                if not data:
+                    break
+                buffer.extend(data)
+
+            head, _, rest = bytes(buffer).partition(b'\r\n\r\n')
+            status = int(head.split(b' ', 2)[1]) if head else 0
+            if status not in (101, 200):
+                raise errors.DockerWrapperBaseError(
+                    'Docker API error {0}: {1}'.format(status, rest.decode('utf-8', 'replace'))
+                )
+
+            # Stdin is written while the output is read, otherwise a command that writes
+            # output before it has read all of stdin blocks with both buffers full.
+            def feed():
+                try:
+                    if stdin:
+                        sock.sendall(stdin)
+                    sock.shutdown(socket.SHUT_WR)
+                except (IOError, OSError):
+                    pass
+
+            feeder = threading.Thread(target=feed, name='docker-api-stdin')
+            feeder.daemon = True
+            feeder.start()
+
+            stream = bytearray(rest)
+            while True:
+                data = sock.recv(READ_SIZE)
+                if not data:
+                    break
+                stream.extend(data)
+            feeder.join()
+            return bytes(stream)
+        finally:
+            sock.close()
+
+
+def quote_path(value):
+    return quote(value, safe='')
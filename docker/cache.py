@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+import posixpath
+import threading
+import time
+from collections import OrderedDict
+
+
+class MetadataCache(object):
+    """
+    Memoizes file system metadata, like existence checks and directory listings, per path. The
+    least recently used entries are evicted when the cache is full.
+    """
+
+    def __init__(self, max_size=1024, ttl=None):
+        """
+        :param max_size: The max number of entries.
+        :type max_size: int
+        :param ttl: Seconds an entry is valid, entries are valid until they are invalidated or
+                    evicted if not set.
+        :type ttl: float
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, kind, path):
+        """
+        :param kind: The kind of metadata, e.g. 'file_exist'.
+        :param path: The path the metadata belongs to.
+        :type path: str
+        :return: A tuple telling whether the entry was found and the cached value.
+        :rtype: tuple
+        """
+        key = (kind, normalize_path(path))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry[1] is None or entry[1] > time.time()):
+                self._entries.pop(key)
+                self._entries[key] = entry
+                self.hits += 1
+                return True, entry[0]
+
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+
+    def set(self, kind, path, value):
+        expires = time.time() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._entries.pop((kind, normalize_path(path)), None)
+            self._entries[(kind, normalize_path(path))] = (value, expires)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, path):
+        """
+        Removes the entries of the path, of the directories above it and of everything below
+        it, since a change to the path might change all of them.
+
+        :param path: The changed path.
+        :type path: str
+        """
+        path = normalize_path(path)
+        with self._lock:
+            for key in list(self._entries):
+                if is_related(key[1], path):
+                    del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        :return: The number of hits, misses and entries.
+        :rtype: dict
+        """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries)}
+
+
+def normalize_path(path):
+    return posixpath.normpath(path) if path else '.'
+
+
+def is_related(first, second):
+    """
+    :return: True if the paths are equal or one of them is below the other.
+    :rtype: bool
+    """
+    if first == second:
+        return True
+    shortest, longest = sorted([first, second], key=len)
+    return longest.startswith(shortest.rstrip('/') + '/')
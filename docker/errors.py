@@ -15,3 +15,20 @@ class DockerFileNotFoundError(DockerWrapperBaseError):
     def __init__(self, path):
         message = 'Could not find the file or directory at path {0}'.format(path)
         super(DockerFileNotFoundError, self).__init__(message)
+
+
+class DockerSessionError(DockerWrapperBaseError):
+    def __init__(self, message=None):
+        super(DockerSessionError, self).__init__(message or 'The shell session died')
+
+
+class DockerOutputTruncatedError(DockerWrapperBaseError):
+    def __init__(self, message=None):
+        super(DockerOutputTruncatedError, self).__init__(
+            message or 'The output of the command was truncated by max_output'
+        )
+
+
+class DockerTimeoutError(DockerWrapperBaseError):
+    def __init__(self, message=None):
+        super(DockerTimeoutError, self).__init__(message or 'The command timed out')
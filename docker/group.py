@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+import logging
+import threading
+
+from docker.manager import Docker
+
+try:
+    from queue import Queue
+except ImportError:
+    from Queue import Queue
+
+logger = logging.getLogger(__name__)
+
+
+class GroupResult(object):
+    """
+    The outcome of an operation on one container in a group. Either value or error is set.
+    """
+
+    def __init__(self, index, docker, value=None, error=None):
+        self.index = index
+        self.docker = docker
+        self.value = value
+        self.error = error
+
+    @property
+    def succeeded(self):
+        """
+        True if the operation did not raise and, for commands, exited with 0.
+        """
+        if self.error is not None:
+            return False
+        return getattr(self.value, 'succeeded', True)
+
+
+class DockerGroup(object):
+    """
+    Runs the same operation on a set of containers concurrently with a bounded number of worker
+    threads. Errors are collected per container instead of aborting the whole group.
+    """
+
+    def __init__(self, dockers, max_workers=8):
+        """
+        :param dockers: The docker managers in the group.
+        :type dockers: list
+        :param max_workers: The max number of containers operated on at once.
+        :type max_workers: int
+        """
+        self.dockers = list(dockers)
+        self.max_workers = max_workers
+        self.failed = []
+
+    @classmethod
+    def from_images(cls, images, max_workers=8, **kwargs):
+        """
+        Creates a group with a docker manager for each image. The other keyword arguments are
+        passed to :class:`docker.manager.Docker`.
+
+        :rtype: DockerGroup
+        """
+        return cls([Docker(image=image, **kwargs) for image in images], max_workers)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.stop()
+
+    def __len__(self):
+        return len(self.dockers)
+
+    def start(self):
+        """
+        Starts all containers. Containers that failed to start are logged and left out of the
+        group, they can be found in ``self.failed``.
+
+        :return: The docker group
+        """
+        results = self.map(lambda docker: docker.start())
+        self.failed = [result for result in results if result.error is not None]
+        for result in self.failed:
+            logger.warning(
+                'Starting {0} failed: {1}'.format(result.docker.container_name, result.error)
+            )
+        self.dockers = [result.docker for result in results if result.error is None]
+        return self
+
+    def stop(self):
+        """
+        Stops all containers.
+
+        :return: A GroupResult for each container.
+        :rtype: list
+        """
+        return self.map(lambda docker: docker.stop())
+
+    def run_all(self, command, working_directory='', stdin='', login=False,
+                as_completed=False):
+        """
+        Runs the command in all containers, see :meth:`docker.manager.Docker.run`.
+
+        :param as_completed: Yield the results as they complete instead of returning them in
+                             the order of the containers.
+        :type as_completed: bool
+        :return: A GroupResult with a ProcessResult as value for each container.
+        :rtype: list
+        """
+        return self.map(
+            lambda docker: docker.run(command, working_directory, stdin, login),
+            as_completed=as_completed
+        )
+
+    def map(self, func, as_completed=False):
+        """
+        Calls func with each docker manager in the worker threads.
+
+        :param func: A function that takes a docker manager.
+        :param as_completed: Yield the results as they complete instead of returning them in
+                             the order of the containers.
+        :type as_completed: bool
+        :return: A GroupResult for each container.
+        :rtype: list
+        """
+        results = self._iterate(func)
+        if as_completed:
+            return results
+        return sorted(results, key=lambda result: result.index)
+
+    def _iterate(self, func):
+        tasks = Queue()
+        done = Queue()
+        for index, docker in enumerate(self.dockers):
+            tasks.put((index, docker))
+
+        def work():
+            while True:
+                index, docker = tasks.get()
+                if docker is None:
+                    return
+                try:
+                    done.put(GroupResult(index, docker, value=func(docker)))
+                except Exception as error:
+                    done.put(GroupResult(index, docker, error=error))
+
+        workers = min(self.max_workers, len(self.dockers))
+        for _ in range(workers):
+            tasks.put((None, None))
+            thread = threading.Thread(target=work, name='docker-group')
+            thread.daemon = True
+            thread.start()
+
+        for _ in range(len(self.dockers)):
+            yield done.get()
@@ -1,17 +1,92 @@
 # -*- coding: utf-8 -*-
+import codecs
+import io
 import logging
+import os
+import select
+import signal
 import subprocess
+import tarfile
+import tempfile
+import threading
+import time
+from collections import deque, namedtuple
+
+from docker.metrics import Execution, current_operation, notify, observers
 
 logger = logging.getLogger(__name__)
 
+READ_SIZE = 65536
+
+FILE_TYPES = {'f': 'file', 'd': 'directory', 'l': 'symlink'}
+
+# Keep the last max_output bytes of the output, or keep the first max_output bytes and spill the
+# whole output to a temporary file.
+OVERFLOW_TAIL = 'tail'
+OVERFLOW_SPILL = 'spill'
+
+
+class FileEntry(namedtuple('FileEntry', ['path', 'type', 'size', 'mode', 'mtime'])):
+    """
+    A file system entry in the container. The type is 'file', 'directory', 'symlink' or 'other',
+    the mode is the permission bits and mtime is seconds since the epoch.
+    """
+
+    __slots__ = ()
+
+
+class SyncResult(namedtuple('SyncResult', ['changed', 'deleted'])):
+    """
+    The paths that were sent and deleted by :meth:`docker.manager.Docker.sync_directory`.
+    """
+
+    __slots__ = ()
+
 
 class ProcessResult(object):
-    return_code = None
-    out = ''
-    err = ''
+    """
+    The result of a command. The output is kept as bytes, or a memoryview, and decoded on the
+    first access of ``out`` and ``err``, thus callers that only check ``return_code`` never
+    decode it. Output that was truncated by max_output can start or end in the middle of a
+    character, thus it is decoded with replacement characters.
+    """
 
-    def __init__(self, command):
+    __slots__ = ('command', 'return_code', 'encoding', 'errors', 'out_truncated', 'err_truncated',
+                 'out_file', 'err_file', 'timed_out', '_out', '_err', '_out_bytes', '_err_bytes')
+
+    def __init__(self, command, out_bytes=b'', err_bytes=b'', encoding='utf-8', errors='strict'):
+        """
+        :param command: The command that was run.
+        :param out_bytes: The raw stdout.
+        :type out_bytes: bytes or memoryview
+        :param err_bytes: The raw stderr.
+        :type err_bytes: bytes or memoryview
+        :param encoding: The encoding used to decode the output.
+        :type encoding: str
+        :param errors: The error handling of the decoding, e.g. 'strict' or 'replace'.
+        :type errors: str
+        """
         self.command = command
+        self.return_code = None
+        self.encoding = encoding
+        self.errors = errors
+        # Set when the output exceeded max_output of execute, the spilled files hold the whole
+        # output.
+        self.out_truncated = False
+        self.err_truncated = False
+        self.out_file = None
+        self.err_file = None
+        # Set when the command was killed because it ran longer than its timeout.
+        self.timed_out = False
+        self._out = None
+        self._err = None
+        self._out_bytes = out_bytes
+        self._err_bytes = err_bytes
+
+    def __repr__(self):
+        return '<ProcessResult command={0!r} return_code={1} out={2} bytes err={3} bytes>'.format(
+            self.command, self.return_code, len(self.out_bytes), len(self.err_bytes)
+        )
 
     @property
     def succeeded(self):
@@ -19,23 +94,672 @@ class ProcessResult(object):
             return None
         return self.return_code == 0
 
+    @property
+    def out(self):
+        if self._out is None:
+            self._out = self._decode(self._out_bytes, self.out_truncated)
+        return self._out
+
+    @out.setter
+    def out(self, value):
+        self._out = value
+        self._out_bytes = None
+
+    @property
+    def err(self):
+        if self._err is None:
+            self._err = self._decode(self._err_bytes, self.err_truncated)
+        return self._err
+
+    @err.setter
+    def err(self, value):
+        self._err = value
+        self._err_bytes = None
+
+    @property
+    def out_bytes(self):
+        if self._out_bytes is None:
+            self._out_bytes = self._out.encode(self.encoding, self.errors)
+        return self._out_bytes
+
+    @out_bytes.setter
+    def out_bytes(self, value):
+        self._out_bytes = value
+        self._out = None
+
+    @property
+    def err_bytes(self):
+        if self._err_bytes is None:
+            self._err_bytes = self._err.encode(self.encoding, self.errors)
+        return self._err_bytes
+
+    @err_bytes.setter
+    def err_bytes(self, value):
+        self._err_bytes = value
+        self._err = None
+
+    def lines(self, stream='out'):
+        """
+        Iterates over the lines of the output without line endings. The output is decoded line
+        by line, thus a large output is not decoded at once. Lines end at ``\\n``, ``\\r\\n``
+        or ``\\r``, whether the output was decoded already or not.
+
+        :param stream: Either 'out' or 'err'.
+        :type stream: str
+        :rtype: iterator
+        """
+        text = getattr(self, '_' + stream)
+        if text is not None:
+            if isinstance(text, bytes):
+                text = text.decode(self.encoding, self.errors)
+            reader = io.StringIO(text, newline=None)
+        else:
+            truncated = getattr(self, stream + '_truncated')
+            reader = io.TextIOWrapper(
+                io.BytesIO(getattr(self, '_' + stream + '_bytes')),
+                encoding=self.encoding,
+                errors='replace' if truncated else self.errors
+            )
+        for line in reader:
+            yield line[:-1] if line.endswith('\n') else line
+
+    def _decode(self, data, truncated):
+        if not data:
+            return ''
+        if isinstance(data, memoryview):
+            data = data.tobytes()
+        return data.decode(self.encoding, 'replace' if truncated else self.errors)
+
+
+MEMORY_UNITS = {'b': 1, 'k': 1024, 'm': 1024 ** 2, 'g': 1024 ** 3, 't': 1024 ** 4}
+
 
-def execute(cmd, stdin=''):
-    result = ProcessResult(command=cmd)
+def parse_memory(value):
+    """
+    Parses a memory size like docker does, e.g. 512m or 2g. Plain numbers are bytes.
+
+    :param value: The memory size.
+    :type value: str or int
+    :return: The size in bytes.
+    :rtype: int
+    :raises ValueError: If the size is invalid
+    """
+    if isinstance(value, int):
+        return value
+    value = value.strip().lower()
+    unit = value[-1:]
+    if unit in MEMORY_UNITS:
+        return int(float(value[:-1]) * MEMORY_UNITS[unit])
+    return int(value)
+
+
+def parse_file_entries(out, paths=None):
+    """
+    Parses NUL-delimited entries printed with ``find -printf '%y\\0%s\\0%m\\0%T@\\0%P\\0'``.
+    If paths are given the output is expected to not include paths, and entries with the type 'n'
+    are missing paths.
+
+    :param out: The output of find.
+    :type out: str
+    :param paths: The paths of the entries, in order.
+    :type paths: list
+    :rtype: list
+    """
+    fields = out.split('\0')
+    size = 4 if paths is not None else 5
+    entries = []
+    for index in range(len(fields) // size):
+        entry_type, entry_size, mode, mtime = fields[index * size:index * size + 4]
+        path = paths[index] if paths is not None else fields[index * size + 4]
+        if entry_type == 'n':
+            entries.append(None)
+            continue
+        entries.append(FileEntry(
+            path,
+            FILE_TYPES.get(entry_type, 'other'),
+            int(entry_size),
+            int(mode, 8),
+            float(mtime)
+        ))
+    return entries
+
+
+def execute(cmd, stdin='', max_output=None, overflow=OVERFLOW_TAIL, timeout=None, encoding='utf-8',
+            errors='strict'):
+    """
+    Runs the command and collects its output. The command is run by the shell if it is a string,
+    an argument list is run directly.
+
+    :param cmd: The command that should be run.
+    :type cmd: str or list
+    :param stdin: Data that is written to stdin of the process.
+    :type stdin: str or bytes
+    :param max_output: The max number of bytes kept in memory for each of stdout and stderr.
+    :type max_output: int
+    :param overflow: What happens to output past max_output. With ``OVERFLOW_TAIL`` only the last
+                     max_output bytes are kept, with ``OVERFLOW_SPILL`` the first max_output bytes
+                     are kept and the whole output is spilled to ``result.out_file`` and
+                     ``result.err_file``.
+    :type overflow: str
+    :param timeout: Seconds before the process group of the command is killed. The result is
+                    marked as timed out and has the output read until then.
+    :type timeout: float
+    :param encoding: The encoding of the output, it is decoded when ``out`` or ``err`` is read.
+    :type encoding: str
+    :param errors: The error handling of the decoding.
+    :type errors: str
+    :rtype: ProcessResult
+    """
+    result = ProcessResult(command=cmd, encoding=encoding, errors=errors)
+    execution = Execution(cmd, current_operation()) if observers else None
 
     logger.debug('Running command: "{0}"'.format(cmd))
     process = subprocess.Popen(
         cmd,
-        shell=True,
+        shell=not isinstance(cmd, list),
         stdin=subprocess.PIPE,
         stdout=subprocess.PIPE,
         stderr=subprocess.PIPE,
-        close_fds=True
+        close_fds=True,
+        preexec_fn=os.setsid if timeout is not None else None
     )
 
-    (stdout, stderr) = process.communicate(str.encode(stdin))
-    result.out = stdout.decode('utf-8') if stdout else ''
-    result.err = stderr.decode('utf-8') if stderr else ''
+    if not isinstance(stdin, bytes):
+        stdin = str.encode(stdin)
+    if execution is None and max_output is None and timeout is None:
+        (result.out_bytes, result.err_bytes) = process.communicate(stdin)
+    else:
+        captures = (OutputCapture(max_output, overflow), OutputCapture(max_output, overflow))
+        result.timed_out = communicate(process, stdin, captures, execution, timeout)
+        captures[0].store(result, 'out')
+        captures[1].store(result, 'err')
     result.return_code = process.returncode
-    logger.debug('Finished running of: {0}'.format(result.__dict__))
+    if execution is not None:
+        execution.finished = time.time()
+        notify('finished', execution)
+    logger.debug('Finished running of: {0!r}'.format(result))
     return result
+
+
+def communicate(process, stdin, captures, execution=None, timeout=None):
+    """
+    Works like ``process.communicate`` but writes stdout and stderr to the given captures, and
+    reports the spawn, first byte and exit of the process to the observers if execution is set.
+    The process group is killed when the timeout expires, thus the process must have been started
+    in a new session.
+
+    :param captures: An :class:`OutputCapture` for each of stdout and stderr.
+    :type captures: tuple
+    :return: True if the process was killed because of the timeout.
+    :rtype: bool
+    """
+    if execution is not None:
+        execution.spawned = time.time()
+        execution.bytes_in = len(stdin)
+        notify('spawned', execution)
+
+    def feed():
+        try:
+            if stdin:
+                process.stdin.write(stdin)
+            process.stdin.close()
+        except (IOError, OSError):
+            pass
+
+    feeder = threading.Thread(target=feed)
+    feeder.daemon = True
+    feeder.start()
+
+    output = dict(zip((process.stdout.fileno(), process.stderr.fileno()), captures))
+    streams = list(output)
+    deadline = time.time() + timeout if timeout is not None else None
+    timed_out = False
+    while streams:
+        remaining = deadline - time.time() if deadline is not None and not timed_out else None
+        if remaining is not None and remaining <= 0:
+            kill_process_group(process)
+            timed_out = True
+            continue
+
+        readable, _, _ = select.select(streams, [], [], remaining)
+        for fd in readable:
+            data = os.read(fd, READ_SIZE)
+            if not data:
+                streams.remove(fd)
+                continue
+            if execution is not None:
+                if execution.first_byte is None:
+                    execution.first_byte = time.time()
+                    notify('first_byte', execution)
+                execution.bytes_out += len(data)
+            output[fd].write(data)
+
+    process.stdout.close()
+    process.stderr.close()
+    feeder.join()
+    process.wait()
+    if execution is not None:
+        execution.return_code = process.returncode
+        execution.exited = time.time()
+        notify('exited', execution)
+    return timed_out
+
+
+def kill_process_group(process):
+    """
+    Kills the process and everything it started in its process group.
+    """
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except OSError:
+        pass
+
+
+class OutputCapture(object):
+    """
+    Collects the output of a process stream. Without a limit everything is kept in memory. With a
+    limit either the last limit bytes are kept in a ring of chunks, or the first limit bytes are
+    kept and the whole output is spilled to a temporary file once it grows past the limit.
+    """
+
+    def __init__(self, limit=None, overflow=OVERFLOW_TAIL):
+        if overflow not in (OVERFLOW_TAIL, OVERFLOW_SPILL):
+            raise ValueError('Unknown overflow {0!r}'.format(overflow))
+        self.limit = limit
+        self.overflow = overflow
+        self.size = 0
+        self.file = None
+        self._chunks = deque()
+        self._kept = 0
+
+    @property
+    def truncated(self):
+        return self.limit is not None and self.size > self.limit
+
+    def write(self, data):
+        self.size += len(data)
+        if self.file is not None:
+            self.file.write(data)
+            return
+
+        self._chunks.append(data)
+        self._kept += len(data)
+        if not self.truncated:
+            return
+
+        if self.overflow == OVERFLOW_SPILL:
+            self.file = tempfile.TemporaryFile()
+            for chunk in self._chunks:
+                self.file.write(chunk)
+            self._chunks = deque([self.value()])
+            return
+
+        while self._chunks and self._kept - len(self._chunks[0]) >= self.limit:
+            self._kept -= len(self._chunks.popleft())
+
+    def value(self):
+        """
+        :return: The kept output.
+        :rtype: bytes
+        """
+        data = b''.join(self._chunks)
+        if not self.truncated:
+            return data
+        if self.overflow == OVERFLOW_SPILL:
+            return data[:self.limit]
+        return data[len(data) - self.limit:]
+
+    def store(self, result, name):
+        """
+        Sets the raw output, the truncation flag and the spilled file on the result.
+        """
+        setattr(result, name + '_bytes', self.value())
+        setattr(result, name + '_truncated', self.truncated)
+        if self.file is not None:
+            self.file.seek(0)
+            setattr(result, name + '_file', self.file)
+
+
+def execute_stream(cmd, stdin='', callback=None, lines=False, decode=True, chunk_size=READ_SIZE):
+    """
+    Starts the command and returns a stream of its output. See :class:`ProcessStream`.
+
+    :rtype: ProcessStream
+    """
+    logger.debug('Running command: "{0}"'.format(cmd))
+    return ProcessStream(cmd, stdin=stdin, callback=callback, lines=lines, decode=decode,
+                         chunk_size=chunk_size)
+
+
+class ProcessStream(object):
+    """
+    Iterates over the output of a running process as ``(stream, data)`` tuples, where stream is
+    either ``'out'`` or ``'err'``. The data is yielded as soon as it is read from the pipes, thus
+    nothing is kept in memory after it has been consumed. The return code is available when the
+    iteration has finished.
+    """
+
+    def __init__(self, cmd, stdin='', callback=None, lines=False, decode=True,
+                 chunk_size=READ_SIZE):
+        """
+        :param cmd: The command that should be run, see :func:`execute`.
+        :type cmd: str or list
+        :param stdin: Data or a file-like object that is written to stdin of the process.
+        :type stdin: str, bytes or file
+        :param callback: A function that is called with stream and data for every chunk.
+        :type callback: callable
+        :param lines: Yield complete lines instead of chunks.
+        :type lines: bool
+        :param decode: Decode the output as utf-8, otherwise bytes are yielded.
+        :type decode: bool
+        :param chunk_size: The max number of bytes read from a pipe at a time.
+        :type chunk_size: int
+        """
+        self.command = cmd
+        self.callback = callback
+        self.lines = lines
+        self.decode = decode
+        self.chunk_size = chunk_size
+        self.return_code = None
+        self.execution = Execution(cmd, current_operation()) if observers else None
+        self.process = subprocess.Popen(
+            cmd,
+            shell=not isinstance(cmd, list),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            close_fds=True
+        )
+        if self.execution is not None:
+            self.execution.spawned = time.time()
+            notify('spawned', self.execution)
+        self._feeder = threading.Thread(target=self._feed, args=(stdin,))
+        self._feeder.daemon = True
+        self._feeder.start()
+        self._iterator = self._read()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._iterator)
+
+    next = __next__
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.close()
+
+    @property
+    def succeeded(self):
+        if self.return_code is None:
+            return None
+        return self.return_code == 0
+
+    def wait(self):
+        """
+        Consumes the rest of the output, passing it to the callback, and waits for the process
+        to exit.
+
+        :return: The return code of the process.
+        :rtype: int
+        """
+        for _ in self:
+            pass
+        return self.return_code
+
+    def collect(self):
+        """
+        Consumes the rest of the output and collects it in a result object.
+
+        :rtype: ProcessResult
+        """
+        result = ProcessResult(command=self.command, errors='replace')
+        output = {'out': [], 'err': []}
+        for name, data in self:
+            output[name].append(data)
+
+        for name, chunks in output.items():
+            if self.decode:
+                setattr(result, name, ''.join(chunks))
+            else:
+                setattr(result, name + '_bytes', b''.join(chunks))
+        result.return_code = self.return_code
+        return result
+
+    def reader(self):
+        """
+        :return: A file-like object that reads stdout of the stream, stderr is collected on
+                 the reader.
+        :rtype: StreamReader
+        """
+        return StreamReader(self)
+
+    def close(self):
+        """
+        Kills the process if it is still running and stops the iteration.
+        """
+        if self.process.poll() is None:
+            self.process.kill()
+        self._iterator.close()
+        self.return_code = self.process.wait()
+
+    def _feed(self, stdin):
+        try:
+            if hasattr(stdin, 'read'):
+                while True:
+                    data = stdin.read(self.chunk_size)
+                    if not data:
+                        break
+                    self._write(data)
+            elif stdin:
+                self._write(stdin)
+            self.process.stdin.close()
+        except (IOError, OSError):
+            pass
+
+    def _write(self, data):
+        if not isinstance(data, bytes):
+            data = data.encode('utf-8')
+        self.process.stdin.write(data)
+        if self.execution is not None:
+            self.execution.bytes_in += len(data)
+
+    def _read(self):
+        streams = {
+            self.process.stdout.fileno(): StreamBuffer('out', self.decode, self.lines),
+            self.process.stderr.fileno(): StreamBuffer('err', self.decode, self.lines),
+        }
+        try:
+            while streams:
+                readable, _, _ = select.select(list(streams), [], [])
+                for fd in readable:
+                    data = os.read(fd, self.chunk_size)
+                    buffer = streams[fd]
+                    if not data:
+                        del streams[fd]
+                    elif self.execution is not None:
+                        self._observe(data)
+                    for item in buffer.feed(data):
+                        if self.callback:
+                            self.callback(buffer.name, item)
+                        yield buffer.name, item
+        finally:
+            self.process.stdout.close()
+            self.process.stderr.close()
+
+        self._feeder.join()
+        self.return_code = self.process.wait()
+        if self.execution is not None:
+            self.execution.return_code = self.return_code
+            self.execution.exited = self.execution.finished = time.time()
+            notify('exited', self.execution)
+            notify('finished', self.execution)
+        logger.debug('Finished running of: "{0}" with return code {1}'.format(
+            self.command,
+            self.return_code
+        ))
+
+    def _observe(self, data):
+        if self.execution.first_byte is None:
+            self.execution.first_byte = time.time()
+            notify('first_byte', self.execution)
+        self.execution.bytes_out += len(data)
+
+
+class StreamBuffer(object):
+    """
+    Turns raw chunks from a pipe into decoded chunks or complete lines. An empty chunk marks the
+    end of the stream and flushes what is left.
+    """
+
+    def __init__(self, name, decode=True, lines=False):
+        self.name = name
+        self.lines = lines
+        self.decoder = codecs.getincrementaldecoder('utf-8')() if decode else None
+        self.pending = '' if decode else b''
+
+    def feed(self, data):
+        final = not data
+        if self.decoder:
+            data = self.decoder.decode(data, final)
+
+        if not self.lines:
+            return [data] if data else []
+
+        data = self.pending + data
+        newline = '\n' if self.decoder else b'\n'
+        lines = data.split(newline)
+        self.pending = lines.pop()
+        lines = [line + newline for line in lines]
+        if final and self.pending:
+            lines.append(self.pending)
+            self.pending = data[:0]
+        return lines
+
+
+class StreamReader(io.RawIOBase):
+    """
+    A file-like object reading stdout of a :class:`ProcessStream` that yields bytes. Data on
+    stderr is collected in ``err``.
+    """
+
+    def __init__(self, stream):
+        super(StreamReader, self).__init__()
+        self.stream = stream
+        self.err = bytearray()
+        self._buffer = b''
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._buffer:
+            try:
+                name, data = next(self.stream)
+            except StopIteration:
+                return 0
+            if name == 'err':
+                self.err.extend(data)
+            else:
+                self._buffer = data
+
+        size = min(len(buffer), len(self._buffer))
+        buffer[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+    def result(self):
+        """
+        Consumes the rest of the stream and returns the result without stdout.
+
+        :rtype: ProcessResult
+        """
+        while self.read(READ_SIZE):
+            pass
+        result = ProcessResult(command=self.stream.command, err_bytes=bytes(self.err),
+                               errors='replace')
+        result.return_code = self.stream.return_code
+        return result
+
+
+def add_to_archive(tar, name, content):
+    """
+    Adds content to a tar archive. The content can be bytes, str or a file-like object. The mode
+    and mtime of real files are kept, other content gets mode 644 and the current time.
+
+    :param tar: The archive.
+    :type tar: tarfile.TarFile
+    :param name: The path of the file in the archive.
+    :type name: str
+    :param content: The content of the file.
+    :type content: bytes, str or file
+    """
+    info = tarfile.TarInfo(name.lstrip('/'))
+    info.mode = 0o644
+    info.mtime = time.time()
+
+    if hasattr(content, 'read'):
+        try:
+            stat = os.fstat(content.fileno())
+        except (AttributeError, IOError, OSError, ValueError):
+            stat = None
+
+        if stat is not None and not isinstance(content, io.TextIOBase):
+            info.mode = stat.st_mode & 0o7777
+            info.mtime = stat.st_mtime
+            info.size = stat.st_size - content.tell()
+            tar.addfile(info, content)
+            return
+
+        content = content.read()
+
+    if not isinstance(content, bytes):
+        content = content.encode('utf-8')
+    info.size = len(content)
+    tar.addfile(info, io.BytesIO(content))
+
+
+def extract_archive(tar, destination):
+    """
+    Extracts a tar archive into a directory, keeping modes and mtimes. The archive is not
+    trusted, thus members with absolute paths or paths outside the directory, links pointing
+    outside of it, and devices are rejected before they are written.
+
+    :param tar: The archive.
+    :type tar: tarfile.TarFile
+    :param destination: The directory, it is created if it is missing.
+    :type destination: str
+    :raises tarfile.ExtractError: If the archive has an unsafe member
+    """
+    root = os.path.realpath(destination)
+
+    def inside(path):
+        path = os.path.realpath(os.path.join(root, path))
+        return path == root or path.startswith(root.rstrip(os.sep) + os.sep)
+
+    def members():
+        for member in tar:
+            if os.path.isabs(member.name) or not inside(member.name):
+                raise tarfile.ExtractError('Unsafe path in archive: {0}'.format(member.name))
+            if member.issym():
+                target = os.path.join(os.path.dirname(member.name), member.linkname)
+            elif member.islnk():
+                target = member.linkname
+            elif member.isfile() or member.isdir():
+                target = None
+            else:
+                raise tarfile.ExtractError('Unsupported member in archive: {0}'.format(member.name))
+            if target is not None and (os.path.isabs(member.linkname) or not inside(target)):
+                raise tarfile.ExtractError('Unsafe link in archive: {0} -> {1}'.format(
+                    member.name, member.linkname
+                ))
+            yield member
+
+    if hasattr(tarfile, 'fully_trusted_filter'):
+        # The members are checked above, the filter only keeps newer Pythons from changing modes.
+        tar.extractall(destination, members(), filter='fully_trusted')
+    else:
+        tar.extractall(destination, members())
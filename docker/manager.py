@@ -1,13 +1,40 @@
+import hashlib
 import logging
+import os
+import posixpath
+import tarfile
+import tempfile
+import threading
+import time
 import uuid
 from collections import OrderedDict
-from time import sleep
 
-from docker import errors
-from docker.helpers import execute
+from docker import errors, reaper, snapshots, teardown
+from docker.cache import MetadataCache
+from docker.helpers import (OVERFLOW_TAIL, ProcessResult, SyncResult, add_to_archive, execute,
+                            execute_stream, extract_archive, parse_file_entries)
+from docker.metrics import instrumented, operation
+from docker.session import (RETURN_CODE_VARIABLE, ShellSession, frame_command, new_token,
+                            split_frames)
+from docker.volumes import default_cache as default_volume_cache
+
+try:
+    from shlex import quote as shell_quote
+except ImportError:
+    from pipes import quote as shell_quote
 
 logger = logging.getLogger(__name__)
 
+# Archives larger than this are spooled to disk while they are transferred.
+SPOOL_SIZE = 16 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+# Commands that do not exit on SIGTERM within this many seconds after their timeout are killed.
+KILL_GRACE = 5
+# The return codes of timeout(1) when the command was terminated or killed.
+TIMEOUT_RETURN_CODES = (124, 137)
+# Type, size, mode and mtime of a file, delimited by NUL.
+FIND_FORMAT = '%y\\0%s\\0%m\\0%T@\\0'
+
 
 class Docker(object):
     """
@@ -16,7 +43,11 @@ class Docker(object):
     """
 
     def __init__(self, image='ubuntu', name_prefix='dyn', timeout=3600, privilege=False,
-                 combine_outputs=False, env_variables=None, ports_mapping=None):
+                 combine_outputs=False, env_variables=None, ports_mapping=None, session=False,
+                 transport=None, deferred_stop=False, metadata_cache=None, max_output=None,
+                 output_overflow=OVERFLOW_TAIL, argv=False, background_start=False,
+                 lazy_start=False, cpus=None, memory=None, volumes=None, tmpfs=None,
+                 cache_volumes=None, volume_cache=None):
         """
         Creates a docker manager. Each manager has a reference to a unique container name.
 
@@ -36,6 +67,65 @@ class Docker(object):
         :param ports_mapping: Map ports from docker container to host machine,
                               format ['4080:40480', '5000:5000']
         :type ports_mapping: list
+        :param session: Setting this to True will run commands through a long-lived shell in the
+                        container instead of starting a new ``docker exec`` for each command.
+        :type session: bool
+        :param transport: A transport which is used to start, stop and run commands instead of
+                          the docker command line client, e.g.
+                          :class:`docker.transports.APITransport`.
+        :type transport: docker.transports.BaseTransport
+        :param deferred_stop: Setting this to True makes ``stop()`` return right away while the
+                              container is removed in a background thread. Use
+                              ``docker.teardown.flush()`` to wait for the removal.
+        :type deferred_stop: bool
+        :param metadata_cache: Cache the results of ``file_exist``, ``directory_exist``,
+                               ``list_files`` and ``list_directories``. Either True or a
+                               :class:`docker.cache.MetadataCache`. Entries are invalidated by
+                               writes and by ``run``.
+        :type metadata_cache: bool or docker.cache.MetadataCache
+        :param max_output: The max number of bytes of stdout and of stderr kept in memory for
+                           commands run with docker exec, see :func:`docker.helpers.execute`.
+                           Helpers that parse the output, like ``read_file``, raise
+                           ``DockerOutputTruncatedError`` if it was truncated.
+        :type max_output: int
+        :param output_overflow: Either ``OVERFLOW_TAIL`` to keep the end of the output or
+                                ``OVERFLOW_SPILL`` to spill the whole output to a temporary file.
+        :type output_overflow: str
+        :param argv: Setting this to True runs the docker command line client with argument lists
+                     instead of through the host shell. Commands are passed unchanged, quotes
+                     included, and the environment variables are passed with ``docker exec -e``.
+                     The exec arguments are built once, thus later changes to env_variables are
+                     not picked up.
+        :type argv: bool
+        :param background_start: Setting this to True makes ``start()`` return right away while
+                                 the container is started in a background thread. The first
+                                 operation that needs the container waits for it, and raises the
+                                 error if starting failed.
+        :type background_start: bool
+        :param lazy_start: Setting this to True defers starting the container until the first
+                           operation that needs it. The container is never started if it is not
+                           used.
+        :type lazy_start: bool
+        :param cpus: The number of CPUs the container may use, passed as ``--cpus``.
+        :type cpus: float
+        :param memory: The memory limit of the container, in bytes or like ``512m``, passed as
+                       ``--memory``.
+        :type memory: int or str
+        :param volumes: Volumes or host directories to mount, passed as ``-v``, format
+                        ['name:/path', '/host/path:/path:ro']
+        :type volumes: list
+        :param tmpfs: Paths to mount as tmpfs instead of writing to the container file system,
+                      passed as ``--tmpfs``, format ['/tmp', '/scratch:size=64m']
+        :type tmpfs: list
+        :param cache_volumes: Named volumes that keep dependency caches between containers, a
+                              dict mapping the path in the container to a list of lock files on
+                              the host, e.g. ``{'/root/.cache/pip': ['requirements.txt']}``.
+                              Containers with the same image and lock files share the volume,
+                              see :class:`docker.volumes.VolumeCache`.
+        :type cache_volumes: dict
+        :param volume_cache: The cache that names the cache volumes, defaults to
+                             ``docker.volumes.default_cache``.
+        :type volume_cache: docker.volumes.VolumeCache
         :return: A docker manager object.
         :rtype: Docker
         """
@@ -48,10 +138,42 @@ class Docker(object):
         if env_variables:
             self.env_variables.update(sorted(env_variables.items(), key=lambda t: t[0]))
 
+        self.cpus = cpus
+        self.memory = memory
+        self.volume_cache = volume_cache or default_volume_cache
+        self.volumes = list(volumes or [])
+        for path, lockfiles in sorted((cache_volumes or {}).items()):
+            self.volumes.append(self.volume_cache.mount(image, path, lockfiles))
+        self.tmpfs = list(tmpfs or [])
+        self.ports_mapping = list(ports_mapping or [])
         self.ports = ''
         if ports_mapping:
             self.ports = ' '.join(['-p {0}'.format(port_mapping) for port_mapping in ports_mapping])
 
+        self.session = session
+        self._sessions = {}
+        self.transport = transport
+        self.deferred_stop = deferred_stop
+        self.metadata_cache = MetadataCache() if metadata_cache is True else metadata_cache
+        self.max_output = max_output
+        self.output_overflow = output_overflow
+        self.argv = argv
+        self.running = False
+        self.background_start = background_start
+        self.lazy_start = lazy_start
+        self._start_lock = threading.Lock()
+        self._start_pending = False
+        self._start_thread = None
+        self._start_error = None
+        self._manifests = {}
+        environment = []
+        for key, value in self.env_variables.items():
+            environment.extend(['-e', '{0}={1}'.format(key, value)])
+        self._exec_args = {
+            False: ['docker', 'exec', '-i'] + environment + [self.container_name],
+            True: ['docker', 'exec', '-i', '-t'] + environment + [self.container_name],
+        }
+
     def __enter__(self):
         return self.start()
 
@@ -60,7 +182,9 @@ class Docker(object):
         if exc_value:
             raise exc_value
 
-    def run(self, command, working_directory='', stdin='', login=False, tty=False):
+    @instrumented
+    def run(self, command, working_directory='', stdin='', login=False, tty=False,
+            invalidate=True, timeout=None):
         """
         Runs the command with docker exec in the given working directory.
 
@@ -74,62 +198,161 @@ class Docker(object):
         :type stdin: str
         :param login: Will add --login on the bash call.
         :type login: boolean
-        :param tty: Will add -t on the bash call.
+        :param tty: Will add -t on the bash call. Commands with tty enabled are never run through
+                    the session.
         :type tty: boolean
+        :param invalidate: Tells which paths the command might change, thus which entries of the
+                           metadata cache should be invalidated. True clears the whole cache and
+                           False keeps it.
+        :type invalidate: bool or list
+        :param timeout: Seconds before the command is terminated. The command is run with
+                        ``timeout`` in the container, thus its whole process group is killed, and
+                        the result is marked with ``timed_out``. It needs coreutils in the image.
+        :type timeout: float
         :return: A ProcessResult object containing information on the result of the command.
         :rtype: ProcessResult
         """
-        working_directory = self._get_working_directory(working_directory)
-        command = command.replace('\'', '"')
-        command_string = 'cd {working_directory} && {envs} {command}'
+        self._ensure_started()
+        started = time.time()
+        if self.transport:
+            result = self.transport.run(
+                self,
+                self._get_timeout_command_string(command, working_directory, timeout),
+                stdin,
+                login,
+                tty
+            )
+        elif self.session and not tty:
+            result = self._get_session(login).execute(
+                self._get_timeout_command_string(command, working_directory, timeout),
+                stdin
+            )
+        else:
+            kwargs = {}
+            if self.max_output is not None:
+                kwargs.update(max_output=self.max_output, overflow=self.output_overflow)
+            if timeout is not None:
+                # Kill the docker client too if it does not exit after the command was killed.
+                kwargs['timeout'] = timeout + 2 * KILL_GRACE
+            result = execute(
+                self._get_exec_command(command, working_directory, login, tty, timeout=timeout),
+                stdin,
+                **kwargs
+            )
 
-        if self.combine_outputs:
-            command_string += ' 2>&1'
+        if (timeout is not None and result.return_code in TIMEOUT_RETURN_CODES and
+                time.time() - started >= timeout):
+            result.timed_out = True
+        self._invalidate(invalidate)
+        return result
 
-        env_string = ' '.join([
-            '{0}={1}'.format(key, self.env_variables[key]) for key in self.env_variables
-        ])
+    @instrumented
+    def run_many(self, commands, working_directory='', login=False, stop_on_error=False,
+                 invalidate=True):
+        """
+        Runs a batch of commands in a single docker exec. The commands are run after each other
+        in the given working directory, and each of them gets its own result.
 
-        result = execute(
-            'docker exec -i{tty} {container} bash{login} -c \'{command}\''.format(
-                envs=env_string,
-                container=self.container_name,
-                login=' --login' if login else '',
-                tty=' -t' if tty else '',
-                command=command_string.format(
-                    working_directory=working_directory,
-                    command=command,
-                    envs=env_string
-                )
-            ),
-            stdin
-        )
+        :param commands: The commands that should be run.
+        :type commands: list
+        :param working_directory: The path to the directory where the commands should be run.
+        :type working_directory: str
+        :param login: Will add --login on the bash call.
+        :type login: boolean
+        :param stop_on_error: Skip the rest of the commands when a command fails. Skipped
+                              commands get results without a return code.
+        :type stop_on_error: bool
+        :param invalidate: Tells which entries of the metadata cache should be invalidated, see
+                           ``run``.
+        :type invalidate: bool or list
+        :return: A ProcessResult object for each command.
+        :rtype: list
+        :raises DockerWrapperBaseError: If the batch could not be run at all.
+        """
+        token = new_token()
+        script = []
+        for command in commands:
+            script.append(frame_command(self._get_command_string(command, working_directory),
+                                        token))
+            if stop_on_error:
+                script.append('[ ${0} -eq 0 ] || exit 0\n'.format(RETURN_CODE_VARIABLE))
 
-        return result
+        result = self._run_script(''.join(script), login)
+        self._invalidate(invalidate)
+        frames = split_frames(result.out, result.err, token)
+        if commands and not frames and not result.succeeded:
+            raise errors.DockerWrapperBaseError(result.err)
+
+        results = []
+        for index, command in enumerate(commands):
+            command_result = ProcessResult(command=command)
+            if index < len(frames):
+                command_result.out, command_result.err, command_result.return_code = \
+                    frames[index]
+            results.append(command_result)
+        return results
+
+    @instrumented
+    def run_stream(self, command, working_directory='', stdin='', login=False, tty=False,
+                   callback=None, lines=False, invalidate=True):
+        """
+        Runs the command with docker exec like ``run``, but returns a stream that yields the
+        output while the command is running. The stream is iterated as ``(stream, data)``
+        tuples, where stream is either 'out' or 'err'. The return code is available on the
+        stream when it has been consumed. It always uses the docker command line client.
+
+        :param command: The command that should be run with docker exec.
+        :type command: str
+        :param working_directory: The path to the directory where the command should be run.
+        :type working_directory: str
+        :param stdin: Data or a file-like object that should be passed to the command.
+        :type stdin: str
+        :param login: Will add --login on the bash call.
+        :type login: boolean
+        :param tty: Will add -t on the bash call.
+        :type tty: boolean
+        :param callback: Called with stream and data for each chunk, e.g. to ship logs.
+        :type callback: callable
+        :param lines: Yield complete lines instead of chunks.
+        :type lines: bool
+        :param invalidate: Tells which entries of the metadata cache should be invalidated when
+                           the command is started, see ``run``.
+        :type invalidate: bool or list
+        :return: A stream of the output.
+        :rtype: docker.helpers.ProcessStream
+        """
+        self._ensure_started()
+        self._invalidate(invalidate)
+        return execute_stream(
+            self._get_exec_command(command, working_directory, login, tty),
+            stdin,
+            callback=callback,
+            lines=lines
+        )
 
-    def read_file(self, path):
+    @instrumented
+    def read_file(self, path, timeout=None):
         """
         Reads the content of the file on the given path. Returns None if the file does not exist.
 
         :param path: The path to the file.
         :type path: str
+        :param timeout: Seconds before the command is terminated, see :meth:`run`.
+        :type timeout: float
         :return: The content of the file
         :rtype: str
         :raises DockerFileNotFoundError: If given an invalid path
+        :raises DockerTimeoutError: If the command timed out
         :raises DockerWrapperBaseError: For other errors
         """
         path = self._get_working_directory(path)
-        result = self.run('cat {0}'.format(path))
-
-        if not result.succeeded:
-            if errors.FILE_NOT_FOUND_PREDICATE in result.err:
-                raise errors.DockerFileNotFoundError(path)
-
-            raise errors.DockerWrapperBaseError(result.err)
+        result = self.run('cat {0}'.format(path), invalidate=False, timeout=timeout)
 
+        self._check_result(result, path)
         return result.out
 
-    def write_file(self, path, content, append=False):
+    @instrumented
+    def write_file(self, path, content, append=False, timeout=None):
         """
         Write the given content to path.
         Overwrites the file if append is set to False.
@@ -140,36 +363,375 @@ class Docker(object):
         :type content: str
         :param append: Set to False to overwrite file, defaults to False.
         :type append: bool
+        :param timeout: Seconds before the command is terminated, see :meth:`run`. The result has
+                        ``timed_out`` set if the timeout expired, nothing is raised.
+        :type timeout: float
+        :return: A object with the result of the create command.
+        :rtype: ProcessResult
+        """
+        path = self._get_working_directory(path)
+        modifier = '>>' if append else '>'
+        return self.run('cat {0} {1}'.format(modifier, path), stdin=content, invalidate=[path],
+                        timeout=timeout)
+
+    @instrumented
+    def read_file_to(self, path, fileobj, chunk_size=CHUNK_SIZE):
+        """
+        Reads the file on the given path in chunks and writes the bytes to the file-like object.
+        Only one chunk is kept in memory at a time, thus it works for large and binary files.
+
+        :param path: The path to the file.
+        :type path: str
+        :param fileobj: A file-like object opened for writing bytes.
+        :type fileobj: file
+        :param chunk_size: The max number of bytes read at a time.
+        :type chunk_size: int
+        :return: The number of bytes written to fileobj.
+        :rtype: int
+        :raises DockerFileNotFoundError: If given an invalid path
+        :raises DockerWrapperBaseError: For other errors
+        """
+        self._ensure_started()
+        path = self._get_working_directory(path)
+        reader = execute_stream(
+            self._get_exec_command('cat {0}'.format(path), combine_outputs=False),
+            decode=False,
+            chunk_size=chunk_size
+        ).reader()
+
+        size = 0
+        while True:
+            data = reader.read(chunk_size)
+            if not data:
+                break
+            fileobj.write(data)
+            size += len(data)
+
+        self._check_result(reader.result(), path)
+        return size
+
+    @instrumented
+    def write_file_from(self, path, fileobj, append=False, chunk_size=CHUNK_SIZE):
+        """
+        Writes the content of the file-like object to path in chunks. Only one chunk is kept in
+        memory at a time, thus it works for large and binary files.
+        Overwrites the file if append is set to False.
+
+        :param path: The path to the file.
+        :type path: str
+        :param fileobj: A file-like object opened for reading bytes.
+        :type fileobj: file
+        :param append: Set to False to overwrite file, defaults to False.
+        :type append: bool
+        :param chunk_size: The max number of bytes written at a time.
+        :type chunk_size: int
         :return: A object with the result of the create command.
         :rtype: ProcessResult
         """
+        self._ensure_started()
         path = self._get_working_directory(path)
         modifier = '>>' if append else '>'
-        return self.run('cat {0} {1}'.format(modifier, path), stdin=content)
+        self._invalidate([path])
+        return execute_stream(
+            self._get_exec_command('cat {0} {1}'.format(modifier, path)),
+            fileobj,
+            decode=False,
+            chunk_size=chunk_size
+        ).collect()
+
+    @instrumented
+    def put_files(self, files, path='', compress=False):
+        """
+        Writes many files to the container in a single tar stream.
+
+        :param files: A dict of paths relative to ``path`` and their content. The content can be
+                      bytes, str or a file-like object. The mode and mtime of real files are
+                      kept.
+        :type files: dict
+        :param path: The directory the files are written to, it is created if it is missing.
+        :type path: str
+        :param compress: Compress the stream with gzip.
+        :type compress: bool
+        :return: A object with the result of the extract command.
+        :rtype: ProcessResult
+        """
+        archive = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+        with tarfile.open(fileobj=archive, mode='w:gz' if compress else 'w') as tar:
+            for name in sorted(files):
+                add_to_archive(tar, name, files[name])
+        return self._put_archive(archive, path, compress)
+
+    @instrumented
+    def get_files(self, paths, path='', compress=False):
+        """
+        Reads many files from the container in a single tar stream. Directories are read
+        recursively.
+
+        :param paths: Paths relative to ``path``.
+        :type paths: list
+        :param path: The directory the paths are relative to.
+        :type path: str
+        :param compress: Compress the stream with gzip.
+        :type compress: bool
+        :return: A dict of paths and the content of the files as bytes.
+        :rtype: dict
+        :raises DockerFileNotFoundError: If given an invalid path
+        :raises DockerWrapperBaseError: For other errors
+        """
+        files = {}
+        if not paths:
+            return files
+
+        reader, tar = self._get_archive(paths, path, compress)
+        with tar:
+            for member in tar:
+                if member.isfile():
+                    name = os.path.normpath(member.name)
+                    files[name] = tar.extractfile(member).read()
+        self._check_result(reader.result(), self._get_working_directory(path))
+        return files
+
+    @instrumented
+    def copy_tree(self, source, destination, from_container=False, compress=False):
+        """
+        Copies a directory tree in a single tar stream. Modes and mtimes are kept.
+
+        :param source: The directory that should be copied, on the host unless
+                       ``from_container`` is set.
+        :type source: str
+        :param destination: The directory the content of source is copied into, it is created
+                            if it is missing.
+        :type destination: str
+        :param from_container: Copy from the container to the host.
+        :type from_container: bool
+        :param compress: Compress the stream with gzip.
+        :type compress: bool
+        :raises DockerFileNotFoundError: If given an invalid path
+        :raises DockerWrapperBaseError: For other errors, e.g. if an archive from the container
+                                        has members or links outside of the destination
+        """
+        if from_container:
+            reader, tar = self._get_archive(['.'], source, compress)
+            with tar:
+                try:
+                    extract_archive(tar, destination)
+                except tarfile.ExtractError as error:
+                    reader.stream.close()
+                    raise errors.DockerWrapperBaseError(str(error))
+            self._check_result(reader.result(), self._get_working_directory(source))
+            return
+
+        if not os.path.isdir(source):
+            raise errors.DockerFileNotFoundError(source)
+
+        archive = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+        with tarfile.open(fileobj=archive, mode='w:gz' if compress else 'w') as tar:
+            tar.add(source, arcname='.')
+        self._check_result(self._put_archive(archive, destination, compress), destination)
 
-    def file_exist(self, path):
+    @instrumented
+    def sync_directory(self, host_path, container_path, delete=True, verify=False,
+                       compress=False):
+        """
+        Makes the directory in the container a copy of the directory on the host, sending only
+        what changed since the last sync. A manifest with size, mtime and sha1 of the files sent
+        is kept for each container path, thus files whose size and mtime are unchanged are not
+        even read again. Changed files and deletions are sent in a single tar stream.
+
+        :param host_path: The directory on the host.
+        :type host_path: str
+        :param container_path: The directory in the container, it is created if it is missing.
+        :type container_path: str
+        :param delete: Delete files in the container that were synced before and deleted on the
+                       host. Other files in the container, e.g. build outputs, are kept.
+        :type delete: bool
+        :param verify: Hash the files in the container instead of trusting the manifest, e.g. if
+                       they might have been changed by commands.
+        :type verify: bool
+        :param compress: Compress the stream with gzip.
+        :type compress: bool
+        :return: The paths that were sent and deleted.
+        :rtype: docker.helpers.SyncResult
+        :raises DockerFileNotFoundError: If the host path is not a directory
+        :raises DockerWrapperBaseError: For other errors
+        """
+        if not os.path.isdir(host_path):
+            raise errors.DockerFileNotFoundError(host_path)
+
+        destination = self._get_working_directory(container_path)
+        manifest = self._manifests.get(destination, {})
+        if verify:
+            remote = self._hash_files(destination)
+        else:
+            remote = dict((name, entry[2]) for name, entry in manifest.items())
+
+        current = {}
+        changed = []
+        for directory, _, names in os.walk(host_path):
+            prefix = os.path.relpath(directory, host_path).replace(os.sep, '/') + '/'
+            for name in names:
+                full_path = os.path.join(directory, name)
+                if not os.path.isfile(full_path):
+                    continue
+                relative_path = name if prefix == './' else prefix + name
+                stat = os.stat(full_path)
+                entry = manifest.get(relative_path)
+                if entry is None or entry[:2] != (stat.st_size, stat.st_mtime):
+                    entry = (stat.st_size, stat.st_mtime, self._hash_host_file(full_path))
+                current[relative_path] = entry
+                if remote.get(relative_path) != entry[2]:
+                    changed.append(relative_path)
+
+        deleted = sorted(name for name in manifest if name not in current)
+        if not delete:
+            current.update((name, manifest[name]) for name in deleted if name in manifest)
+            deleted = []
+
+        changed.sort()
+        if changed or deleted:
+            delete_list = '.docker-wrapper-delete-{0}'.format(uuid.uuid4().hex) if deleted else None
+            archive = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+            with tarfile.open(fileobj=archive, mode='w:gz' if compress else 'w') as tar:
+                for name in changed:
+                    with open(os.path.join(host_path, name), 'rb') as fd:
+                        add_to_archive(tar, name, fd)
+                if deleted:
+                    add_to_archive(tar, delete_list, '\0'.join(deleted))
+            self._check_result(self._put_archive(archive, destination, compress, delete_list),
+                               destination)
+
+        self._manifests[destination] = current
+        return SyncResult(changed, deleted)
+
+    @instrumented
+    def file_exist(self, path, timeout=None):
         """
         Checks whether a file exists or not.
 
         :param path: The path to the file.
         :type path: str
+        :param timeout: Seconds before the command is terminated, see :meth:`run`.
+        :type timeout: float
         :rtype: bool
+        :raises DockerTimeoutError: If the command timed out
         """
         path = self._get_working_directory(path)
-        return self.run('test -f {0}'.format(path)).return_code == 0
+        return self._cached('file_exist', path, lambda: self._test(
+            'test -f {0}'.format(path),
+            timeout
+        ))
 
-    def directory_exist(self, path):
+    @instrumented
+    def directory_exist(self, path, timeout=None):
         """
         Checks whether a directory exists or not.
 
         :param path: The path to the directory.
         :type path: str
+        :param timeout: Seconds before the command is terminated, see :meth:`run`.
+        :type timeout: float
         :rtype: bool
+        :raises DockerTimeoutError: If the command timed out
         """
         path = self._get_working_directory(path)
-        return self.run('test -d {0}'.format(path)).return_code == 0
+        return self._cached('directory_exist', path, lambda: self._test(
+            'test -d {0}'.format(path),
+            timeout
+        ))
+
+    @instrumented
+    def wait_for_file(self, path, timeout=60, interval=0.1):
+        """
+        Waits until the path exists with one loop in the container. The loop sleeps on inotify
+        events in the parent directory if inotifywait is installed, otherwise it polls.
 
-    def list_files(self, path, include_hidden=False):
+        :param path: The path to the file or directory.
+        :type path: str
+        :param timeout: Seconds to wait.
+        :type timeout: float
+        :param interval: Seconds between the checks when polling.
+        :type interval: float
+        :return: True if the path exists, False if the timeout expired.
+        :rtype: bool
+        :raises DockerWrapperBaseError: If the loop could not be run
+        """
+        path = self._get_working_directory(path)
+        return self._wait(
+            'wait_directory={directory}; if command -v inotifywait >/dev/null 2>&1; then '
+            'wait_once() {{ inotifywait -qq -t 1 -e create -e moved_to "$wait_directory" '
+            '2>/dev/null || sleep {interval}; }}; else wait_once() {{ sleep {interval}; }}; fi; '
+            'until [ -e {path} ]; do wait_once; done'.format(
+                path=path,
+                directory=posixpath.dirname(path.rstrip('/')) or '/',
+                interval=interval
+            ),
+            timeout,
+            invalidate=False
+        )
+
+    @instrumented
+    def wait_for_port(self, port, host='127.0.0.1', timeout=60, interval=0.1):
+        """
+        Waits until a TCP connection to the port can be opened from the container, with one loop
+        in the container.
+
+        :param port: The port number.
+        :type port: int
+        :param host: The host to connect to.
+        :type host: str
+        :param timeout: Seconds to wait.
+        :type timeout: float
+        :param interval: Seconds between the connection attempts.
+        :type interval: float
+        :return: True if the port accepted a connection, False if the timeout expired.
+        :rtype: bool
+        :raises DockerWrapperBaseError: If the loop could not be run
+        """
+        return self._wait(
+            'wait_address=/dev/tcp/{host}/{port}; '
+            'until (exec 3<>"$wait_address") 2>/dev/null; do sleep {interval}; done'.format(
+                host=host,
+                port=port,
+                interval=interval
+            ),
+            timeout,
+            invalidate=False
+        )
+
+    @instrumented
+    def wait_for_output(self, command, pattern, working_directory='', timeout=60, interval=0.1):
+        """
+        Runs the command repeatedly in one loop in the container until its output, stdout and
+        stderr, matches the pattern.
+
+        :param command: The command, e.g. ``curl -s localhost/health``.
+        :type command: str
+        :param pattern: An extended regular expression as understood by ``grep -E``. It is
+                        passed on stdin, thus it is not changed by quoting.
+        :type pattern: str
+        :param working_directory: The working directory of the command.
+        :type working_directory: str
+        :param timeout: Seconds to wait.
+        :type timeout: float
+        :param interval: Seconds between the runs of the command.
+        :type interval: float
+        :return: True if the output matched, False if the timeout expired.
+        :rtype: bool
+        :raises DockerWrapperBaseError: If the loop could not be run
+        """
+        return self._wait(
+            'wait_pattern=$(cat); until ({command}) 2>&1 | grep -q -E -e "$wait_pattern"; '
+            'do sleep {interval}; done'.format(
+                command=command,
+                interval=interval
+            ),
+            timeout,
+            working_directory=working_directory,
+            stdin=pattern
+        )
+
+    @instrumented
+    def list_files(self, path, include_hidden=False, timeout=None):
         """
         List files on a given path.
 
@@ -177,93 +739,215 @@ class Docker(object):
         :type path: str
         :param include_hidden: Include hidden files in output
         :type include_hidden: bool
+        :param timeout: Seconds before the command is terminated, see :meth:`run`.
+        :type timeout: float
         :return: An list of file names
         :rtype: list
         :raises DockerFileNotFoundError: If given an invalid path
+        :raises DockerTimeoutError: If the command timed out
         :raises DockerWrapperBaseError: For other errors
         """
 
         path = self._get_working_directory(path)
 
-        # Ignore dot files (hidden files) if include_hidden is enabled:
-        predicate = '' if include_hidden else '-not -path "*/\.*"'
-        # The printf part turns './file' into 'file':
-        result = self.run('find . {0} -maxdepth 1 -type f -printf "%P\n"'.format(predicate), path)
+        def list_files():
+            result = self.run(self._get_list_files_command(include_hidden), path,
+                              invalidate=False, timeout=timeout)
+            self._check_result(result, path)
+            return self._parse_files(result.out)
 
-        if not result.succeeded:
-            if errors.FILE_NOT_FOUND_PREDICATE in result.err:
-                raise errors.DockerFileNotFoundError(path)
+        return list(self._cached(('list_files', include_hidden), path, list_files))
 
-            raise errors.DockerWrapperBaseError(result.err)
+    @instrumented
+    def walk(self, path='', max_depth=None, include_hidden=False, timeout=None):
+        """
+        Lists all files and directories below the given path in a single exec.
 
-        out = result.out.strip()
-        return sorted(out.split('\n')) if out else []
+        :param path: The path to the directory.
+        :type path: str
+        :param max_depth: How many levels of directories to descend, all levels if not set.
+        :type max_depth: int
+        :param include_hidden: Include hidden files and directories, and their content.
+        :type include_hidden: bool
+        :param timeout: Seconds before the command is terminated, see :meth:`run`.
+        :type timeout: float
+        :return: A list of entries with paths relative to the given path.
+        :rtype: list of docker.helpers.FileEntry
+        :raises DockerFileNotFoundError: If given an invalid path
+        :raises DockerTimeoutError: If the command timed out
+        :raises DockerWrapperBaseError: For other errors
+        """
+        path = self._get_working_directory(path)
+        predicates = ['-mindepth 1']
+        if max_depth is not None:
+            predicates.append('-maxdepth {0}'.format(max_depth))
+        if not include_hidden:
+            predicates.append('-not -path "*/.*"')
+
+        result = self.run(
+            'find . {0} -printf "{1}%P\\0"'.format(' '.join(predicates), FIND_FORMAT),
+            path,
+            invalidate=False,
+            timeout=timeout
+        )
+        self._check_result(result, path)
+        return sorted(parse_file_entries(result.out))
 
-    def list_directories(self, path, include_trailing_slash=True):
+    @instrumented
+    def stat_many(self, paths, timeout=None):
+        """
+        Gets the type, size, mode and mtime of many paths in a single exec.
+
+        :param paths: The paths, relative paths are relative to the home directory.
+        :type paths: list
+        :param timeout: Seconds before the command is terminated, see :meth:`run`.
+        :type timeout: float
+        :return: A dict of the given paths and their entries, missing paths have None.
+        :rtype: dict
+        :raises DockerTimeoutError: If the command timed out
+        :raises DockerWrapperBaseError: For other errors
+        """
+        if not paths:
+            return {}
+
+        command = ' ; '.join([
+            'find {0} -maxdepth 0 -printf "{1}" 2>/dev/null || printf "n\\0\\0\\0\\0"'.format(
+                self._get_working_directory(path),
+                FIND_FORMAT
+            )
+            for path in paths
+        ])
+        result = self.run(command, invalidate=False, timeout=timeout)
+        self._check_result(result, '')
+        return dict(zip(paths, parse_file_entries(result.out, list(paths))))
+
+    @instrumented
+    def list_directories(self, path, include_trailing_slash=True, timeout=None):
         """
         List directories on a given path.
 
         :param path: The path to the directory.
         :type path: str
+        :param include_trailing_slash: End the names with a slash.
+        :type include_trailing_slash: bool
+        :param timeout: Seconds before the command is terminated, see :meth:`run`.
+        :type timeout: float
         :return: An list of directory names
         :rtype: list
         :raises DockerFileNotFoundError: If given an invalid path
+        :raises DockerTimeoutError: If the command timed out
         :raises DockerWrapperBaseError: For other errors
         """
 
-        files = []
         path = self._get_working_directory(path)
-        result = self.run('ls -dm */', path)
 
-        if not result.succeeded:
-            if errors.FILE_NOT_FOUND_PREDICATE in result.err:
-                raise errors.DockerFileNotFoundError(path)
+        def list_directories():
+            result = self.run('ls -dm */', path, invalidate=False, timeout=timeout)
+            self._check_result(result, path)
+            return self._parse_directories(result.out, include_trailing_slash)
 
-            raise errors.DockerWrapperBaseError(result.err)
+        return list(self._cached(('list_directories', include_trailing_slash), path,
+                                 list_directories))
 
-        for file_path in result.out.strip().split(', '):
-            if include_trailing_slash:
-                files.append(file_path)
-            else:
-                files.append(file_path[:-1])
+    @instrumented
+    def start(self):
+        """
+        Starts a container based on the parameters passed to __init__. It returns before the
+        container is started if ``background_start`` or ``lazy_start`` is set.
 
-        return files
+        :return: The docker object
+        """
+        if self.lazy_start:
+            self._start_pending = True
+        elif self.background_start:
+            self._start_error = None
+            self._start_thread = threading.Thread(target=self._start_in_background,
+                                                  name='docker-start')
+            self._start_thread.daemon = True
+            self._start_thread.start()
+        else:
+            self._start()
+        self.running = True
+        return self
 
-    def start(self):
+    @instrumented
+    def stop(self, wait=None):
         """
-        Starts a container based on the parameters passed to __init__.
+        Stops the container started by this class instance. Open sessions are closed before the
+        container is killed and removed in one operation.
 
+        :param wait: Wait for the container to be removed, defaults to not ``deferred_stop``.
+        :type wait: bool
         :return: The docker object
         """
-        if self.privilege:
-            command_string = 'docker run -d --privileged {0} --name {1} {2} /bin/sleep {3}'
+        self.running = False
+        if self.deferred_stop if wait is None else not wait:
+            teardown.schedule(self._remove)
         else:
-            command_string = 'docker run -d {0} --name {1} {2} /bin/sleep {3}'
+            self._remove()
+        return self
 
-        result = execute(command_string.format(
-            self.ports,
-            self.container_name,
-            self.image,
-            self.timeout
-        ))
+    @instrumented
+    def cached_setup(self, commands, working_directory='', cache=None):
+        """
+        Brings the container to the state after running the setup commands, using a snapshot
+        image if the same commands have been run on the same image before, in the same working
+        directory and with the same environment variables. On a miss the commands are run and the
+        container is committed as a snapshot. On a hit the container is started, or restarted,
+        from the snapshot. The manager keeps using the snapshot image, thus later
+        calls to ``start`` start from it too. The container is started if it is not running.
 
-        if not result.succeeded:
-            raise errors.DockerUnavailableError(
-                'Starting the docker container failed.\n{0}'.format(result.err)
-            )
+        :param commands: The setup commands, run one at a time.
+        :type commands: list
+        :param working_directory: The working directory of the commands.
+        :type working_directory: str
+        :param cache: The snapshot cache, defaults to ``docker.snapshots.default_cache``.
+        :type cache: docker.snapshots.SnapshotCache
+        :return: True if a snapshot was used.
+        :rtype: bool
+        :raises DockerWrapperBaseError: If a setup command failed
+        """
+        cache = cache or snapshots.default_cache
+        key = cache.key(self.image, commands, self._get_working_directory(working_directory),
+                        self.env_variables)
+        image = cache.get(key)
+        if image is not None:
+            if self.running:
+                self.running = False
+                self._remove()
+            self.image = image
+            self.start()
+            return True
 
-        return self
+        if not self.running:
+            self.start()
+        for command in commands:
+            result = self.run(command, working_directory)
+            if not result.succeeded:
+                raise errors.DockerWrapperBaseError(
+                    'The setup command "{0}" failed.\n{1}'.format(command, result.err)
+                )
+        self.image = cache.commit(self, key)
+        return False
 
-    def stop(self):
+    @staticmethod
+    def reap(name_prefix='dyn', older_than=reaper.OLDER_THAN, batch_size=reaper.BATCH_SIZE):
         """
-        Stops the container started by this class instance.
+        Removes containers with the name prefix that were never stopped, e.g. because the worker
+        that started them crashed. Use :class:`docker.reaper.Reaper` to reap in the background.
+        See :func:`docker.reaper.reap`.
 
-        :return: The docker object
+        :param name_prefix: The name_prefix of the docker managers.
+        :type name_prefix: str
+        :param older_than: Only remove containers created more than this many seconds ago, it
+                           should be longer than the longest job.
+        :type older_than: float
+        :param batch_size: The max number of containers removed by one docker rm.
+        :type batch_size: int
+        :return: The names of the removed containers.
+        :rtype: list
         """
-        sleep(2)
-        execute('docker kill {0}'.format(self.container_name))
-        execute('docker rm {0}'.format(self.container_name))
-        return self
+        return reaper.reap(name_prefix, older_than, batch_size)
 
     @staticmethod
     def wrap(*wrap_args, **wrap_kwargs):
@@ -285,6 +969,443 @@ class Docker(object):
 
         return activate
 
+    def _start(self):
+        reaper.register(self.container_name)
+        self._invalidate(True)
+        self._manifests.clear()
+        if self.transport:
+            self.transport.start(self)
+            return
+
+        result = execute(self._get_start_command())
+
+        if not result.succeeded:
+            raise errors.DockerUnavailableError(
+                'Starting the docker container failed.\n{0}'.format(result.err)
+            )
+
+    def _start_in_background(self):
+        with operation('start'):
+            try:
+                self._start()
+            except Exception as error:
+                self._start_error = error
+
+    def _ensure_started(self):
+        """
+        Waits for a background start, or starts the container if the start was deferred. The
+        error of a failed background start is raised by every call until the container is stopped.
+
+        :raises DockerUnavailableError: If starting the container failed
+        """
+        with self._start_lock:
+            if self._start_thread is not None:
+                self._start_thread.join()
+                self._start_thread = None
+            if self._start_pending:
+                self._start()
+                self._start_pending = False
+            if self._start_error is not None:
+                raise self._start_error
+
+    def _get_start_command(self):
+        """
+        Builds the docker run command that starts the container.
+
+        :rtype: str or list
+        """
+        if self.argv:
+            args = ['docker', 'run', '-d']
+            if self.privilege:
+                args.append('--privileged')
+            for port_mapping in self.ports_mapping:
+                args.extend(['-p', port_mapping])
+            return args + self._get_resource_args() + self._get_mount_args() + [
+                '--label', self._get_owner_label(), '--name', self.container_name, self.image,
+                '/bin/sleep', str(self.timeout)
+            ]
+
+        if self.privilege:
+            command_string = 'docker run -d --privileged {0} --name {1} {2} /bin/sleep {3}'
+        else:
+            command_string = 'docker run -d {0} --name {1} {2} /bin/sleep {3}'
+
+        return command_string.format(
+            ' '.join(
+                option for option in
+                [self.ports] + self._get_resource_args() + self._get_mount_args() +
+                ['--label', self._get_owner_label()] if option
+            ),
+            self.container_name,
+            self.image,
+            self.timeout
+        )
+
+    @staticmethod
+    def _get_owner_label():
+        """
+        The label that tells the reaper which process started the container.
+
+        :rtype: str
+        """
+        return '{0}={1}'.format(reaper.OWNER_LABEL, reaper.owner())
+
+    def _get_mount_args(self):
+        args = []
+        for volume in self.volumes:
+            args.extend(['-v', volume])
+        for path in self.tmpfs:
+            args.extend(['--tmpfs', path])
+        return args
+
+    def _get_resource_args(self):
+        args = []
+        if self.cpus is not None:
+            args.extend(['--cpus', str(self.cpus)])
+        if self.memory is not None:
+            args.extend(['--memory', str(self.memory)])
+        return args
+
+    def _get_exec_command(self, command, working_directory='', login=False, tty=False,
+                          combine_outputs=None, timeout=None):
+        """
+        Builds the docker exec command that runs the given command with bash in the container.
+        It is an argument list if argv is set.
+
+        :rtype: str or list
+        """
+        if self.argv:
+            command_string = 'cd {0} && {1}'.format(
+                self._get_working_directory(working_directory),
+                command
+            )
+            if self.combine_outputs if combine_outputs is None else combine_outputs:
+                command_string = 'exec 2>&1; ' + command_string
+            return self._get_shell_args(login, tty, timeout) + ['-c', command_string]
+
+        return '{shell} -c \'{command}\''.format(
+            shell=self._get_shell_command(login, tty, timeout),
+            command=self._get_command_string(
+                command.replace('\'', '"'),
+                working_directory,
+                combine_outputs
+            )
+        )
+
+    def _get_shell_command(self, login=False, tty=False, timeout=None):
+        """
+        Builds the docker exec command that starts bash in the container.
+
+        :rtype: str
+        """
+        return 'docker exec -i{tty} {container} {timeout}bash{login}'.format(
+            container=self.container_name,
+            login=' --login' if login else '',
+            tty=' -t' if tty else '',
+            timeout=self._get_timeout_prefix(timeout)
+        )
+
+    def _get_shell_args(self, login=False, tty=False, timeout=None):
+        """
+        Builds the docker exec argument list that starts bash in the container.
+
+        :rtype: list
+        """
+        args = self._exec_args[tty] + self._get_timeout_args(timeout) + ['bash']
+        if login:
+            args.append('--login')
+        return args
+
+    def _get_timeout_command_string(self, command, working_directory, timeout):
+        """
+        Builds the command string for the session and transports, wrapped in a bash that is
+        started with timeout if a timeout is given.
+
+        :rtype: str
+        """
+        command = self._get_command_string(command, working_directory)
+        if timeout is None:
+            return command
+        return '{0}bash -c {1}'.format(self._get_timeout_prefix(timeout), shell_quote(command))
+
+    @staticmethod
+    def _get_timeout_prefix(timeout):
+        """
+        :return: The timeout command that kills the process group of the command when the
+                 timeout expires, or an empty string if timeout is not set.
+        :rtype: str
+        """
+        return ''.join(arg + ' ' for arg in Docker._get_timeout_args(timeout))
+
+    @staticmethod
+    def _get_timeout_args(timeout):
+        if timeout is None:
+            return []
+        return ['timeout', '-k', str(KILL_GRACE), str(timeout)]
+
+    def _get_command_string(self, command, working_directory, combine_outputs=None):
+        """
+        Builds the command string that is passed to bash inside the container. It changes
+        directory and sets the environment variables before running the command.
+
+        :param command: The command that should be run.
+        :type command: str
+        :param working_directory: The path to the directory where the command should be run.
+        :type working_directory: str
+        :param combine_outputs: Overrides combine_outputs of the manager.
+        :type combine_outputs: bool
+        :rtype: str
+        """
+        command_string = 'cd {working_directory} && {envs} {command}'
+
+        if self.combine_outputs if combine_outputs is None else combine_outputs:
+            command_string += ' 2>&1'
+
+        env_string = ' '.join([
+            '{0}={1}'.format(key, self.env_variables[key]) for key in self.env_variables
+        ])
+
+        return command_string.format(
+            working_directory=self._get_working_directory(working_directory),
+            envs=env_string,
+            command=command
+        )
+
+    def _cached(self, kind, path, func):
+        """
+        Gets the value from the metadata cache, or calls func and caches its return value.
+        """
+        if self.metadata_cache is None:
+            return func()
+
+        found, value = self.metadata_cache.get(kind, path)
+        if not found:
+            value = func()
+            self.metadata_cache.set(kind, path, value)
+        return value
+
+    def _invalidate(self, paths):
+        """
+        Invalidates the metadata cache entries of the given paths. True invalidates everything.
+        """
+        if self.metadata_cache is None or not paths:
+            return
+        if paths is True:
+            self.metadata_cache.clear()
+            return
+        for path in paths:
+            self.metadata_cache.invalidate(self._get_working_directory(path))
+
+    def _test(self, command, timeout):
+        """
+        Runs a test command.
+
+        :return: True if the command succeeded.
+        :rtype: bool
+        :raises DockerTimeoutError: If the command timed out
+        """
+        result = self.run(command, invalidate=False, timeout=timeout)
+        if result.timed_out:
+            raise errors.DockerTimeoutError()
+        return result.return_code == 0
+
+    def _wait(self, script, timeout, working_directory='', stdin='', invalidate=True):
+        """
+        Runs a loop that exits when the condition holds.
+
+        :return: True if the loop exited, False if the timeout expired.
+        :rtype: bool
+        :raises DockerWrapperBaseError: If the loop failed
+        """
+        result = self.run(script, working_directory, stdin, invalidate=invalidate,
+                          timeout=timeout)
+        if result.timed_out:
+            return False
+        if not result.succeeded:
+            raise errors.DockerWrapperBaseError(result.err)
+        return True
+
+    def _run_script(self, script, login=False):
+        """
+        Runs a bash script in a single call. The script is passed on stdin when the docker
+        command line client is used, thus it is not changed by quoting.
+
+        :rtype: ProcessResult
+        """
+        self._ensure_started()
+        if self.transport:
+            return self.transport.run(self, script, '', login, False)
+        if self.session:
+            return self._get_session(login).execute(script)
+        if self.argv:
+            return execute(self._get_shell_args(login) + ['-s'], script)
+        return execute('{0} -s'.format(self._get_shell_command(login)), script)
+
+    def _remove(self):
+        with self._start_lock:
+            if self._start_pending:
+                # The container was never started.
+                self._start_pending = False
+                return
+            if self._start_thread is not None:
+                self._start_thread.join()
+                self._start_thread = None
+            self._start_error = None
+
+        with operation('stop'):
+            self._close_sessions()
+            self._invalidate(True)
+            if self.transport:
+                self.transport.stop(self)
+            elif self.argv:
+                execute(['docker', 'rm', '-f', self.container_name])
+            else:
+                execute('docker rm -f {0}'.format(self.container_name))
+            reaper.unregister(self.container_name)
+
+    def _put_archive(self, archive, path, compress, delete_list=None):
+        """
+        Extracts the tar archive in the given directory in the container.
+
+        :param archive: A file-like object with the archive.
+        :param delete_list: The name of a file in the archive with NUL-separated paths that are
+                            deleted after the archive is extracted. The paths are not passed
+                            on the command line, thus they are not changed by quoting.
+        :type delete_list: str
+        :rtype: ProcessResult
+        """
+        self._ensure_started()
+        archive.seek(0)
+        path = self._get_working_directory(path)
+        self._invalidate([path])
+        command = 'mkdir -p {0} && tar -x{1} --no-same-owner -f - -C {0}'.format(
+            path,
+            'z' if compress else ''
+        )
+        if delete_list:
+            command += ' && cd {0} && xargs -0 -r rm -f -- < {1} && rm -f {1}'.format(
+                path,
+                delete_list
+            )
+        with archive:
+            return execute_stream(
+                self._get_exec_command(command, combine_outputs=False),
+                archive,
+                decode=False
+            ).collect()
+
+    def _hash_files(self, path):
+        """
+        Hashes the files below the path inside the container.
+
+        :return: A dict of paths relative to path and their sha1, empty if the path is missing.
+        :rtype: dict
+        """
+        result = self.run(
+            'hash_directory={0}; if cd "$hash_directory" 2>/dev/null; then '
+            'find . -type f -exec sha1sum -- {{}} +; fi'.format(path),
+            invalidate=False
+        )
+        self._check_result(result, path)
+        hashes = {}
+        for line in result.out.splitlines():
+            digest, name = line[:40], line[42:]
+            hashes[name[2:] if name.startswith('./') else name] = digest
+        return hashes
+
+    @staticmethod
+    def _hash_host_file(path):
+        digest = hashlib.sha1()
+        with open(path, 'rb') as fd:
+            for chunk in iter(lambda: fd.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _get_archive(self, paths, path, compress):
+        """
+        Starts a tar command in the container that writes the paths to stdout.
+
+        :return: The reader of the stream and the tar archive reading from it.
+        :rtype: tuple
+        """
+        self._ensure_started()
+        command = 'tar -c{0} -f - -- {1}'.format('z' if compress else '', ' '.join(paths))
+        reader = execute_stream(
+            self._get_exec_command(command, path, combine_outputs=False),
+            decode=False
+        ).reader()
+
+        try:
+            return reader, tarfile.open(fileobj=reader, mode='r|*')
+        except tarfile.ReadError as error:
+            self._check_result(reader.result(), self._get_working_directory(path))
+            raise errors.DockerWrapperBaseError(str(error))
+
+    def _get_session(self, login):
+        """
+        Gets the shell session for the given login mode, a new one is created if it does not
+        exist. The session itself is started on the first command.
+
+        :param login: Whether the shell should be a login shell.
+        :type login: bool
+        :rtype: ShellSession
+        """
+        if login not in self._sessions:
+            args = ['docker', 'exec', '-i', self.container_name, 'bash']
+            if login:
+                args.append('--login')
+            self._sessions[login] = ShellSession(args)
+        return self._sessions[login]
+
+    def _close_sessions(self):
+        for session in self._sessions.values():
+            session.close()
+        self._sessions = {}
+
+    @staticmethod
+    def _get_list_files_command(include_hidden):
+        # Ignore dot files (hidden files) if include_hidden is enabled:
+        predicate = '' if include_hidden else '-not -path "*/\.*"'
+        # The printf part turns './file' into 'file':
+        return 'find . {0} -maxdepth 1 -type f -printf "%P\n"'.format(predicate)
+
+    @staticmethod
+    def _parse_files(out):
+        out = out.strip()
+        return sorted(out.split('\n')) if out else []
+
+    @staticmethod
+    def _parse_directories(out, include_trailing_slash):
+        files = []
+        for file_path in out.strip().split(', '):
+            if include_trailing_slash:
+                files.append(file_path)
+            else:
+                files.append(file_path[:-1])
+        return files
+
+    @staticmethod
+    def _check_result(result, path):
+        """
+        Raises an error if the result tells that the command failed.
+
+        :raises DockerFileNotFoundError: If the error is caused by an invalid path
+        :raises DockerOutputTruncatedError: If the output was truncated by max_output
+        :raises DockerTimeoutError: If the command timed out
+        :raises DockerWrapperBaseError: For other errors
+        """
+        if result.timed_out:
+            raise errors.DockerTimeoutError()
+
+        if not result.succeeded:
+            if errors.FILE_NOT_FOUND_PREDICATE in result.err:
+                raise errors.DockerFileNotFoundError(path)
+
+            raise errors.DockerWrapperBaseError(result.err)
+
+        if result.out_truncated:
+            raise errors.DockerOutputTruncatedError()
+
     @staticmethod
     def _get_working_directory(working_directory):
         """
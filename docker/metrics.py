@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+import functools
+import logging
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+observers = []
+# The last value of each gauge, e.g. the number of leaked containers found by the reaper.
+gauges = {}
+
+_local = threading.local()
+
+
+class Execution(object):
+    """
+    Timings and sizes of one process started by :func:`docker.helpers.execute` or
+    :func:`docker.helpers.execute_stream`. The timestamps are from ``time.time()`` and are None
+    until the step has happened.
+    """
+
+    def __init__(self, command, operation=None):
+        self.command = command
+        self.operation = operation
+        self.started = time.time()
+        self.spawned = None
+        self.first_byte = None
+        self.exited = None
+        self.finished = None
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.return_code = None
+
+    @property
+    def duration(self):
+        """
+        The wall time from start until the result was complete, or until exit if it was not. The
+        output of :func:`docker.helpers.execute` is decoded later, when it is read, thus the
+        decoding is not included.
+        """
+        end = self.finished or self.exited
+        return end - self.started if end is not None else None
+
+
+class Observer(object):
+    """
+    Base class for observers of process executions. Register an instance with
+    :func:`add_observer` and override the hooks of interest. The hooks are called in the thread
+    that runs the process, exceptions raised by them are logged and ignored. The hooks are
+    called in the order ``spawned``, ``first_byte``, unless there was no output, ``exited`` and
+    ``finished``, when the output has been read and the result is complete.
+    """
+
+    def spawned(self, execution):
+        pass
+
+    def first_byte(self, execution):
+        pass
+
+    def exited(self, execution):
+        pass
+
+    def finished(self, execution):
+        pass
+
+    def gauge(self, name, value):
+        pass
+
+
+class MetricsAggregator(Observer):
+    """
+    Collects the wall time of executions in memory and reports count, p50 and p99 per operation.
+    """
+
+    def __init__(self, max_samples=10000):
+        """
+        :param max_samples: The max number of wall times kept per operation, the oldest are
+                            dropped first.
+        :type max_samples: int
+        """
+        self.max_samples = max_samples
+        self._operations = {}
+        self._lock = threading.Lock()
+
+    def finished(self, execution):
+        with self._lock:
+            operation = self._operations.get(execution.operation)
+            if operation is None:
+                operation = self._operations[execution.operation] = {
+                    'count': 0,
+                    'failures': 0,
+                    'bytes_in': 0,
+                    'bytes_out': 0,
+                    'durations': deque(maxlen=self.max_samples),
+                }
+            operation['count'] += 1
+            operation['failures'] += execution.return_code != 0
+            operation['bytes_in'] += execution.bytes_in
+            operation['bytes_out'] += execution.bytes_out
+            operation['durations'].append(execution.duration)
+
+    def report(self):
+        """
+        :return: A dict with count, failures, bytes_in, bytes_out, p50 and p99 in seconds for
+                 each operation. Executions outside of a docker manager method are reported
+                 under None.
+        :rtype: dict
+        """
+        with self._lock:
+            report = {}
+            for name, operation in self._operations.items():
+                durations = sorted(operation['durations'])
+                report[name] = dict(
+                    (key, value) for key, value in operation.items() if key != 'durations'
+                )
+                report[name]['p50'] = percentile(durations, 50)
+                report[name]['p99'] = percentile(durations, 99)
+            return report
+
+    def reset(self):
+        with self._lock:
+            self._operations.clear()
+
+
+def add_observer(observer):
+    """
+    Registers an observer that is notified about every execution.
+
+    :type observer: Observer
+    """
+    observers.append(observer)
+
+
+def remove_observer(observer):
+    observers.remove(observer)
+
+
+def notify(hook, *args):
+    for observer in list(observers):
+        try:
+            getattr(observer, hook)(*args)
+        except Exception:
+            logger.exception('Observer {0} failed in {1}'.format(observer, hook))
+
+
+def set_gauge(name, value):
+    """
+    Records the current value of a gauge and passes it to the ``gauge`` hook of the observers.
+
+    :type name: str
+    :type value: int or float
+    """
+    gauges[name] = value
+    notify('gauge', name, value)
+
+
+def current_operation():
+    """
+    :return: The name of the docker manager method running in this thread.
+    :rtype: str
+    """
+    return getattr(_local, 'operation', None)
+
+
+@contextmanager
+def operation(name):
+    """
+    Tags the executions in the block with the operation name. Nested operations keep the
+    outermost name, thus a ``read_file`` that calls ``run`` is reported as ``read_file``.
+    """
+    previous = current_operation()
+    if previous is None:
+        _local.operation = name
+    try:
+        yield
+    finally:
+        _local.operation = previous
+
+
+def instrumented(func):
+    """
+    Decorator that tags the executions of a method with the method name.
+    """
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with operation(func.__name__):
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+def percentile(values, percent):
+    """
+    :param values: Sorted values.
+    :type values: list
+    :return: The nearest-rank percentile, None if there are no values.
+    """
+    if not values:
+        return None
+    rank = int(math.ceil(percent / 100.0 * len(values)))
+    return values[max(rank, 1) - 1]
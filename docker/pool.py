@@ -0,0 +1,340 @@
+# -*- coding: utf-8 -*-
+import logging
+import threading
+import time
+from collections import deque
+
+from docker import errors
+from docker.manager import Docker
+
+logger = logging.getLogger(__name__)
+
+# Idle containers are not handed out when less than this many seconds, or a tenth of their
+# timeout, remain before their /bin/sleep ends.
+EXPIRY_MARGIN = 60
+
+
+class DockerPool(object):
+    """
+    Keeps pre-started containers for each set of docker manager arguments, thus jobs do not have
+    to wait for the container to start. Containers are handed out with ``pool.container()`` or
+    ``pool.wrap()`` and either reset or recycled when they are returned.
+    """
+
+    def __init__(self, size=2, max_size=None, reset_command=None, idle_timeout=None,
+                 background=True):
+        """
+        :param size: The number of idle containers kept for each set of arguments.
+        :type size: int
+        :param max_size: The max number of containers, idle and in use, for each set of
+                         arguments. Acquiring blocks when the limit is reached.
+        :type max_size: int
+        :param reset_command: A command that resets a returned container so it can be reused,
+                              e.g. 'rm -rf ~/*'. Returned containers are stopped and replaced
+                              if this is not set or if the command fails.
+        :type reset_command: str
+        :param idle_timeout: Idle containers are stopped after this many seconds.
+        :type idle_timeout: float
+        :param background: Start replacement containers in a background thread.
+        :type background: bool
+        """
+        self.size = size
+        self.max_size = max_size
+        self.reset_command = reset_command
+        self.idle_timeout = idle_timeout
+        self.background = background
+        self.closed = False
+        self._slots = {}
+        self._in_use = {}
+        self._started = {}
+        self._condition = threading.Condition()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.close()
+
+    def container(self, *args, **kwargs):
+        """
+        Gets a context manager that hands out a container from the pool on enter and returns
+        it on exit. It accepts the same arguments as :class:`docker.manager.Docker`, and
+        ``acquire_timeout``, see :meth:`acquire`.
+
+        :rtype: PooledContainer
+        """
+        return PooledContainer(self, args, kwargs)
+
+    def wrap(self, *wrap_args, **wrap_kwargs):
+        """
+        Decorator that works like :meth:`docker.manager.Docker.wrap`, but with a container from
+        the pool.
+
+        :return: The decorated function.
+        """
+
+        def activate(func):
+            def wrapper(*args, **kwargs):
+                with self.container(*wrap_args, **wrap_kwargs) as docker:
+                    kwargs['docker'] = docker
+                    return func(*args, **kwargs)
+
+            return wrapper
+
+        return activate
+
+    def acquire(self, *args, **kwargs):
+        """
+        Hands out a started container. A new container is started if there are no idle
+        containers for the arguments. Idle containers that are about to reach their timeout are
+        stopped instead of handed out. The other arguments are passed to
+        :class:`docker.manager.Docker`.
+
+        :param acquire_timeout: Seconds to wait when the pool is full, waits forever if not set.
+        :type acquire_timeout: float
+        :rtype: docker.manager.Docker
+        :raises DockerUnavailableError: If no container became available before the timeout.
+        """
+        timeout = kwargs.pop('acquire_timeout', None)
+        key = make_key(args, kwargs)
+        deadline = time.time() + timeout if timeout is not None else None
+        docker = None
+        self.evict_idle()
+
+        with self._condition:
+            if self.closed:
+                raise errors.DockerUnavailableError('The docker pool is closed')
+
+            slot = self._slots.setdefault(key, PoolSlot(args, kwargs))
+            while True:
+                if slot.idle:
+                    docker = slot.idle.pop()[0]
+                    break
+                if self._has_room(slot):
+                    slot.total += 1
+                    break
+
+                remaining = deadline - time.time() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    raise errors.DockerUnavailableError('No container available in the pool')
+                self._condition.wait(remaining)
+
+        if docker is None:
+            docker = self._start(slot)
+
+        with self._condition:
+            self._in_use[docker.container_name] = key
+        self._refill(key)
+        return docker
+
+    def release(self, docker, discard=False):
+        """
+        Returns a container to the pool. It is reset with the reset command, or stopped and
+        replaced if it cannot be reset.
+
+        :param docker: A container handed out by this pool.
+        :type docker: docker.manager.Docker
+        :param discard: Stop the container instead of resetting it.
+        :type discard: bool
+        """
+        with self._condition:
+            key = self._in_use.pop(docker.container_name)
+            slot = self._slots[key]
+
+        reusable = not discard and not self.closed and self.reset_command is not None
+        if reusable:
+            try:
+                reusable = docker.run(self.reset_command).succeeded
+            except errors.DockerWrapperBaseError:
+                reusable = False
+
+        with self._condition:
+            if reusable and not self.closed:
+                slot.idle.append((docker, time.time()))
+            else:
+                slot.total -= 1
+            self._condition.notify_all()
+
+        if not reusable:
+            self._stop(docker)
+            self._refill(key)
+        self.evict_idle()
+
+    def evict_idle(self):
+        """
+        Stops containers that have been idle for longer than the idle timeout, and containers
+        that are about to reach their timeout, since they are removed when their ``/bin/sleep``
+        ends. It is called by ``acquire`` and ``release``.
+
+        :return: The number of stopped containers.
+        :rtype: int
+        """
+        evicted = []
+        now = time.time()
+        limit = now - self.idle_timeout if self.idle_timeout is not None else None
+        with self._condition:
+            for slot in self._slots.values():
+                kept = deque()
+                for docker, idle_since in slot.idle:
+                    if limit is not None and idle_since < limit or self._expired(docker, now):
+                        evicted.append(docker)
+                        slot.total -= 1
+                    else:
+                        kept.append((docker, idle_since))
+                slot.idle = kept
+            self._condition.notify_all()
+
+        for docker in evicted:
+            self._stop(docker)
+        return len(evicted)
+
+    def close(self):
+        """
+        Stops all idle containers. Containers in use are stopped when they are released.
+        """
+        idle = []
+        with self._condition:
+            self.closed = True
+            for slot in self._slots.values():
+                idle.extend(docker for docker, _ in slot.idle)
+                slot.total -= len(slot.idle)
+                slot.idle.clear()
+            self._condition.notify_all()
+
+        for docker in idle:
+            self._stop(docker)
+
+    def stats(self):
+        """
+        :return: The number of idle containers and containers in total for each key.
+        :rtype: dict
+        """
+        with self._condition:
+            return dict(
+                (key, {'idle': len(slot.idle), 'total': slot.total})
+                for key, slot in self._slots.items()
+            )
+
+    def _expired(self, docker, now):
+        started = self._started.get(docker.container_name)
+        if started is None:
+            return False
+        return now >= started + docker.timeout - min(EXPIRY_MARGIN, docker.timeout / 10.0)
+
+    def _has_room(self, slot):
+        return self.max_size is None or slot.total < self.max_size
+
+    def _start(self, slot):
+        try:
+            docker = Docker(*slot.args, **slot.kwargs).start()
+        except Exception:
+            with self._condition:
+                slot.total -= 1
+                self._condition.notify_all()
+            raise
+
+        with self._condition:
+            self._started[docker.container_name] = time.time()
+        return docker
+
+    def _stop(self, docker):
+        with self._condition:
+            self._started.pop(docker.container_name, None)
+        try:
+            docker.stop()
+        except Exception:
+            logger.exception('Stopping pooled container {0} failed'.format(docker.container_name))
+
+    def _refill(self, key):
+        with self._condition:
+            slot = self._slots[key]
+            if slot.refilling or self.closed:
+                return
+            slot.refilling = True
+
+        if self.background:
+            thread = threading.Thread(target=self._fill, args=(slot,))
+            thread.daemon = True
+            thread.start()
+        else:
+            self._fill(slot)
+
+    def _fill(self, slot):
+        try:
+            while True:
+                with self._condition:
+                    if self.closed or len(slot.idle) >= self.size or not self._has_room(slot):
+                        return
+                    slot.total += 1
+
+                try:
+                    docker = self._start(slot)
+                except errors.DockerWrapperBaseError:
+                    logger.exception('Starting pooled container failed')
+                    return
+
+                with self._condition:
+                    if self.closed:
+                        slot.total -= 1
+                    else:
+                        slot.idle.append((docker, time.time()))
+                        docker = None
+                    self._condition.notify_all()
+
+                if docker is not None:
+                    self._stop(docker)
+        finally:
+            with self._condition:
+                slot.refilling = False
+
+
+class PoolSlot(object):
+    """
+    The containers of a pool for one set of docker manager arguments.
+    """
+
+    def __init__(self, args, kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        self.idle = deque()
+        self.total = 0
+        self.refilling = False
+
+
+class PooledContainer(object):
+    """
+    Context manager that acquires a container from a pool on enter and releases it on exit. The
+    container is discarded if the block raised an exception.
+    """
+
+    def __init__(self, pool, args, kwargs):
+        self.pool = pool
+        self.args = args
+        self.kwargs = kwargs
+        self.docker = None
+
+    def __enter__(self):
+        self.docker = self.pool.acquire(*self.args, **self.kwargs)
+        return self.docker
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        docker, self.docker = self.docker, None
+        self.pool.release(docker, discard=exc_type is not None)
+
+
+def make_key(args, kwargs):
+    """
+    Makes a hashable key of docker manager arguments, e.g. image, privilege, ports and
+    environment variables.
+
+    :rtype: tuple
+    """
+    return freeze(args), freeze(kwargs)
+
+
+def freeze(value):
+    if isinstance(value, dict):
+        return tuple(sorted((key, freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+import calendar
+import errno
+import logging
+import os
+import socket
+import threading
+import time
+
+from docker import errors
+from docker.helpers import execute
+from docker.metrics import set_gauge
+
+logger = logging.getLogger(__name__)
+
+# The max number of containers removed by one docker rm.
+BATCH_SIZE = 50
+# Containers without an owner, or with an owner on another host, younger than this might belong
+# to a live worker in another process.
+OLDER_THAN = 3600
+# The label with the host and the pid of the process that started a container.
+OWNER_LABEL = 'docker-wrapper.owner'
+# The gauge with the number of orphaned containers found by the last reap.
+LEAK_GAUGE = 'leaked_containers'
+
+# The containers of the docker managers in this process, they are never reaped.
+active = set()
+_lock = threading.Lock()
+
+
+def register(name):
+    with _lock:
+        active.add(name)
+
+
+def unregister(name):
+    with _lock:
+        active.discard(name)
+
+
+def owner():
+    """
+    :return: The value of the owner label of the containers started by this process, e.g.
+             ``worker-1:4242``.
+    :rtype: str
+    """
+    return '{0}:{1}'.format(socket.gethostname(), os.getpid())
+
+
+def process_exists(pid):
+    try:
+        os.kill(pid, 0)
+    except OSError as error:
+        return error.errno == errno.EPERM
+    return True
+
+
+def list_containers(name_prefix):
+    """
+    Lists the containers, running or not, with names starting with ``{name_prefix}-``.
+
+    :return: A tuple with the name, the owner label, empty if missing, and the creation
+             timestamp of each container.
+    :rtype: list
+    :raises DockerWrapperBaseError: If docker ps failed
+    """
+    result = execute(
+        'docker ps -a --filter name={0}- '
+        '--format "{{{{.Names}}}} {{{{.Label \\"{1}\\"}}}} {{{{.CreatedAt}}}}"'.format(
+            name_prefix,
+            OWNER_LABEL
+        )
+    )
+    if not result.succeeded:
+        raise errors.DockerWrapperBaseError(result.err)
+
+    containers = []
+    for line in result.out.splitlines():
+        if line.startswith(name_prefix + '-'):
+            name, label, created = line.split(' ', 2)
+            containers.append((name, label, parse_created(created)))
+    return containers
+
+
+def parse_created(value):
+    """
+    Parses the creation time shown by docker ps, e.g. ``2024-05-01 10:00:00 +0200 CEST``.
+
+    :return: The unix timestamp.
+    :rtype: int
+    """
+    date, clock, offset = value.split()[:3]
+    timestamp = calendar.timegm(time.strptime(date + ' ' + clock, '%Y-%m-%d %H:%M:%S'))
+    seconds = int(offset[1:3]) * 3600 + int(offset[3:5]) * 60
+    return timestamp + seconds if offset.startswith('-') else timestamp - seconds
+
+
+def reap(name_prefix='dyn', older_than=OLDER_THAN, batch_size=BATCH_SIZE):
+    """
+    Removes the containers left behind by docker managers that were never stopped, e.g. because
+    the process crashed. The containers are found with one docker ps and removed with one
+    docker rm per batch. Containers of the managers in this process are kept. Containers are
+    labeled with the host and the pid of the process that started them, those whose process on
+    this host is gone are removed right away. The number of containers found is reported as the
+    ``leaked_containers`` gauge.
+
+    :param name_prefix: The name_prefix of the docker managers.
+    :type name_prefix: str
+    :param older_than: Remove containers without an owner label, or started on another host,
+                       when they were created more than this many seconds ago. It should be
+                       longer than the longest job.
+    :type older_than: float
+    :param batch_size: The max number of containers removed by one docker rm.
+    :type batch_size: int
+    :return: The names of the removed containers.
+    :rtype: list
+    :raises DockerWrapperBaseError: If docker ps failed
+    """
+    now = time.time()
+    host = socket.gethostname()
+    with _lock:
+        owned = set(active)
+
+    def orphaned(name, label, created):
+        if name in owned:
+            return False
+        label_host, _, pid = label.rpartition(':')
+        if label_host == host and pid.isdigit():
+            return not process_exists(int(pid))
+        return now - created >= older_than
+
+    orphans = [
+        name for name, label, created in list_containers(name_prefix)
+        if orphaned(name, label, created)
+    ]
+    set_gauge(LEAK_GAUGE, len(orphans))
+
+    removed = []
+    for index in range(0, len(orphans), batch_size):
+        result = execute('docker rm -f {0}'.format(' '.join(orphans[index:index + batch_size])))
+        if not result.succeeded:
+            logger.warning('Removing orphaned containers failed: {0}'.format(result.err))
+        removed.extend(result.out.split())
+    return removed
+
+
+class Reaper(object):
+    """
+    Reaps orphaned containers in a background thread at a fixed interval.
+    """
+
+    def __init__(self, name_prefix='dyn', older_than=OLDER_THAN, interval=60,
+                 batch_size=BATCH_SIZE):
+        """
+        :param name_prefix: The name_prefix of the docker managers.
+        :type name_prefix: str
+        :param older_than: Remove containers without an owner label, or started on another host,
+                           when they were created more than this many seconds ago.
+        :type older_than: float
+        :param interval: Seconds between the reaps.
+        :type interval: float
+        :param batch_size: The max number of containers removed by one docker rm.
+        :type batch_size: int
+        """
+        self.name_prefix = name_prefix
+        self.older_than = older_than
+        self.interval = interval
+        self.batch_size = batch_size
+        self.reaped = 0
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.stop()
+
+    def start(self):
+        """
+        Starts the background thread, the first reap runs right away.
+
+        :return: The reaper
+        """
+        if self._thread is None:
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._work, name='docker-reaper')
+            self._thread.daemon = True
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        """
+        Stops the background thread and waits for a running reap to finish.
+        """
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _work(self):
+        while not self._stopped.is_set():
+            try:
+                self.reaped += len(reap(self.name_prefix, self.older_than, self.batch_size))
+            except Exception:
+                logger.exception('Reaping containers failed')
+            self._stopped.wait(self.interval)
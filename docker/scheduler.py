@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+import itertools
+import os
+import threading
+import time
+from collections import deque
+
+from docker import errors
+from docker.helpers import parse_memory
+from docker.manager import Docker
+from docker.metrics import percentile
+
+FIFO = 'fifo'
+PRIORITY = 'priority'
+
+
+class Reservation(object):
+    """
+    The CPUs and memory reserved for one container.
+    """
+
+    def __init__(self, cpus, memory, priority, sequence):
+        self.cpus = cpus
+        self.memory = memory
+        self.priority = priority
+        self.sequence = sequence
+        self.queued = time.time()
+        self.admitted = None
+
+
+class ResourceScheduler(object):
+    """
+    Admits containers only while the CPUs and memory they request fit in the capacity of the
+    host. The other containers wait in a queue, served in arrival order or by priority. The head
+    of the queue is never overtaken, thus large requests are not starved by small ones.
+    """
+
+    def __init__(self, cpus=None, memory=None, policy=FIFO, default_cpus=1, default_memory=0):
+        """
+        :param cpus: The number of CPUs that can be handed out, defaults to the CPUs of the host.
+        :type cpus: float
+        :param memory: The memory that can be handed out, in bytes or like ``16g``. Defaults to
+                       the physical memory of the host.
+        :type memory: int or str
+        :param policy: Either ``FIFO`` or ``PRIORITY``. With ``PRIORITY`` containers with a
+                       higher priority are admitted first.
+        :type policy: str
+        :param default_cpus: The CPUs reserved for containers started without ``cpus``.
+        :type default_cpus: float
+        :param default_memory: The memory reserved for containers started without ``memory``.
+        :type default_memory: int or str
+        """
+        if policy not in (FIFO, PRIORITY):
+            raise ValueError('Unknown policy {0!r}'.format(policy))
+        self.cpus = cpus if cpus is not None else host_cpus()
+        self.memory = parse_memory(memory) if memory is not None else host_memory()
+        self.policy = policy
+        self.default_cpus = default_cpus
+        self.default_memory = parse_memory(default_memory)
+        self.cpus_used = 0
+        self.memory_used = 0
+        self.running = 0
+        self._queue = []
+        self._sequence = itertools.count()
+        self._wait_times = deque(maxlen=1000)
+        self._condition = threading.Condition()
+
+    @property
+    def queue_depth(self):
+        """
+        The number of containers waiting for resources.
+        """
+        with self._condition:
+            return len(self._queue)
+
+    def container(self, *args, **kwargs):
+        """
+        Gets a context manager that waits for capacity, starts a container and stops it on exit.
+        It accepts the same arguments as :class:`docker.manager.Docker`, the reservation is made
+        from ``cpus`` and ``memory``.
+
+        :param priority: The priority with the ``PRIORITY`` policy.
+        :type priority: int
+        :param wait_timeout: Seconds to wait for capacity, waits forever if not set.
+        :type wait_timeout: float
+        :rtype: ScheduledContainer
+        """
+        priority = kwargs.pop('priority', 0)
+        wait_timeout = kwargs.pop('wait_timeout', None)
+        return ScheduledContainer(self, Docker(*args, **kwargs), priority, wait_timeout)
+
+    def wrap(self, *wrap_args, **wrap_kwargs):
+        """
+        Decorator that works like :meth:`docker.manager.Docker.wrap`, but waits for capacity
+        before the container is started.
+
+        :return: The decorated function.
+        """
+
+        def activate(func):
+            def wrapper(*args, **kwargs):
+                with self.container(*wrap_args, **wrap_kwargs) as docker:
+                    kwargs['docker'] = docker
+                    return func(*args, **kwargs)
+
+            return wrapper
+
+        return activate
+
+    def acquire(self, cpus=None, memory=None, priority=0, timeout=None):
+        """
+        Waits until the resources are available and reserves them.
+
+        :param cpus: The CPUs to reserve, defaults to default_cpus.
+        :type cpus: float
+        :param memory: The memory to reserve, defaults to default_memory.
+        :type memory: int or str
+        :param priority: The priority with the ``PRIORITY`` policy.
+        :type priority: int
+        :param timeout: Seconds to wait, waits forever if not set.
+        :type timeout: float
+        :rtype: Reservation
+        :raises DockerUnavailableError: If the request is larger than the capacity or the timeout
+                                        expired
+        """
+        reservation = Reservation(
+            self.default_cpus if cpus is None else cpus,
+            self.default_memory if memory is None else parse_memory(memory),
+            priority if self.policy == PRIORITY else 0,
+            next(self._sequence)
+        )
+        if reservation.cpus > self.cpus or reservation.memory > self.memory:
+            raise errors.DockerUnavailableError(
+                'The container requests more resources than the scheduler has'
+            )
+
+        deadline = time.time() + timeout if timeout is not None else None
+        with self._condition:
+            self._queue.append(reservation)
+            self._queue.sort(key=lambda item: (-item.priority, item.sequence))
+            try:
+                while self._queue[0] is not reservation or not self._fits(reservation):
+                    remaining = deadline - time.time() if deadline is not None else None
+                    if remaining is not None and remaining <= 0:
+                        raise errors.DockerUnavailableError(
+                            'Timed out waiting for resources for the container'
+                        )
+                    self._condition.wait(remaining)
+            finally:
+                self._queue.remove(reservation)
+                self._condition.notify_all()
+
+            reservation.admitted = time.time()
+            self._wait_times.append(reservation.admitted - reservation.queued)
+            self.cpus_used += reservation.cpus
+            self.memory_used += reservation.memory
+            self.running += 1
+        return reservation
+
+    def release(self, reservation):
+        """
+        Returns the resources of the reservation.
+
+        :type reservation: Reservation
+        """
+        with self._condition:
+            self.cpus_used -= reservation.cpus
+            self.memory_used -= reservation.memory
+            self.running -= 1
+            self._condition.notify_all()
+
+    def stats(self):
+        """
+        :return: The queue depth, the number of admitted containers, the reserved resources and
+                 the p50 and p99 of the recent wait times in seconds.
+        :rtype: dict
+        """
+        with self._condition:
+            wait_times = sorted(self._wait_times)
+            return {
+                'queued': len(self._queue),
+                'running': self.running,
+                'cpus_used': self.cpus_used,
+                'memory_used': self.memory_used,
+                'wait_p50': percentile(wait_times, 50),
+                'wait_p99': percentile(wait_times, 99),
+            }
+
+    def _fits(self, reservation):
+        return (self.cpus_used + reservation.cpus <= self.cpus and
+                self.memory_used + reservation.memory <= self.memory)
+
+
+class ScheduledContainer(object):
+    """
+    Context manager that waits for resources, starts the container on enter, and stops it and
+    releases the resources on exit.
+    """
+
+    def __init__(self, scheduler, docker, priority=0, wait_timeout=None):
+        self.scheduler = scheduler
+        self.docker = docker
+        self.priority = priority
+        self.wait_timeout = wait_timeout
+        self.reservation = None
+
+    def __enter__(self):
+        self.reservation = self.scheduler.acquire(self.docker.cpus, self.docker.memory,
+                                                  self.priority, self.wait_timeout)
+        try:
+            return self.docker.start()
+        except Exception:
+            self.scheduler.release(self.reservation)
+            raise
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        try:
+            self.docker.stop()
+        finally:
+            self.scheduler.release(self.reservation)
+
+
+def host_cpus():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        import multiprocessing
+        return multiprocessing.cpu_count()
+
+
+def host_memory():
+    return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
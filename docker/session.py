@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+import base64
+import logging
+import os
+import re
+import select
+import subprocess
+import threading
+import uuid
+
+from docker import errors
+from docker.helpers import ProcessResult
+
+logger = logging.getLogger(__name__)
+
+READ_SIZE = 65536
+RETURN_CODE_VARIABLE = '__docker_wrapper_rc'
+FRAME = (
+    '{prefix}( eval "$(printf %s {command} | base64 -d)"\n){suffix}; {variable}=$?; '
+    'printf "%s %d\\n" {token} ${variable}; printf "%s\\n" {token} >&2\n'
+)
+
+
+def frame_command(command, token, stdin=None):
+    """
+    Wraps a command in sentinel framing. The command runs in a subshell, so ``cd`` and ``exit``
+    does not leak into the shell reading the frame. It is passed base64 encoded and run with
+    ``eval``, thus a command that does not parse fails inside the frame instead of swallowing
+    the sentinels. After the command has finished the token and
+    the exit code is printed to stdout and the token is printed to stderr. The exit code is also
+    kept in ``RETURN_CODE_VARIABLE``.
+
+    :param command: The command that should be framed.
+    :type command: str
+    :param token: A unique string that does not occur in the output of the command.
+    :type token: str
+    :param stdin: Data that should be piped to the command. The command reads from /dev/null
+                  if this is empty.
+    :type stdin: str or bytes
+    :return: The framed command which can be fed to bash.
+    :rtype: str
+    """
+    if stdin:
+        if not isinstance(stdin, bytes):
+            stdin = stdin.encode('utf-8')
+        prefix = 'printf %s {0} | base64 -d | '.format(base64.b64encode(stdin).decode('ascii'))
+        suffix = ''
+    else:
+        prefix = ''
+        suffix = ' < /dev/null'
+
+    command = base64.b64encode(command.encode('utf-8')).decode('ascii')
+    return FRAME.format(prefix=prefix, command=command, suffix=suffix, token=token,
+                        variable=RETURN_CODE_VARIABLE)
+
+
+def split_frames(out, err, token):
+    """
+    Splits the output of framed commands that were run after each other.
+
+    :param out: The stdout of all the commands.
+    :type out: str
+    :param err: The stderr of all the commands.
+    :type err: str
+    :param token: The token used when framing the commands.
+    :type token: str
+    :return: A list with stdout, stderr and exit code for each finished command.
+    :rtype: list
+    """
+    out_parts = re.split(re.escape(token) + r' (-?\d+)\n', out)
+    err_parts = err.split(token + '\n')
+    frames = []
+    for index in range(len(out_parts) // 2):
+        frames.append((
+            out_parts[index * 2],
+            err_parts[index] if index < len(err_parts) else '',
+            int(out_parts[index * 2 + 1])
+        ))
+    return frames
+
+
+def new_token():
+    return 'DW{0}'.format(uuid.uuid4().hex)
+
+
+class ShellSession(object):
+    """
+    A long-lived shell that commands are sent to over stdin. Each command is framed with a unique
+    token, thus the exit code, stdout and stderr of each command can be picked out of the shared
+    streams. The shell is restarted on the next call if it dies.
+    """
+
+    def __init__(self, args):
+        """
+        :param args: The arguments used to start the shell, e.g.
+                     ``['docker', 'exec', '-i', 'container', 'bash']``.
+        :type args: list
+        """
+        self.args = args
+        self.process = None
+        self._out = bytearray()
+        self._err = bytearray()
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.close()
+
+    @property
+    def alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def open(self):
+        """
+        Starts the shell unless it is already running.
+
+        :return: The session object
+        """
+        if not self.alive:
+            self.close()
+            logger.debug('Opening shell session: "{0}"'.format(' '.join(self.args)))
+            self.process = subprocess.Popen(
+                self.args,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                close_fds=True
+            )
+        return self
+
+    def close(self):
+        """
+        Stops the shell by closing its stdin and waits for it to exit.
+
+        :return: The session object
+        """
+        process, self.process = self.process, None
+        self._out = bytearray()
+        self._err = bytearray()
+        if process is None:
+            return self
+
+        try:
+            process.stdin.close()
+        except (IOError, OSError):
+            pass
+        if process.poll() is None:
+            process.wait()
+        process.stdout.close()
+        process.stderr.close()
+        return self
+
+    def execute(self, command, stdin=''):
+        """
+        Runs the command in the session.
+
+        :param command: The command that should be run.
+        :type command: str
+        :param stdin: Data that should be passed to the command on stdin.
+        :type stdin: str or bytes
+        :return: A ProcessResult object containing information on the result of the command.
+        :rtype: ProcessResult
+        :raises DockerSessionError: If the shell dies while running the command.
+        """
+        result = ProcessResult(command=command)
+        token = new_token()
+        frame = frame_command(command, token, stdin).encode('utf-8')
+
+        with self._lock:
+            logger.debug('Running command in session: "{0}"'.format(command))
+            self._write(frame)
+            stdout, stderr, return_code = self._read_frame(token.encode('ascii'))
+
+        result.out_bytes = stdout
+        result.err_bytes = stderr
+        result.return_code = return_code
+        logger.debug('Finished running of: {0!r}'.format(result))
+        return result
+
+    def _write(self, frame):
+        # A dead shell is detected either before or while writing, in both cases the command
+        # has not started yet and it is safe to restart the shell and send it again.
+        for attempt in (1, 2):
+            self.open()
+            try:
+                self.process.stdin.write(frame)
+                self.process.stdin.flush()
+                return
+            except (IOError, OSError):
+                self.close()
+                if attempt == 2:
+                    raise errors.DockerSessionError()
+
+    def _read_frame(self, token):
+        out_marker = re.compile(re.escape(token) + b' (-?\\d+)\n')
+        err_marker = token + b'\n'
+        out_match = None
+        err_index = -1
+        fds = {
+            self.process.stdout.fileno(): self._out,
+            self.process.stderr.fileno(): self._err,
+        }
+
+        while True:
+            if out_match is None:
+                out_match = out_marker.search(self._out)
+            if err_index == -1:
+                err_index = self._err.find(err_marker)
+            if out_match is not None and err_index != -1:
+                break
+
+            readable, _, _ = select.select(list(fds), [], [])
+            for fd in readable:
+                data = os.read(fd, READ_SIZE)
+                if not data:
+                    self.close()
+                    raise errors.DockerSessionError(
+                        'The shell session died while running a command'
+                    )
+                fds[fd].extend(data)
+
+        stdout = bytes(self._out[:out_match.start()])
+        stderr = bytes(self._err[:err_index])
+        return_code = int(out_match.group(1))
+        del self._out[:out_match.end()]
+        del self._err[:err_index + len(err_marker)]
+        return stdout, stderr, return_code
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+from docker import errors
+from docker.helpers import execute
+
+logger = logging.getLogger(__name__)
+
+
+class SnapshotCache(object):
+    """
+    Keeps images of containers committed after running setup commands, keyed by a hash of the
+    base image, the commands, their working directory and the environment variables. The least
+    recently used images are removed when there are more than max_images or they use more than
+    max_size bytes. Images committed by earlier processes are found with
+    ``docker image inspect``.
+    """
+
+    def __init__(self, repository='docker-wrapper-snapshot', max_images=10, max_size=None):
+        """
+        :param repository: The repository of the snapshot images, the tag is the key.
+        :type repository: str
+        :param max_images: The max number of snapshot images.
+        :type max_images: int
+        :param max_size: The max total size of the snapshot images in bytes. The most recently
+                         used image is kept even if it alone is larger.
+        :type max_size: int
+        """
+        self.repository = repository
+        self.max_images = max_images
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._images = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(image, commands, working_directory='', env_variables=None):
+        """
+        :param image: The base image.
+        :type image: str
+        :param commands: The setup commands.
+        :type commands: list
+        :param working_directory: The working directory of the commands.
+        :type working_directory: str
+        :param env_variables: The environment variables of the container.
+        :type env_variables: dict
+        :return: The hash of the image, the commands, the working directory and the environment
+                 variables.
+        :rtype: str
+        """
+        digest = hashlib.sha256(image.encode('utf-8'))
+        for command in commands:
+            digest.update(b'\0')
+            digest.update(command.encode('utf-8'))
+        digest.update(b'\1')
+        digest.update(working_directory.encode('utf-8'))
+        for name, value in sorted((env_variables or {}).items()):
+            digest.update(b'\1')
+            digest.update('{0}={1}'.format(name, value).encode('utf-8'))
+        return digest.hexdigest()[:32]
+
+    def image(self, key):
+        """
+        :return: The name of the snapshot image of the key.
+        :rtype: str
+        """
+        return '{0}:{1}'.format(self.repository, key)
+
+    def get(self, key):
+        """
+        Looks up the snapshot image of the key and marks it as recently used.
+
+        :return: The name of the image or None if there is no snapshot.
+        :rtype: str
+        """
+        with self._lock:
+            if key not in self._images:
+                size = self._inspect(self.image(key))
+                if size is None:
+                    self.misses += 1
+                    return None
+                self._images[key] = size
+                self._evict()
+            else:
+                self._images[key] = self._images.pop(key)
+            self.hits += 1
+            return self.image(key)
+
+    def commit(self, docker, key):
+        """
+        Commits the container of the docker manager as the snapshot image of the key.
+
+        :type docker: docker.manager.Docker
+        :return: The name of the image.
+        :rtype: str
+        :raises DockerWrapperBaseError: If docker commit failed
+        """
+        image = self.image(key)
+        result = execute('docker commit {0} {1}'.format(docker.container_name, image))
+        if not result.succeeded:
+            raise errors.DockerWrapperBaseError(result.err)
+
+        with self._lock:
+            self._images.pop(key, None)
+            self._images[key] = self._inspect(image) or 0
+            self._evict()
+        return image
+
+    def clear(self):
+        """
+        Removes all snapshot images known to the cache.
+        """
+        with self._lock:
+            while self._images:
+                self._remove(self._images.popitem(last=False)[0])
+
+    def stats(self):
+        """
+        :return: The number of hits, misses, the hit rate, the number of images and their total
+                 size.
+        :rtype: dict
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': float(self.hits) / lookups if lookups else None,
+                'images': len(self._images),
+                'size': sum(self._images.values()),
+            }
+
+    def _evict(self):
+        # The most recent image was just committed or found and is about to be used, thus it is
+        # kept even if it alone is larger than max_size.
+        while len(self._images) > 1 and (
+            len(self._images) > self.max_images or
+            self.max_size is not None and sum(self._images.values()) > self.max_size
+        ):
+            self._remove(self._images.popitem(last=False)[0])
+
+    def _remove(self, key):
+        result = execute('docker rmi {0}'.format(self.image(key)))
+        if not result.succeeded:
+            logger.warning('Removing snapshot {0} failed: {1}'.format(self.image(key), result.err))
+
+    @staticmethod
+    def _inspect(image):
+        """
+        :return: The size of the image in bytes, None if it does not exist.
+        :rtype: int
+        """
+        result = execute('docker image inspect --format "{{{{.Size}}}}" {0}'.format(image))
+        if not result.succeeded:
+            return None
+        try:
+            return int(result.out.strip())
+        except ValueError:
+            return 0
+
+
+default_cache = SnapshotCache()
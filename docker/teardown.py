@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+import atexit
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class TeardownWorker(object):
+    """
+    Runs teardown tasks, like removing containers, in a background thread so the caller does
+    not have to wait for them.
+    """
+
+    def __init__(self):
+        self._tasks = deque()
+        self._pending = 0
+        self._condition = threading.Condition()
+        self._thread = None
+
+    @property
+    def pending(self):
+        """
+        The number of tasks that are scheduled or running.
+        """
+        with self._condition:
+            return self._pending
+
+    def schedule(self, func, *args):
+        """
+        Schedules the function to be called in the background thread.
+        """
+        with self._condition:
+            self._tasks.append((func, args))
+            self._pending += 1
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._work, name='docker-teardown')
+                self._thread.daemon = True
+                self._thread.start()
+            self._condition.notify_all()
+
+    def flush(self, timeout=None):
+        """
+        Waits for all scheduled tasks to finish.
+
+        :param timeout: Seconds to wait, waits until everything is done if not set.
+        :type timeout: float
+        :return: True if all tasks finished.
+        :rtype: bool
+        """
+        deadline = time.time() + timeout if timeout is not None else None
+        with self._condition:
+            while self._pending:
+                remaining = deadline - time.time() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        return True
+
+    def _work(self):
+        while True:
+            with self._condition:
+                if not self._tasks:
+                    self._thread = None
+                    return
+                func, args = self._tasks.popleft()
+
+            try:
+                func(*args)
+            except Exception:
+                logger.exception('Teardown task failed')
+            finally:
+                with self._condition:
+                    self._pending -= 1
+                    self._condition.notify_all()
+
+
+worker = TeardownWorker()
+schedule = worker.schedule
+flush = worker.flush
+
+atexit.register(flush)
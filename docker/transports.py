@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+import logging
+import time
+
+from docker import errors, reaper
+from docker.api import DEFAULT_SOCKET_PATH, APIClient, demultiplex, quote_path
+from docker.helpers import ProcessResult, parse_memory
+
+logger = logging.getLogger(__name__)
+
+
+class BaseTransport(object):
+    """
+    A transport decides how a docker manager talks to the docker daemon. The manager uses the
+    docker command line client when it has no transport.
+    """
+
+    def start(self, docker):
+        """
+        Starts the container of the given manager.
+
+        :param docker: The docker manager.
+        :type docker: docker.manager.Docker
+        """
+        raise NotImplementedError
+
+    def stop(self, docker):
+        """
+        Removes the container of the given manager.
+
+        :param docker: The docker manager.
+        :type docker: docker.manager.Docker
+        """
+        raise NotImplementedError
+
+    def run(self, docker, command, stdin='', login=False, tty=False):
+        """
+        Runs the command with bash in the container of the given manager.
+
+        :param docker: The docker manager.
+        :type docker: docker.manager.Docker
+        :param command: The command string, including changing of working directory.
+        :type command: str
+        :rtype: ProcessResult
+        """
+        raise NotImplementedError
+
+
+class APITransport(BaseTransport):
+    """
+    Talks to the Docker Engine API on the daemon socket. Connections are kept alive and shared
+    between all managers using the same socket.
+    """
+
+    def __init__(self, socket_path=DEFAULT_SOCKET_PATH, version=None, pool_size=10,
+                 timeout=None):
+        self.client = APIClient(socket_path, version=version, pool_size=pool_size,
+                                timeout=timeout)
+
+    def start(self, docker):
+        body = {
+            'Image': docker.image,
+            'Cmd': ['/bin/sleep', str(docker.timeout)],
+            'Labels': {reaper.OWNER_LABEL: reaper.owner()},
+            'ExposedPorts': {},
+            'HostConfig': {
+                'Privileged': docker.privilege,
+                'PortBindings': {},
+            },
+        }
+        if docker.cpus is not None:
+            body['HostConfig']['NanoCpus'] = int(docker.cpus * 1e9)
+        if docker.memory is not None:
+            body['HostConfig']['Memory'] = parse_memory(docker.memory)
+        if docker.volumes:
+            body['HostConfig']['Binds'] = list(docker.volumes)
+        if docker.tmpfs:
+            body['HostConfig']['Tmpfs'] = dict(
+                (path.split(':', 1) + [''])[:2] for path in docker.tmpfs
+            )
+        for port_mapping in docker.ports_mapping:
+            host_ip, host_port, container_port = parse_port_mapping(port_mapping)
+            body['ExposedPorts'][container_port] = {}
+            body['HostConfig']['PortBindings'].setdefault(container_port, []).append(
+                {'HostIp': host_ip, 'HostPort': host_port}
+            )
+
+        params = {'name': docker.container_name}
+        status, data = self.client.request('POST', '/containers/create', params, body)
+        if status == 404:
+            status, data = self.pull(docker.image)
+            if status < 400:
+                status, data = self.client.request('POST', '/containers/create', params, body)
+
+        if status < 400:
+            status, data = self.client.request(
+                'POST', '/containers/{0}/start'.format(quote_path(docker.container_name))
+            )
+
+        if status >= 400:
+            message = data.get('message') if isinstance(data, dict) else data
+            raise errors.DockerUnavailableError(
+                'Starting the docker container failed.\n{0}'.format(message)
+            )
+
+    def stop(self, docker):
+        self.client.request(
+            'DELETE',
+            '/containers/{0}'.format(quote_path(docker.container_name)),
+            {'force': 1}
+        )
+
+    def run(self, docker, command, stdin='', login=False, tty=False):
+        result = ProcessResult(command=command)
+        args = ['bash', '--login', '-c', command] if login else ['bash', '-c', command]
+        if stdin and not isinstance(stdin, bytes):
+            stdin = stdin.encode('utf-8')
+
+        status, data = self.client.request(
+            'POST',
+            '/containers/{0}/exec'.format(quote_path(docker.container_name)),
+            body={
+                'AttachStdin': bool(stdin),
+                'AttachStdout': True,
+                'AttachStderr': True,
+                'Tty': tty,
+                'Cmd': args,
+            }
+        )
+        exec_id = self.client.check(status, data)['Id']
+
+        stream = self.client.hijack(
+            '/exec/{0}/start'.format(exec_id),
+            {'Detach': False, 'Tty': tty},
+            stdin
+        )
+        stdout, stderr = (stream, b'') if tty else demultiplex(stream)
+
+        result.out_bytes = stdout
+        result.err_bytes = stderr
+        result.return_code = self.inspect_exit_code(exec_id)
+        logger.debug('Finished running of: {0!r}'.format(result))
+        return result
+
+    def inspect_exit_code(self, exec_id, retries=50):
+        # The stream might be closed a moment before the daemon has stored the exit code.
+        for _ in range(retries):
+            status, data = self.client.request('GET', '/exec/{0}/json'.format(exec_id))
+            data = self.client.check(status, data)
+            if not data.get('Running') and data.get('ExitCode') is not None:
+                return data['ExitCode']
+            time.sleep(0.01)
+        return None
+
+    def pull(self, image):
+        repository, tag = split_image_name(image)
+        return self.client.request('POST', '/images/create', {'fromImage': repository, 'tag': tag})
+
+
+def split_image_name(image):
+    """
+    Splits an image name into repository and tag. A colon before the last slash belongs to the
+    registry host, e.g. 'localhost:5000/ubuntu'.
+
+    :rtype: tuple
+    """
+    repository, _, tag = image.rpartition(':')
+    if not repository or '/' in tag:
+        return image, 'latest'
+    return repository, tag
+
+
+def parse_port_mapping(port_mapping):
+    """
+    Parses a port mapping on the format used by ``docker run -p``, e.g. '8000:80',
+    '127.0.0.1:8000:80' or '53:53/udp'.
+
+    :return: The host ip, the host port and the container port with protocol.
+    :rtype: tuple
+    """
+    parts = str(port_mapping).split(':')
+    container_port = parts[-1] if '/' in parts[-1] else '{0}/tcp'.format(parts[-1])
+    host_port = parts[-2] if len(parts) > 1 else ''
+    host_ip = parts[-3] if len(parts) > 2 else ''
+    return host_ip, host_port, container_port
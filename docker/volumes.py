@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import json
+import logging
+import threading
+import time
+
+from docker import errors
+from docker.helpers import execute
+
+logger = logging.getLogger(__name__)
+
+# The units of the sizes printed by docker, which rounds them to four significant digits.
+SIZE_UNITS = {'B': 1, 'kB': 10 ** 3, 'MB': 10 ** 6, 'GB': 10 ** 9, 'TB': 10 ** 12, 'PB': 10 ** 15}
+
+
+class VolumeCache(object):
+    """
+    Names the volumes that keep dependency caches, like ``~/.cache/pip`` or ``~/.m2``, between
+    containers. The name is a hash of the image, the mount path and the content of the lock
+    files, thus containers with the same dependencies share a volume and a changed lock file
+    starts a fresh one. Docker creates the volume on the first mount and several containers can
+    mount it at once. Stale volumes are removed by :meth:`evict`.
+    """
+
+    def __init__(self, prefix='docker-wrapper-cache', max_size=None, max_volumes=None):
+        """
+        :param prefix: The prefix of the volume names, the rest is the key.
+        :type prefix: str
+        :param max_size: The max total size of the cache volumes in bytes.
+        :type max_size: int
+        :param max_volumes: The max number of cache volumes.
+        :type max_volumes: int
+        """
+        self.prefix = prefix
+        self.max_size = max_size
+        self.max_volumes = max_volumes
+        self._used = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(image, path, lockfiles=()):
+        """
+        :param image: The image of the container.
+        :type image: str
+        :param path: The path the volume is mounted on in the container.
+        :type path: str
+        :param lockfiles: Paths to files on the host that pin the dependencies, e.g.
+                          ``requirements.txt`` or ``package-lock.json``.
+        :type lockfiles: list
+        :return: The hash of the image, the path and the content of the lock files.
+        :rtype: str
+        """
+        digest = hashlib.sha256(image.encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(path.encode('utf-8'))
+        for lockfile in lockfiles:
+            digest.update(b'\0')
+            with open(lockfile, 'rb') as file_object:
+                for chunk in iter(lambda: file_object.read(65536), b''):
+                    digest.update(chunk)
+        return digest.hexdigest()[:32]
+
+    def volume(self, image, path, lockfiles=()):
+        """
+        :return: The name of the cache volume, see :meth:`key`.
+        :rtype: str
+        """
+        name = '{0}-{1}'.format(self.prefix, self.key(image, path, lockfiles))
+        with self._lock:
+            self._used[name] = time.time()
+        return name
+
+    def mount(self, image, path, lockfiles=()):
+        """
+        :return: The mount of the cache volume on the path, as passed to ``docker run -v``.
+        :rtype: str
+        """
+        return '{0}:{1}'.format(self.volume(image, path, lockfiles), path)
+
+    def list(self):
+        """
+        :return: The name, the size in bytes and the number of containers using it for each
+                 cache volume. Docker prints rounded sizes, thus the sizes are approximate.
+        :rtype: list
+        :raises DockerWrapperBaseError: If docker system df failed
+        """
+        result = execute('docker system df -v --format "{{json .Volumes}}"')
+        if not result.succeeded:
+            raise errors.DockerWrapperBaseError(result.err)
+
+        volumes = []
+        for volume in json.loads(result.out.strip() or '[]') or []:
+            if not volume['Name'].startswith(self.prefix + '-'):
+                continue
+            volumes.append({
+                'name': volume['Name'],
+                'size': parse_size(volume.get('Size', '')),
+                'containers': int(volume['Links']) if volume.get('Links', '').isdigit() else 0,
+            })
+        return volumes
+
+    def evict(self):
+        """
+        Removes the least recently used cache volumes until there are at most max_volumes using
+        at most max_size bytes. Volumes mounted by a container are never removed.
+
+        :return: The names of the removed volumes.
+        :rtype: list
+        """
+        if self.max_size is None and self.max_volumes is None:
+            return []
+
+        volumes = self.list()
+        with self._lock:
+            volumes.sort(key=lambda volume: (self._used.get(volume['name'], 0), volume['name']))
+        size = sum(volume['size'] for volume in volumes)
+        count = len(volumes)
+        removed = []
+        for volume in volumes:
+            if ((self.max_size is None or size <= self.max_size) and
+                    (self.max_volumes is None or count <= self.max_volumes)):
+                break
+            if volume['containers'] or not self._remove(volume['name']):
+                continue
+            size -= volume['size']
+            count -= 1
+            removed.append(volume['name'])
+        return removed
+
+    def _remove(self, name):
+        result = execute('docker volume rm {0}'.format(name))
+        if not result.succeeded:
+            logger.warning('Removing cache volume {0} failed: {1}'.format(name, result.err))
+            return False
+        with self._lock:
+            self._used.pop(name, None)
+        return True
+
+
+def parse_size(value):
+    """
+    Parses a size printed by docker, e.g. ``1.234MB`` or ``0B``.
+
+    :return: The size in bytes, 0 if the size is not known, e.g. ``N/A``.
+    :rtype: int
+    """
+    number = value.rstrip('kBMGTP')
+    try:
+        return int(float(number) * SIZE_UNITS[value[len(number):]])
+    except (KeyError, ValueError):
+        return 0
+
+
+default_cache = VolumeCache()
@@ -32,7 +32,7 @@ setup(
     author_email='fredrik@carlsen.io',
     description='Docker Wrapper for Python',
     long_description=_read_long_description(),
-    packages=find_packages(exclude='tests'),
+    packages=find_packages(exclude=['tests', 'benchmarks']),
     license='MIT',
     test_suite='runtests.runtests',
     include_package_data=True,
@@ -0,0 +1,5 @@
+# -*- coding: utf-8 -*-
+import sys
+
+# The asyncio manager and its tests use async/await, which is a syntax error before Python 3.5.
+collect_ignore = ['test_aio.py'] if sys.version_info < (3, 5) else []
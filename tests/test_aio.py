@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from docker import reaper
+from docker.errors import DockerFileNotFoundError, DockerUnavailableError
+from tests.utils import result
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+try:
+    import asyncio
+
+    from docker.aio import AsyncDocker, execute
+except (ImportError, SyntaxError):
+    AsyncDocker = None
+
+
+@unittest.skipIf(AsyncDocker is None or not hasattr(mock, 'AsyncMock'), 'Requires asyncio')
+class AsyncDockerTests(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+
+    def patch_execute(self, return_value):
+        patcher = mock.patch('docker.aio.execute', new_callable=mock.AsyncMock,
+                             return_value=return_value)
+        self.addCleanup(patcher.stop)
+        return patcher.start()
+
+    def run_async(self, coroutine):
+        return self.loop.run_until_complete(coroutine)
+
+    def test_execute(self):
+        process_result = self.run_async(execute('cat && echo err >&2 && exit 3', stdin='hi'))
+        self.assertEqual(process_result.out, 'hi')
+        self.assertEqual(process_result.err, 'err\n')
+        self.assertEqual(process_result.return_code, 3)
+
+    def test_run(self):
+        mock_execute = self.patch_execute(result())
+        docker = AsyncDocker(env_variables={'CI': 1})
+        self.run_async(docker.run('ls', login=True))
+        mock_execute.assert_called_once_with(
+            'docker exec -i {0} bash --login -c \'cd ~/ && CI=1 ls\''.format(
+                docker.container_name
+            ),
+            ''
+        )
+
+    def test_context_manager(self):
+        mock_execute = self.patch_execute(result())
+
+        async def use():
+            async with AsyncDocker(ports_mapping=['4080:4080']) as docker:
+                self.assertIn(docker.container_name, reaper.active)
+                return docker
+
+        docker = self.run_async(use())
+        self.assertNotIn(docker.container_name, reaper.active)
+        mock_execute.assert_has_calls([
+            mock.call('docker run -d -p 4080:4080 --label {0}={1} --name {2} ubuntu '
+                      '/bin/sleep 3600'.format(reaper.OWNER_LABEL, reaper.owner(),
+                                               docker.container_name)),
+            mock.call('docker rm -f {0}'.format(docker.container_name)),
+        ])
+
+    def test_start_failure(self):
+        self.patch_execute(result(return_code=125, err='no such image'))
+        self.assertRaises(DockerUnavailableError, self.run_async, AsyncDocker().start())
+
+    def test_list_files(self):
+        self.patch_execute(result(out='b\na\n'))
+        self.assertEqual(self.run_async(AsyncDocker().list_files('path')), ['a', 'b'])
+
+    def test_list_directories(self):
+        self.patch_execute(result(out='dir1/, dir2/\n'))
+        self.assertEqual(
+            self.run_async(AsyncDocker().list_directories('', include_trailing_slash=False)),
+            ['dir1', 'dir2']
+        )
+
+    def test_read_file_not_found(self):
+        self.patch_execute(result(return_code=1, err='cat: x: No such file or directory'))
+        self.assertRaises(DockerFileNotFoundError, self.run_async, AsyncDocker().read_file('x'))
+
+    def test_file_exist(self):
+        self.patch_execute(result(1))
+        self.assertFalse(self.run_async(AsyncDocker().file_exist('x')))
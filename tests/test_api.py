@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import select
+import shutil
+import struct
+import subprocess
+import tempfile
+import threading
+import unittest
+
+from six.moves import BaseHTTPServer, socketserver
+
+from docker import reaper
+from docker.api import APIClient, demultiplex
+from docker.errors import DockerUnavailableError, DockerWrapperBaseError
+from docker.manager import Docker
+from docker.transports import APITransport, parse_port_mapping, split_image_name
+
+
+class FakeDockerHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """
+    Emulates the parts of the Docker Engine API used by the api transport. Exec commands are run
+    with the local bash in a temporary home directory.
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        BaseHTTPServer.BaseHTTPRequestHandler.setup(self)
+        self.server.connections += 1
+
+    def log_message(self, *args):
+        pass
+
+    def send_json(self, status, data=None):
+        body = json.dumps(data).encode('utf-8') if data is not None else b''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length).decode('utf-8')) if length else None
+
+    def do_POST(self):
+        server = self.server
+        path, _, query = self.path.partition('?')
+        body = self.read_json()
+        server.requests.append(('POST', path, query, body))
+
+        if path == '/containers/create':
+            if body['Image'] not in server.images:
+                return self.send_json(404, {'message': 'No such image: ' + body['Image']})
+            return self.send_json(201, {'Id': 'abc'})
+        if path == '/images/create':
+            if not server.pullable:
+                return self.send_json(404, {'message': 'repository not found'})
+            server.images.add(query.split('fromImage=')[1].split('&')[0])
+            return self.send_json(200)
+        if path.endswith('/start') and path.startswith('/containers/'):
+            return self.send_json(204)
+        if path.endswith('/exec'):
+            exec_id = 'exec{0}'.format(len(server.execs))
+            server.execs[exec_id] = {'config': body, 'exit_code': None}
+            return self.send_json(201, {'Id': exec_id})
+        if path.endswith('/start') and path.startswith('/exec/'):
+            return self.start_exec(server.execs[path.split('/')[2]])
+        self.send_json(404, {'message': 'page not found'})
+
+    def start_exec(self, execution):
+        self.wfile.write(
+            b'HTTP/1.1 101 UPGRADED\r\n'
+            b'Content-Type: application/vnd.docker.raw-stream\r\n'
+            b'Connection: Upgrade\r\nUpgrade: tcp\r\n\r\n'
+        )
+        self.wfile.flush()
+
+        process = subprocess.Popen(
+            execution['config']['Cmd'],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            env={'HOME': self.server.home, 'PATH': os.environ['PATH']}
+        )
+
+        # Stream like the daemon: stdin is fed while the output is sent back, thus a client
+        # that writes all of stdin before reading fills both buffers and blocks.
+        def feed():
+            try:
+                if execution['config']['AttachStdin']:
+                    for chunk in iter(lambda: self.rfile.read(4096), b''):
+                        process.stdin.write(chunk)
+                process.stdin.close()
+            except (IOError, OSError):
+                pass
+
+        feeder = threading.Thread(target=feed)
+        feeder.daemon = True
+        feeder.start()
+
+        stream_types = {process.stdout.fileno(): 1, process.stderr.fileno(): 2}
+        while stream_types:
+            for fd in select.select(list(stream_types), [], [])[0]:
+                data = os.read(fd, 4096)
+                if not data:
+                    del stream_types[fd]
+                    continue
+                self.wfile.write(struct.pack('>BxxxL', stream_types[fd], len(data)) + data)
+                self.wfile.flush()
+        process.wait()
+        feeder.join()
+        execution['exit_code'] = process.returncode
+        self.close_connection = True
+
+    def do_GET(self):
+        self.server.requests.append(('GET', self.path, '', None))
+        execution = self.server.execs[self.path.split('/')[2]]
+        self.send_json(200, {'Running': False, 'ExitCode': execution['exit_code']})
+
+    def do_DELETE(self):
+        self.server.requests.append(('DELETE', self.path, '', None))
+        self.send_json(204)
+
+
+class FakeDockerServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path, home):
+        socketserver.UnixStreamServer.__init__(self, socket_path, FakeDockerHandler)
+        self.home = home
+        self.connections = 0
+        self.requests = []
+        self.execs = {}
+        self.images = {'ubuntu'}
+        self.pullable = True
+
+
+class APITransportTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.socket_path = os.path.join(self.directory, 'docker.sock')
+        self.server = FakeDockerServer(self.socket_path, self.directory)
+        self.thread = threading.Thread(target=self.server.serve_forever, args=(0.01,))
+        self.thread.daemon = True
+        self.thread.start()
+        self.transport = APITransport(self.socket_path)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.transport.client.pool.clear()
+        shutil.rmtree(self.directory)
+
+    def test_start_and_stop(self):
+        docker = Docker(ports_mapping=['8000:80'], transport=self.transport)
+        self.assertEqual(docker.start(), docker)
+        docker.stop()
+
+        create, start, delete = self.server.requests
+        self.assertEqual(create[1], '/containers/create')
+        self.assertEqual(create[2], 'name={0}'.format(docker.container_name))
+        self.assertEqual(create[3]['Cmd'], ['/bin/sleep', '3600'])
+        self.assertEqual(create[3]['Labels'], {reaper.OWNER_LABEL: reaper.owner()})
+        self.assertEqual(create[3]['HostConfig']['PortBindings'],
+                         {'80/tcp': [{'HostIp': '', 'HostPort': '8000'}]})
+        self.assertEqual(start[1], '/containers/{0}/start'.format(docker.container_name))
+        self.assertEqual(delete[:2], ('DELETE', '/containers/{0}?force=1'.format(
+            docker.container_name
+        )))
+
+    def test_start_with_resource_limits(self):
+        docker = Docker(cpus=0.5, memory='1g', transport=self.transport).start()
+        docker.stop()
+        host_config = self.server.requests[0][3]['HostConfig']
+        self.assertEqual(host_config['NanoCpus'], 500000000)
+        self.assertEqual(host_config['Memory'], 1024 ** 3)
+
+    def test_start_with_mounts(self):
+        docker = Docker(volumes=['/data:/data:ro'], tmpfs=['/tmp:size=64m', '/run'],
+                        transport=self.transport).start()
+        docker.stop()
+        host_config = self.server.requests[0][3]['HostConfig']
+        self.assertEqual(host_config['Binds'], ['/data:/data:ro'])
+        self.assertEqual(host_config['Tmpfs'], {'/tmp': 'size=64m', '/run': ''})
+
+    def test_start_pulls_missing_image(self):
+        docker = Docker(image='busybox', transport=self.transport).start()
+        self.assertEqual(
+            [request[1] for request in self.server.requests],
+            ['/containers/create', '/images/create', '/containers/create',
+             '/containers/{0}/start'.format(docker.container_name)]
+        )
+        self.assertEqual(self.server.requests[1][2], 'fromImage=busybox&tag=latest')
+
+    def test_start_failure(self):
+        self.server.images = set()
+        self.server.pullable = False
+        self.assertRaisesRegexp(DockerUnavailableError, 'repository not found',
+                                Docker(transport=self.transport).start)
+
+    def test_run(self):
+        docker = Docker(env_variables={'CI': 1}, transport=self.transport)
+        result = docker.run('printenv CI && echo "\'hi\'" && echo err >&2 && exit 3', login=True)
+        self.assertEqual(result.out, '1\n\'hi\'\n')
+        self.assertEqual(result.err, 'err\n')
+        self.assertEqual(result.return_code, 3)
+        self.assertEqual(self.server.execs['exec0']['config']['Cmd'][:2], ['bash', '--login'])
+
+    def test_run_with_large_stdin(self):
+        transport = APITransport(self.socket_path, timeout=30)
+        content = b'x' * (4 * 1024 * 1024)
+        result = Docker(transport=transport).run('cat', stdin=content)
+        self.assertEqual(result.out_bytes, content)
+        self.assertEqual(result.return_code, 0)
+        transport.client.pool.clear()
+
+    def test_write_and_read_file(self):
+        docker = Docker(transport=self.transport)
+        docker.write_file('file', 'content\n')
+        self.assertEqual(docker.read_file('file'), 'content\n')
+
+    def test_connections_are_shared(self):
+        first = Docker(transport=self.transport)
+        second = Docker(transport=APITransport(self.socket_path))
+        for _ in range(3):
+            first.run('true')
+            second.run('true')
+
+        # Each exec start hijacks a connection, all other requests share one connection.
+        self.assertEqual(self.server.connections, 1 + 6)
+
+    def test_no_daemon(self):
+        self.assertRaises(
+            DockerUnavailableError,
+            APIClient(os.path.join(self.directory, 'missing.sock')).request,
+            'GET',
+            '/_ping'
+        )
+
+
+class APIHelperTests(unittest.TestCase):
+
+    def test_demultiplex(self):
+        stream = struct.pack('>BxxxL', 1, 2) + b'hi' + struct.pack('>BxxxL', 2, 3) + b'err'
+        self.assertEqual(demultiplex(stream), (b'hi', b'err'))
+
+    def test_check(self):
+        self.assertEqual(APIClient.check(200, {'Id': 'a'}), {'Id': 'a'})
+        self.assertRaisesRegexp(DockerWrapperBaseError, 'no such container', APIClient.check,
+                                404, {'message': 'no such container'})
+
+    def test_parse_port_mapping(self):
+        self.assertEqual(parse_port_mapping('8000:80'), ('', '8000', '80/tcp'))
+        self.assertEqual(parse_port_mapping('127.0.0.1:53:53/udp'),
+                         ('127.0.0.1', '53', '53/udp'))
+        self.assertEqual(parse_port_mapping('80'), ('', '', '80/tcp'))
+
+    def test_split_image_name(self):
+        self.assertEqual(split_image_name('ubuntu'), ('ubuntu', 'latest'))
+        self.assertEqual(split_image_name('ubuntu:16.04'), ('ubuntu', '16.04'))
+        self.assertEqual(split_image_name('localhost:5000/ubuntu'),
+                         ('localhost:5000/ubuntu', 'latest'))
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import unittest
+
+from benchmarks.run import BENCHMARKS, find_regressions, format_results, run_benchmarks
+
+
+class BenchmarkTests(unittest.TestCase):
+    """
+    Runs the benchmarks once against the fake docker executable, thus they are checked to work
+    without docker.
+    """
+
+    def test_run_benchmarks(self):
+        results = run_benchmarks(['start_stop', 'run', 'read_file', 'put_files'], [16], 1)
+        self.assertEqual([(result['name'], result['size']) for result in results],
+                         [('start_stop', None), ('run', None), ('read_file', 16),
+                          ('put_files', 16)])
+        self.assertTrue(all(result['p50'] > 0 for result in results))
+        self.assertIn('read_file', format_results(results))
+
+    def test_find_regressions(self):
+        baseline = [{'name': 'run', 'size': None, 'p50': 0.010},
+                    {'name': 'read_file', 'size': 16, 'p50': 0.010}]
+        results = [{'name': 'run', 'size': None, 'p50': 0.012},
+                   {'name': 'read_file', 'size': 16, 'p50': 0.014},
+                   {'name': 'walk', 'size': None, 'p50': 1}]
+        regressions = find_regressions(results, baseline, 0.25)
+        self.assertEqual([result['name'] for result, _ in regressions], ['read_file'])
+
+    def test_baseline_covers_all_benchmarks(self):
+        path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'benchmarks',
+                            'baseline.json')
+        with open(path) as fd:
+            baseline = json.load(fd)
+        self.assertEqual(sorted(set(result['name'] for result in baseline)), sorted(BENCHMARKS))
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+import time
+import unittest
+
+from docker.cache import MetadataCache, is_related
+
+
+class MetadataCacheTests(unittest.TestCase):
+
+    def test_get_and_set(self):
+        cache = MetadataCache()
+        self.assertEqual(cache.get('file_exist', '~/a'), (False, None))
+        cache.set('file_exist', '~/a/', False)
+        self.assertEqual(cache.get('file_exist', '~/a'), (True, False))
+        self.assertEqual(cache.stats(), {'hits': 1, 'misses': 1, 'size': 1})
+
+    def test_lru_eviction(self):
+        cache = MetadataCache(max_size=2)
+        cache.set('file_exist', 'a', True)
+        cache.set('file_exist', 'b', True)
+        cache.get('file_exist', 'a')
+        cache.set('file_exist', 'c', True)
+        self.assertTrue(cache.get('file_exist', 'a')[0])
+        self.assertFalse(cache.get('file_exist', 'b')[0])
+        self.assertEqual(len(cache), 2)
+
+    def test_ttl(self):
+        cache = MetadataCache(ttl=0.01)
+        cache.set('file_exist', 'a', True)
+        time.sleep(0.02)
+        self.assertFalse(cache.get('file_exist', 'a')[0])
+        self.assertEqual(len(cache), 0)
+
+    def test_invalidate_related_paths(self):
+        cache = MetadataCache()
+        for path in ['~/project', '~/project/src', '~/project/src/main.py', '~/projects']:
+            cache.set('file_exist', path, True)
+        cache.invalidate('~/project/src')
+        self.assertEqual(sorted(key[1] for key in cache._entries), ['~/projects'])
+
+    def test_is_related(self):
+        self.assertTrue(is_related('/', '/etc'))
+        self.assertTrue(is_related('a/b', 'a'))
+        self.assertFalse(is_related('a/b', 'a/bc'))
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+import unittest
+
+from docker.errors import DockerUnavailableError
+from docker.group import DockerGroup
+from tests.utils import LocalDocker
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+
+class DockerGroupTests(unittest.TestCase):
+
+    def setUp(self):
+        self.dockers = [LocalDocker(env_variables={'INDEX': index}) for index in range(4)]
+        self.group = DockerGroup(self.dockers, max_workers=2)
+
+    def tearDown(self):
+        for docker in self.dockers:
+            docker.cleanup()
+
+    def test_run_all_in_order(self):
+        results = self.group.run_all('printenv INDEX')
+        self.assertEqual([result.value.out for result in results], ['0\n', '1\n', '2\n', '3\n'])
+        self.assertEqual([result.docker for result in results], self.dockers)
+        self.assertTrue(all(result.succeeded for result in results))
+
+    def test_run_all_as_completed(self):
+        results = list(self.group.run_all('printenv INDEX', as_completed=True))
+        self.assertEqual(sorted(result.index for result in results), [0, 1, 2, 3])
+
+    def test_bounded_workers(self):
+        lock = threading.Lock()
+        running = []
+        peak = []
+
+        def work(docker):
+            with lock:
+                running.append(docker)
+                peak.append(len(running))
+            time.sleep(0.01)
+            with lock:
+                running.remove(docker)
+
+        self.group.map(work)
+        self.assertEqual(max(peak), 2)
+
+    def test_errors_are_collected(self):
+        def fail_odd(docker):
+            if self.dockers.index(docker) % 2:
+                raise DockerUnavailableError()
+            return docker.run('exit 3')
+
+        results = self.group.map(fail_odd)
+        self.assertEqual([result.succeeded for result in results], [False] * 4)
+        self.assertIsInstance(results[1].error, DockerUnavailableError)
+        self.assertEqual(results[0].value.return_code, 3)
+
+    def test_start_drops_failed_containers(self):
+        def start(docker):
+            if docker is self.dockers[0]:
+                raise DockerUnavailableError()
+            return docker
+
+        with mock.patch('docker.manager.Docker.stop', autospec=True) as mock_stop:
+            with mock.patch('docker.manager.Docker.start', autospec=True, side_effect=start):
+                with self.group as group:
+                    self.assertEqual(group.dockers, self.dockers[1:])
+                    self.assertEqual(group.failed[0].docker, self.dockers[0])
+            self.assertEqual(mock_stop.call_count, 3)
+
+    def test_from_images(self):
+        group = DockerGroup.from_images(['ubuntu', 'debian'], max_workers=1)
+        self.assertEqual([docker.image for docker in group.dockers], ['ubuntu', 'debian'])
+        self.assertEqual(len(group), 2)
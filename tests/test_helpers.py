@@ -1,7 +1,15 @@
 # -*- coding: utf-8 -*-
+import io
+import os
+import shutil
+import tarfile
+import tempfile
+import time
 import unittest
 
-from docker.helpers import ProcessResult
+from docker.helpers import (OVERFLOW_SPILL, FileEntry, OutputCapture, ProcessResult, StreamBuffer,
+                            add_to_archive, execute, execute_stream, extract_archive,
+                            parse_file_entries, parse_memory)
 
 
 class ProcessResultTest(unittest.TestCase):
@@ -15,3 +23,218 @@ class ProcessResultTest(unittest.TestCase):
         self.assertFalse(result.succeeded)
         result.return_code = 127
         self.assertFalse(result.succeeded)
+
+    def test_lazy_decoding(self):
+        result = ProcessResult('cat', out_bytes=memoryview(u'h\u00e9\nworld'.encode('utf-8')))
+        self.assertIsNone(result._out)
+        self.assertEqual(result.out, u'h\u00e9\nworld')
+        self.assertEqual(result.err, '')
+        self.assertFalse(hasattr(result, '__dict__'))
+
+    def test_encoding_and_errors(self):
+        result = ProcessResult('cat', out_bytes=b'caf\xe9', encoding='latin-1')
+        self.assertEqual(result.out, u'caf\u00e9')
+        result = ProcessResult('cat', out_bytes=b'caf\xe9', errors='replace')
+        self.assertEqual(result.out, u'caf\ufffd')
+        result = ProcessResult('cat', out_bytes=b'caf\xe9')
+        self.assertRaises(UnicodeDecodeError, lambda: result.out)
+        result.out_truncated = True
+        self.assertEqual(result.out, u'caf\ufffd')
+
+    def test_setters(self):
+        result = ProcessResult('echo')
+        result.out = 'text\n'
+        self.assertEqual(result.out_bytes, b'text\n')
+        result.err_bytes = b'error'
+        self.assertEqual(result.err, 'error')
+
+    def test_lines(self):
+        result = ProcessResult('ls', out_bytes=b'a\nb c\r\n\nd', err_bytes=b'e\n')
+        self.assertEqual(list(result.lines()), ['a', 'b c', '', 'd'])
+        self.assertEqual(list(result.lines('err')), ['e'])
+        result.out = 'x\ny'
+        self.assertEqual(list(result.lines()), ['x', 'y'])
+
+    def test_lines_do_not_depend_on_decoding(self):
+        out = u'a\x0bb\x0cc\u2028d\re\r\nf\n'.encode('utf-8')
+        result = ProcessResult('ls', out_bytes=out)
+        lines = list(result.lines())
+        self.assertEqual(lines, [u'a\x0bb\x0cc\u2028d', 'e', 'f'])
+        self.assertTrue(result.out)
+        self.assertEqual(list(result.lines()), lines)
+
+    def test_repr(self):
+        result = ProcessResult('ls', out_bytes=b'abc')
+        result.return_code = 0
+        self.assertEqual(repr(result),
+                         "<ProcessResult command='ls' return_code=0 out=3 bytes err=0 bytes>")
+        self.assertIsNone(result._out)
+
+    def test_execute_keeps_bytes(self):
+        result = execute('printf "caf\\351"', encoding='latin-1')
+        self.assertEqual(result.out_bytes, b'caf\xe9')
+        self.assertEqual(result.out, u'caf\u00e9')
+
+
+class ExecuteOutputLimitTest(unittest.TestCase):
+
+    def test_without_limit(self):
+        result = execute('seq 1000')
+        self.assertEqual(len(result.out.splitlines()), 1000)
+        self.assertFalse(result.out_truncated)
+        self.assertIsNone(result.out_file)
+
+    def test_tail(self):
+        result = execute('seq 100000 && echo error >&2', max_output=12)
+        self.assertEqual(result.out, '\n99999\n100000\n'[-12:])
+        self.assertTrue(result.out_truncated)
+        self.assertIsNone(result.out_file)
+        self.assertEqual(result.err, 'error\n')
+        self.assertFalse(result.err_truncated)
+        self.assertEqual(result.return_code, 0)
+
+    def test_spill(self):
+        result = execute('seq 100000', max_output=8, overflow=OVERFLOW_SPILL)
+        self.assertEqual(result.out, '1\n2\n3\n4\n')
+        self.assertTrue(result.out_truncated)
+        self.assertEqual(len(result.out_file.read().splitlines()), 100000)
+        result.out_file.close()
+
+    def test_capture(self):
+        capture = OutputCapture(4)
+        for chunk in [b'ab', b'cd', b'ef', b'\xc3\xa5']:
+            capture.write(chunk)
+        self.assertEqual(capture.value(), b'ef\xc3\xa5')
+        self.assertEqual(capture.size, 8)
+        self.assertEqual(OutputCapture(0).value(), b'')
+
+        result = ProcessResult('cat')
+        capture = OutputCapture(2)
+        capture.write(b'a\xc3\xa5b')
+        capture.store(result, 'out')
+        self.assertEqual(result.out, u'\ufffdb')
+        self.assertRaises(ValueError, OutputCapture, 1, 'head')
+
+
+class ExecuteTimeoutTest(unittest.TestCase):
+
+    def test_kills_process_group(self):
+        started = time.time()
+        result = execute('echo started && sleep 30 & sleep 30 && echo done', timeout=0.3)
+        self.assertLess(time.time() - started, 5)
+        self.assertTrue(result.timed_out)
+        self.assertEqual(result.out, 'started\n')
+        self.assertEqual(result.return_code, -9)
+
+    def test_finishes_in_time(self):
+        result = execute('echo done', timeout=5)
+        self.assertFalse(result.timed_out)
+        self.assertEqual(result.out, 'done\n')
+
+
+class ProcessStreamTest(unittest.TestCase):
+
+    def test_chunks(self):
+        stream = execute_stream('echo out && echo err >&2 && exit 3')
+        self.assertEqual(sorted(stream), [('err', 'err\n'), ('out', 'out\n')])
+        self.assertEqual(stream.return_code, 3)
+        self.assertFalse(stream.succeeded)
+
+    def test_lines(self):
+        stream = execute_stream('printf "a\\nb" && printf "c\\nd"', lines=True)
+        self.assertEqual(list(stream), [('out', 'a\n'), ('out', 'bc\n'), ('out', 'd')])
+        self.assertTrue(stream.succeeded)
+
+    def test_callback(self):
+        received = []
+        stream = execute_stream('cat', stdin='hi', callback=lambda *item: received.append(item))
+        self.assertEqual(stream.wait(), 0)
+        self.assertEqual(received, [('out', 'hi')])
+
+    def test_file_stdin_and_bytes(self):
+        stream = execute_stream('cat', stdin=io.BytesIO(b'\xff\x00' * 100000), decode=False)
+        self.assertEqual(b''.join(data for _, data in stream), b'\xff\x00' * 100000)
+
+    def test_split_multibyte_characters(self):
+        buffer = StreamBuffer('out')
+        self.assertEqual(buffer.feed(b'\xc3'), [])
+        self.assertEqual(buffer.feed(b'\xa6'), [u'\xe6'])
+
+    def test_close(self):
+        stream = execute_stream('echo first && sleep 10')
+        self.assertEqual(next(stream), ('out', 'first\n'))
+        stream.close()
+        self.assertIsNotNone(stream.return_code)
+
+
+class ParseFileEntriesTest(unittest.TestCase):
+
+    def test_parse(self):
+        self.assertEqual(
+            parse_file_entries('f\x003\x00644\x001.5\x00a b\x00d\x004096\x00755\x002.0\x00dir\x00'),
+            [FileEntry('a b', 'file', 3, 0o644, 1.5),
+             FileEntry('dir', 'directory', 4096, 0o755, 2.0)]
+        )
+
+    def test_parse_with_paths(self):
+        self.assertEqual(
+            parse_file_entries('n\x00\x00\x00\x00p\x000\x00600\x001\x00', ['missing', 'fifo']),
+            [None, FileEntry('fifo', 'other', 0, 0o600, 1.0)]
+        )
+
+
+class ParseMemoryTest(unittest.TestCase):
+
+    def test_parse(self):
+        self.assertEqual(parse_memory(1024), 1024)
+        self.assertEqual(parse_memory('2048'), 2048)
+        self.assertEqual(parse_memory('512m'), 512 * 1024 ** 2)
+        self.assertEqual(parse_memory('1.5G'), int(1.5 * 1024 ** 3))
+        self.assertRaises(ValueError, parse_memory, 'lots')
+
+
+class ExtractArchiveTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.destination = os.path.join(self.directory, 'out')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def extract(self, *members):
+        archive = io.BytesIO()
+        with tarfile.open(fileobj=archive, mode='w') as tar:
+            for name, linkname, member_type in members:
+                if member_type == tarfile.REGTYPE:
+                    add_to_archive(tar, name, linkname)
+                else:
+                    info = tarfile.TarInfo(name)
+                    info.type = member_type
+                    info.linkname = linkname
+                    tar.addfile(info)
+        archive.seek(0)
+        with tarfile.open(fileobj=archive, mode='r|') as tar:
+            extract_archive(tar, self.destination)
+
+    def test_extract(self):
+        self.extract(('./sub/file', 'content', tarfile.REGTYPE),
+                     ('./link', 'sub/file', tarfile.SYMTYPE),
+                     ('./sub/hard', './sub/file', tarfile.LNKTYPE))
+        with open(os.path.join(self.destination, 'link')) as file_object:
+            self.assertEqual(file_object.read(), 'content')
+        with open(os.path.join(self.destination, 'sub', 'hard')) as file_object:
+            self.assertEqual(file_object.read(), 'content')
+
+    def test_unsafe_members(self):
+        for members in [
+            [('../escaped', 'content', tarfile.REGTYPE)],
+            [('./sub/../../escaped', 'content', tarfile.REGTYPE)],
+            [('./link', '/etc/passwd', tarfile.SYMTYPE)],
+            [('./link', '../..', tarfile.SYMTYPE)],
+            [('./hard', '/etc/passwd', tarfile.LNKTYPE)],
+            [('./link', '..', tarfile.SYMTYPE), ('./link/escaped', 'content', tarfile.REGTYPE)],
+            [('./device', '', tarfile.CHRTYPE)],
+        ]:
+            self.assertRaises(tarfile.ExtractError, self.extract, *members)
+        self.assertFalse(os.path.exists(os.path.join(self.directory, 'escaped')))
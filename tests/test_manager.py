@@ -1,11 +1,21 @@
+import io
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
 import unittest
 from random import randint
 
 import six
 
-from docker.errors import DockerFileNotFoundError, DockerWrapperBaseError
+from docker.errors import (DockerFileNotFoundError, DockerOutputTruncatedError, DockerTimeoutError,
+                           DockerUnavailableError, DockerWrapperBaseError)
 from docker.helpers import ProcessResult
 from docker.manager import Docker
+from docker.session import ShellSession
+from tests.utils import LocalDocker
 
 try:
     from unittest import mock
@@ -36,6 +46,12 @@ class DockerManagerTests(unittest.TestCase):
         mock_start.assert_called_once_with()
         mock_stop.assert_called_once_with()
 
+    def test_resource_limits(self):
+        docker = Docker(cpus=1.5, memory='512m')
+        self.assertIn('--cpus 1.5 --memory 512m', docker._get_start_command())
+        docker = Docker(argv=True, cpus=2)
+        self.assertEqual(docker._get_start_command()[3:5], ['--cpus', '2'])
+
     @mock.patch('docker.manager.Docker.stop')
     @mock.patch('docker.manager.Docker.start')
     def test_wrap(self, mock_start, mock_stop):
@@ -100,12 +116,25 @@ class DockerManagerTests(unittest.TestCase):
             ''
         )
 
+    @mock.patch('docker.manager.execute_stream')
+    def test_run_stream(self, mock_stream):
+        callback = mock.Mock()
+        docker = Docker()
+        docker.run_stream('make', 'project', callback=callback, lines=True)
+        mock_stream.assert_called_once_with(
+            'docker exec -i {} bash -c \'cd ~/project &&  make\''.format(docker.container_name),
+            '',
+            callback=callback,
+            lines=True
+        )
+
     @mock.patch('docker.manager.execute')
     def test_single_port_mappping(self, mock_run):
         docker = Docker(ports_mapping=['4080:4080'])
         docker.start()
         mock_run.assert_called_once_with(
-            'docker run -d -p 4080:4080 --name {0} {1} /bin/sleep {2}'.format(
+            'docker run -d -p 4080:4080 --label {0} --name {1} {2} /bin/sleep {3}'.format(
+                docker._get_owner_label(),
                 docker.container_name,
                 docker.image,
                 docker.timeout
@@ -117,8 +146,9 @@ class DockerManagerTests(unittest.TestCase):
         docker = Docker(ports_mapping=ports)
         docker.start()
         mock_run.assert_called_once_with(
-            'docker run -d {0} --name {1} {2} /bin/sleep {3}'.format(
+            'docker run -d {0} --label {1} --name {2} {3} /bin/sleep {4}'.format(
                 ' '.join(["-p {0}".format(port_mapping) for port_mapping in ports]),
+                docker._get_owner_label(),
                 docker.container_name,
                 docker.image,
                 docker.timeout
@@ -314,6 +344,12 @@ class DockerInteractionTests(unittest.TestCase):
         written_content = self.docker.read_file(path)
         self.assertEqual(written_content, content)
 
+    def test_put_and_get_files(self):
+        files = {'readme.txt': 'this is a readme\n', 'bin/data': b'\x00\xff'}
+        self.docker.put_files(files, 'project')
+        self.assertEqual(self.docker.read_file('project/readme.txt'), files['readme.txt'])
+        self.assertEqual(self.docker.get_files(['bin/data'], 'project'), {'bin/data': b'\x00\xff'})
+
     def test_run_return_code(self):
         code = 4
         path = 'testfile'
@@ -321,3 +357,539 @@ class DockerInteractionTests(unittest.TestCase):
         self.docker.write_file(path, content)
         result = self.docker.run('bash {0}'.format(path))
         self.assertEqual(code, result.return_code)
+
+
+class DockerFileTransferTests(unittest.TestCase):
+
+    def setUp(self):
+        self.docker = LocalDocker()
+        self.host_directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        self.docker.cleanup()
+        shutil.rmtree(self.host_directory)
+
+    def test_write_file_from_and_read_file_to(self):
+        content = bytes(bytearray(range(256))) * 1000
+        result = self.docker.write_file_from('core', io.BytesIO(content), chunk_size=4096)
+        self.assertTrue(result.succeeded)
+
+        output = io.BytesIO()
+        self.assertEqual(self.docker.read_file_to('core', output, chunk_size=4096), len(content))
+        self.assertEqual(output.getvalue(), content)
+
+    def test_write_file_from_append(self):
+        self.docker.write_file('log', 'first\n')
+        self.docker.write_file_from('log', io.BytesIO(b'second\n'), append=True)
+        self.assertEqual(self.docker.read_file('log'), 'first\nsecond\n')
+
+    def test_read_file_to_not_found(self):
+        self.assertRaises(DockerFileNotFoundError, self.docker.read_file_to, 'missing',
+                          io.BytesIO())
+
+    def test_put_and_get_files(self):
+        files = {
+            'a.txt': 'text\n',
+            'dir/b.bin': b'\x00\xff' * 1000,
+            'c.txt': io.BytesIO(b'file-like'),
+        }
+        self.assertTrue(self.docker.put_files(files, 'project').succeeded)
+        self.assertEqual(self.docker.read_file('project/a.txt'), 'text\n')
+        self.assertEqual(
+            self.docker.get_files(['a.txt', 'dir', 'c.txt'], 'project'),
+            {'a.txt': b'text\n', 'dir/b.bin': b'\x00\xff' * 1000, 'c.txt': b'file-like'}
+        )
+
+    def test_put_files_compressed(self):
+        self.docker.put_files({'a.txt': 'a'}, compress=True)
+        self.assertEqual(self.docker.get_files(['a.txt'], compress=True), {'a.txt': b'a'})
+
+    def test_put_files_keeps_mode_and_mtime(self):
+        path = os.path.join(self.host_directory, 'script.sh')
+        with open(path, 'w') as script:
+            script.write('echo hi\n')
+        os.chmod(path, 0o755)
+        os.utime(path, (1000000000, 1000000000))
+
+        with open(path, 'rb') as script:
+            self.docker.put_files({'script.sh': script})
+        self.assertEqual(self.docker.run('./script.sh').out, 'hi\n')
+        self.assertEqual(self.docker.run('stat -c %Y script.sh').out, '1000000000\n')
+
+    def test_get_files_not_found(self):
+        self.assertRaises(DockerFileNotFoundError, self.docker.get_files, ['missing'])
+        self.assertRaises(DockerFileNotFoundError, self.docker.get_files, ['a'], 'missing')
+
+    def test_copy_tree(self):
+        os.makedirs(os.path.join(self.host_directory, 'src', 'sub'))
+        with open(os.path.join(self.host_directory, 'src', 'sub', 'file'), 'w') as f:
+            f.write('content')
+
+        self.docker.copy_tree(os.path.join(self.host_directory, 'src'), 'workspace')
+        self.assertEqual(self.docker.read_file('workspace/sub/file'), 'content')
+
+        destination = os.path.join(self.host_directory, 'out')
+        self.docker.copy_tree('workspace', destination, from_container=True)
+        with open(os.path.join(destination, 'sub', 'file')) as f:
+            self.assertEqual(f.read(), 'content')
+
+    def test_copy_tree_rejects_links_out_of_the_destination(self):
+        self.docker.run('mkdir -p workspace && ln -s /etc workspace/etc')
+        destination = os.path.join(self.host_directory, 'out')
+        self.assertRaises(DockerWrapperBaseError, self.docker.copy_tree, 'workspace', destination,
+                          from_container=True)
+        self.assertFalse(os.path.lexists(os.path.join(destination, 'etc')))
+
+    def test_copy_tree_not_found(self):
+        self.assertRaises(DockerFileNotFoundError, self.docker.copy_tree, '/does/not/exist', 'a')
+        self.assertRaises(DockerFileNotFoundError, self.docker.copy_tree, 'missing',
+                          self.host_directory, from_container=True)
+
+
+class DockerRunManyTests(unittest.TestCase):
+
+    def setUp(self):
+        self.docker = LocalDocker(env_variables={'CI': 1})
+
+    def tearDown(self):
+        self.docker.cleanup()
+
+    def test_run_many(self):
+        self.docker.run('mkdir project')
+        results = self.docker.run_many(
+            ['pwd', 'printenv CI', 'echo "it\'s" >&2 && exit 3', 'printf no-newline', 'cat'],
+            'project'
+        )
+        self.assertEqual([result.out for result in results],
+                         [self.docker.home + '/project\n', '1\n', '', 'no-newline', ''])
+        self.assertEqual([result.err for result in results], ['', '', 'it\'s\n', '', ''])
+        self.assertEqual([result.return_code for result in results], [0, 0, 3, 0, 0])
+        self.assertEqual(results[1].command, 'printenv CI')
+
+    def test_stop_on_error(self):
+        results = self.docker.run_many(['true', 'false', 'touch file'], stop_on_error=True)
+        self.assertEqual([result.return_code for result in results], [0, 1, None])
+        self.assertIsNone(results[2].succeeded)
+        self.assertFalse(self.docker.file_exist('file'))
+
+    def test_session(self):
+        self.docker.session = True
+        self.docker._sessions[False] = ShellSession(['bash'])
+        results = self.docker.run_many(['echo a', 'exit 2', 'echo b >&2'])
+        self.assertEqual([(r.out, r.err, r.return_code) for r in results],
+                         [('a\n', '', 0), ('', '', 2), ('', 'b\n', 0)])
+        results = self.docker.run_many(["echo it's", 'echo after'])
+        self.assertEqual([r.return_code for r in results], [2, 0])
+        self.assertEqual(results[1].out, 'after\n')
+        self.docker._close_sessions()
+
+    @mock.patch('docker.manager.execute')
+    def test_single_exec(self, mock_execute):
+        mock_execute.return_value = ProcessResult('script')
+        mock_execute.return_value.return_code = 0
+        docker = Docker()
+        docker.run_many(['ls', 'pwd'], login=True)
+        command, script = mock_execute.call_args[0]
+        self.assertEqual(command, 'docker exec -i {0} bash --login -s'.format(
+            docker.container_name
+        ))
+        self.assertEqual(script.count('< /dev/null'), 2)
+
+    @mock.patch('docker.manager.execute')
+    def test_failed_batch(self, mock_execute):
+        mock_execute.return_value = ProcessResult('script')
+        mock_execute.return_value.return_code = 1
+        self.assertRaises(DockerWrapperBaseError, Docker().run_many, ['ls'])
+
+
+class DockerWalkTests(unittest.TestCase):
+
+    def setUp(self):
+        self.docker = LocalDocker()
+        self.docker.run('mkdir -p project/src/.git && touch -d @1000000000 project/src/main.py && '
+                        'chmod 755 project/src && echo hello > project/.hidden && '
+                        'ln -s src project/link')
+
+    def tearDown(self):
+        self.docker.cleanup()
+
+    def test_walk(self):
+        entries = self.docker.walk('project')
+        self.assertEqual([(entry.path, entry.type) for entry in entries],
+                         [('link', 'symlink'), ('src', 'directory'), ('src/main.py', 'file')])
+        main = entries[2]
+        self.assertEqual(main.size, 0)
+        self.assertEqual(main.mtime, 1000000000)
+        self.assertEqual(entries[1].mode, 0o755)
+
+    def test_walk_hidden_and_depth(self):
+        entries = self.docker.walk('project', max_depth=1, include_hidden=True)
+        self.assertEqual([entry.path for entry in entries], ['.hidden', 'link', 'src'])
+        self.assertEqual(entries[0].size, 6)
+
+    def test_walk_not_found(self):
+        self.assertRaises(DockerFileNotFoundError, self.docker.walk, 'missing')
+
+    def test_stat_many(self):
+        entries = self.docker.stat_many(['project/src', 'project/.hidden', 'missing'])
+        self.assertEqual(entries['project/src'].type, 'directory')
+        self.assertEqual(entries['project/src'].path, 'project/src')
+        self.assertEqual(entries['project/.hidden'].size, 6)
+        self.assertIsNone(entries['missing'])
+        self.assertEqual(self.docker.stat_many([]), {})
+
+
+class DockerMetadataCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.docker = LocalDocker(metadata_cache=True)
+        self.docker.run('mkdir -p project/src && touch project/src/main.py')
+
+    def tearDown(self):
+        self.docker.cleanup()
+
+    def test_caches_reads(self):
+        self.assertTrue(self.docker.file_exist('project/src/main.py'))
+        self.assertEqual(self.docker.list_files('project/src'), ['main.py'])
+        with mock.patch.object(self.docker, 'run') as mock_run:
+            self.assertTrue(self.docker.file_exist('project/src/main.py'))
+            self.assertEqual(self.docker.list_files('project/src'), ['main.py'])
+            self.assertFalse(mock_run.called)
+        self.assertEqual(self.docker.metadata_cache.stats()['hits'], 2)
+
+    def test_write_file_invalidates_path(self):
+        self.assertFalse(self.docker.file_exist('project/README'))
+        self.assertEqual(self.docker.list_files('project/src'), ['main.py'])
+        self.docker.write_file('project/README', 'hi')
+        self.assertTrue(self.docker.file_exist('project/README'))
+        self.assertEqual(len(self.docker.metadata_cache), 2)
+
+    def test_run_invalidates_everything(self):
+        self.assertFalse(self.docker.directory_exist('project/docs'))
+        self.docker.run('mkdir project/docs')
+        self.assertTrue(self.docker.directory_exist('project/docs'))
+
+    def test_run_with_invalidation_hint(self):
+        self.assertEqual(self.docker.list_files('project/src'), ['main.py'])
+        self.assertFalse(self.docker.file_exist('project/README'))
+        self.docker.run('touch project/src/util.py', invalidate=['project/src/util.py'])
+        self.assertEqual(self.docker.list_files('project/src'), ['main.py', 'util.py'])
+        self.assertFalse(self.docker.file_exist('project/README'))
+        self.assertEqual(self.docker.metadata_cache.stats()['hits'], 1)
+
+    def test_errors_are_not_cached(self):
+        self.assertRaises(DockerFileNotFoundError, self.docker.list_files, 'missing')
+        self.docker.run('mkdir missing', invalidate=False)
+        self.assertEqual(self.docker.list_files('missing'), [])
+
+
+class DockerOutputLimitTests(unittest.TestCase):
+
+    def setUp(self):
+        self.docker = LocalDocker(max_output=16)
+
+    def tearDown(self):
+        self.docker.cleanup()
+
+    def test_run_keeps_tail(self):
+        result = self.docker.run('seq 10000')
+        self.assertTrue(result.out_truncated)
+        self.assertTrue(result.out.endswith('9999\n10000\n'))
+        self.assertEqual(len(result.out), 16)
+
+    def test_parsing_helpers_raise(self):
+        self.docker.write_file('file', 'a' * 100)
+        self.assertRaises(DockerOutputTruncatedError, self.docker.read_file, 'file')
+        self.docker.max_output = None
+        self.assertEqual(self.docker.read_file('file'), 'a' * 100)
+
+
+class DockerTimeoutTests(unittest.TestCase):
+
+    def setUp(self):
+        self.docker = LocalDocker()
+
+    def tearDown(self):
+        self.docker.cleanup()
+
+    def test_get_exec_command(self):
+        docker = Docker()
+        self.assertEqual(
+            docker._get_exec_command('ls', timeout=10),
+            'docker exec -i {0} timeout -k 5 10 bash -c \'cd ~/ &&  ls\''.format(
+                docker.container_name
+            )
+        )
+
+    def test_run_timeout(self):
+        started = time.time()
+        result = self.docker.run('echo partial && sleep 30', timeout=0.3)
+        self.assertLess(time.time() - started, 5)
+        self.assertTrue(result.timed_out)
+        self.assertEqual(result.out, 'partial\n')
+        self.assertEqual(result.return_code, 124)
+
+    def test_run_in_time(self):
+        result = self.docker.run('echo done', timeout=5)
+        self.assertFalse(result.timed_out)
+        self.assertEqual(result.out, 'done\n')
+
+    def test_session_timeout(self):
+        docker = Docker(session=True)
+        docker._sessions[False] = ShellSession(['bash'])
+        try:
+            result = docker.run('echo \'partial\' && sleep 30', timeout=0.3)
+            self.assertTrue(result.timed_out)
+            self.assertEqual(result.out, 'partial\n')
+            self.assertEqual(docker.run('echo alive').out, 'alive\n')
+        finally:
+            docker._close_sessions()
+
+    def test_helpers_raise(self):
+        self.docker.run('mkfifo pipe')
+        self.assertRaises(DockerTimeoutError, self.docker.read_file, 'pipe', timeout=0.3)
+
+        result = ProcessResult('test -f pipe')
+        result.return_code = 124
+        result.timed_out = True
+        with mock.patch.object(self.docker, 'run', return_value=result) as mock_run:
+            self.assertRaises(DockerTimeoutError, self.docker.file_exist, 'pipe', timeout=1)
+            mock_run.assert_called_once_with('test -f ~/pipe', invalidate=False, timeout=1)
+
+
+class DockerWaitTests(unittest.TestCase):
+
+    def setUp(self):
+        self.docker = LocalDocker()
+
+    def tearDown(self):
+        self.docker.cleanup()
+
+    def later(self, func):
+        timer = threading.Timer(0.2, func)
+        timer.start()
+        self.addCleanup(timer.cancel)
+
+    def test_wait_for_file(self):
+        path = os.path.join(self.docker.home, 'ready')
+        self.later(lambda: open(path, 'w').close())
+        self.assertTrue(self.docker.wait_for_file('ready', timeout=5, interval=0.05))
+        self.assertTrue(os.path.exists(path))
+
+    def test_wait_for_file_timeout(self):
+        started = time.time()
+        self.assertFalse(self.docker.wait_for_file('missing', timeout=0.3))
+        self.assertLess(time.time() - started, 5)
+
+    def test_wait_for_port(self):
+        server = socket.socket()
+        self.addCleanup(server.close)
+        server.bind(('127.0.0.1', 0))
+        port = server.getsockname()[1]
+        self.later(server.listen)
+        self.assertTrue(self.docker.wait_for_port(port, timeout=5, interval=0.05))
+
+        server.close()
+        self.assertFalse(self.docker.wait_for_port(port, timeout=0.3))
+
+    def test_wait_with_env_variables(self):
+        docker = LocalDocker(env_variables={'CI': '1'})
+        self.addCleanup(docker.cleanup)
+        open(os.path.join(docker.home, 'ready'), 'w').close()
+        self.assertTrue(docker.wait_for_file('ready', timeout=5))
+        self.assertFalse(docker.wait_for_file('missing', timeout=0.3))
+
+        server = socket.socket()
+        self.addCleanup(server.close)
+        server.bind(('127.0.0.1', 0))
+        server.listen(1)
+        self.assertTrue(docker.wait_for_port(server.getsockname()[1], timeout=5))
+        self.assertTrue(docker.wait_for_output('echo ready', 'ready', timeout=5))
+
+    def test_wait_for_output(self):
+        path = os.path.join(self.docker.home, 'log')
+        open(path, 'w').close()
+
+        def write():
+            with open(path, 'w') as file_object:
+                file_object.write("server 'up' on $PORT\n")
+
+        self.later(write)
+        self.assertTrue(self.docker.wait_for_output('cat log', "'up' on \\$PORT$",
+                                                    timeout=5, interval=0.05))
+        self.assertFalse(self.docker.wait_for_output('cat log', 'down', timeout=0.3))
+
+    def test_wait_fails(self):
+        result = ProcessResult('wait')
+        result.return_code = 1
+        result.err = 'No such container'
+        with mock.patch.object(self.docker, 'run', return_value=result):
+            self.assertRaises(DockerWrapperBaseError, self.docker.wait_for_port, 80)
+
+
+class DockerArgvTests(unittest.TestCase):
+
+    def setUp(self):
+        self.docker = LocalDocker(argv=True, env_variables={'CI': 1})
+
+    def tearDown(self):
+        self.docker.cleanup()
+
+    def test_exec_args(self):
+        docker = Docker(argv=True, env_variables={'CI': 1})
+        self.assertEqual(
+            docker._get_exec_command('echo "it\'s"', 'project', login=True, tty=True, timeout=5),
+            ['docker', 'exec', '-i', '-t', '-e', 'CI=1', docker.container_name,
+             'timeout', '-k', '5', '5', 'bash', '--login', '-c', 'cd ~/project && echo "it\'s"']
+        )
+        docker = Docker(argv=True, privilege=True, ports_mapping=['80:80'], timeout=10)
+        self.assertEqual(
+            docker._get_start_command(),
+            ['docker', 'run', '-d', '--privileged', '-p', '80:80', '--label',
+             docker._get_owner_label(), '--name', docker.container_name, 'ubuntu', '/bin/sleep',
+             '10']
+        )
+
+    @mock.patch('docker.manager.execute')
+    def test_run_without_shell(self, mock_execute):
+        docker = Docker(argv=True, combine_outputs=True)
+        docker.run('ls')
+        docker.stop()
+        mock_execute.assert_has_calls([
+            mock.call(['docker', 'exec', '-i', docker.container_name, 'bash', '-c',
+                       'exec 2>&1; cd ~/ && ls'], ''),
+            mock.call(['docker', 'rm', '-f', docker.container_name]),
+        ])
+
+    def test_quotes_are_kept(self):
+        result = self.docker.run('printf "%s|" "it\'s" \'a "b"\' && printenv CI')
+        self.assertEqual(result.out, 'it\'s|a "b"|1\n')
+
+    def test_combine_outputs(self):
+        self.docker.combine_outputs = True
+        result = self.docker.run('echo out && echo err >&2')
+        self.assertEqual(result.out, 'out\nerr\n')
+
+    def test_helpers(self):
+        self.docker.run('mkdir project')
+        self.docker.write_file('project/file', 'it\'s')
+        self.assertEqual(self.docker.read_file('project/file'), 'it\'s')
+        self.assertEqual(self.docker.list_files('project'), ['file'])
+        self.assertEqual([result.out for result in self.docker.run_many(['echo 1', 'echo 2'])],
+                         ['1\n', '2\n'])
+        self.assertTrue(self.docker.run('sleep 30', timeout=0.3).timed_out)
+
+
+class DockerDeferredStartTests(unittest.TestCase):
+
+    @mock.patch('docker.manager.execute')
+    def test_lazy_start_without_use(self, mock_execute):
+        with Docker(lazy_start=True):
+            pass
+        self.assertFalse(mock_execute.called)
+
+    @mock.patch('docker.manager.execute')
+    def test_lazy_start_on_first_use(self, mock_execute):
+        with Docker(lazy_start=True) as docker:
+            self.assertFalse(mock_execute.called)
+            docker.run('ls')
+            docker.run('ls')
+        self.assertEqual([call[0][0].split()[1] for call in mock_execute.call_args_list],
+                         ['run', 'exec', 'exec', 'rm'])
+
+    @mock.patch('docker.manager.execute')
+    def test_background_start(self, mock_execute):
+        started = threading.Event()
+
+        def start(docker):
+            started.wait(5)
+
+        with mock.patch('docker.manager.Docker._start', autospec=True, side_effect=start):
+            docker = Docker(background_start=True).start()
+            self.assertFalse(mock_execute.called)
+            threading.Timer(0.05, started.set).start()
+            docker.run('ls')
+            self.assertTrue(started.is_set())
+        docker.stop()
+        self.assertEqual(mock_execute.call_count, 2)
+
+    @mock.patch('docker.manager.execute')
+    def test_background_start_error(self, mock_execute):
+        with mock.patch('docker.manager.Docker._start', side_effect=DockerUnavailableError()):
+            docker = Docker(background_start=True).start()
+            self.assertRaises(DockerUnavailableError, docker.run, 'ls')
+            self.assertRaises(DockerUnavailableError, docker.run, 'ls')
+        self.assertFalse(mock_execute.called)
+        docker.stop()
+        mock_execute.assert_called_once_with('docker rm -f {0}'.format(docker.container_name))
+
+
+class DockerSyncDirectoryTests(unittest.TestCase):
+
+    def setUp(self):
+        self.docker = LocalDocker()
+        self.source = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.source, 'src'))
+        self.write('README', 'readme')
+        self.write('src/main.py', 'print(1)')
+        self.write('src/it\'s here', 'quoted')
+
+    def tearDown(self):
+        self.docker.cleanup()
+        shutil.rmtree(self.source)
+
+    def write(self, name, content):
+        with open(os.path.join(self.source, name), 'w') as fd:
+            fd.write(content)
+
+    def test_sync(self):
+        result = self.docker.sync_directory(self.source, 'project')
+        self.assertEqual(result.changed, ['README', 'src/it\'s here', 'src/main.py'])
+        self.assertEqual(self.docker.read_file('project/src/main.py'), 'print(1)')
+
+        with mock.patch('docker.manager.execute_stream') as mock_stream:
+            self.assertEqual(self.docker.sync_directory(self.source, 'project'), ([], []))
+            self.assertFalse(mock_stream.called)
+
+        self.write('src/main.py', 'print(2)')
+        os.remove(os.path.join(self.source, 'src/it\'s here'))
+        result = self.docker.sync_directory(self.source, 'project')
+        self.assertEqual(result, (['src/main.py'], ['src/it\'s here']))
+        self.assertEqual(self.docker.read_file('project/src/main.py'), 'print(2)')
+        self.assertEqual(self.docker.list_files('project/src'), ['main.py'])
+
+    def test_touched_files_are_not_sent(self):
+        self.docker.sync_directory(self.source, 'project')
+        os.utime(os.path.join(self.source, 'README'), (1, 1))
+        self.assertEqual(self.docker.sync_directory(self.source, 'project'), ([], []))
+
+    def test_keep_deleted(self):
+        self.docker.sync_directory(self.source, 'project')
+        os.remove(os.path.join(self.source, 'README'))
+        self.assertEqual(self.docker.sync_directory(self.source, 'project', delete=False),
+                         ([], []))
+        self.assertTrue(self.docker.file_exist('project/README'))
+
+    def test_verify(self):
+        self.docker.sync_directory(self.source, 'project')
+        self.docker.run('echo changed > project/README && touch project/extra')
+        os.remove(os.path.join(self.source, 'src/main.py'))
+        self.assertEqual(self.docker.sync_directory(self.source, 'project', delete=False),
+                         ([], []))
+        result = self.docker.sync_directory(self.source, 'project', verify=True, compress=True)
+        self.assertEqual(result, (['README'], ['src/main.py']))
+        self.assertEqual(self.docker.read_file('project/README'), 'readme')
+        self.assertTrue(self.docker.file_exist('project/extra'))
+
+    def test_verify_with_env_variables(self):
+        docker = LocalDocker(env_variables={'CI': '1'})
+        self.addCleanup(docker.cleanup)
+        self.assertEqual(docker.sync_directory(self.source, 'project', verify=True).changed,
+                         ['README', 'src/it\'s here', 'src/main.py'])
+        docker.run('echo changed > project/README')
+        self.assertEqual(docker.sync_directory(self.source, 'project', verify=True),
+                         (['README'], []))
+
+    def test_not_found(self):
+        self.assertRaises(DockerFileNotFoundError, self.docker.sync_directory,
+                          os.path.join(self.source, 'missing'), 'project')
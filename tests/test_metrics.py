@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+import threading
+import unittest
+
+from docker import metrics
+from docker.helpers import execute, execute_stream
+from docker.metrics import Execution, MetricsAggregator, Observer, operation, percentile
+from tests.utils import LocalDocker
+
+
+class RecordingObserver(Observer):
+
+    def __init__(self):
+        self.events = []
+
+    def spawned(self, execution):
+        self.events.append(('spawned', execution))
+
+    def first_byte(self, execution):
+        self.events.append(('first_byte', execution))
+
+    def exited(self, execution):
+        self.events.append(('exited', execution))
+
+    def finished(self, execution):
+        self.events.append(('finished', execution))
+
+    def gauge(self, name, value):
+        self.events.append(('gauge', (name, value)))
+
+
+class ObserverTests(unittest.TestCase):
+
+    def setUp(self):
+        self.observer = RecordingObserver()
+        metrics.add_observer(self.observer)
+
+    def tearDown(self):
+        metrics.remove_observer(self.observer)
+
+    def test_execute(self):
+        result = execute('cat && echo err >&2 && exit 2', 'hello')
+        self.assertEqual(result.out, 'hello')
+        self.assertEqual(result.err, 'err\n')
+        self.assertEqual(result.return_code, 2)
+
+        self.assertEqual([event for event, _ in self.observer.events],
+                         ['spawned', 'first_byte', 'exited', 'finished'])
+        execution = self.observer.events[-1][1]
+        self.assertEqual(execution.bytes_in, 5)
+        self.assertEqual(execution.bytes_out, 9)
+        self.assertEqual(execution.return_code, 2)
+        self.assertIsNone(execution.operation)
+        self.assertTrue(execution.started <= execution.first_byte <= execution.finished)
+
+    def test_gauge(self):
+        metrics.set_gauge('leaked', 3)
+        self.assertEqual(metrics.gauges['leaked'], 3)
+        self.assertEqual(self.observer.events, [('gauge', ('leaked', 3))])
+
+    def test_execute_without_output(self):
+        execute('true')
+        self.assertEqual([event for event, _ in self.observer.events],
+                         ['spawned', 'exited', 'finished'])
+
+    def test_execute_stream(self):
+        stream = execute_stream('cat', stdin='hello')
+        self.assertEqual(stream.collect().out, 'hello')
+        self.assertEqual([event for event, _ in self.observer.events],
+                         ['spawned', 'first_byte', 'exited', 'finished'])
+        self.assertEqual(stream.execution.bytes_in, 5)
+        self.assertEqual(stream.execution.bytes_out, 5)
+
+    def test_failing_observer_is_ignored(self):
+        observer = Observer()
+        observer.spawned = None
+        metrics.add_observer(observer)
+        try:
+            self.assertEqual(execute('echo hi').out, 'hi\n')
+        finally:
+            metrics.remove_observer(observer)
+
+    def test_docker_methods_are_tagged(self):
+        docker = LocalDocker()
+        try:
+            docker.write_file('file', 'content')
+            docker.read_file('file')
+            docker.run('true')
+        finally:
+            docker.cleanup()
+        operations = [execution.operation for event, execution in self.observer.events
+                      if event == 'finished']
+        self.assertEqual(operations, ['write_file', 'read_file', 'run'])
+
+
+class OperationTests(unittest.TestCase):
+
+    def test_outermost_operation_wins(self):
+        with operation('read_file'):
+            with operation('run'):
+                self.assertEqual(metrics.current_operation(), 'read_file')
+            self.assertEqual(metrics.current_operation(), 'read_file')
+        self.assertIsNone(metrics.current_operation())
+
+    def test_operation_is_thread_local(self):
+        seen = []
+        with operation('run'):
+            thread = threading.Thread(target=lambda: seen.append(metrics.current_operation()))
+            thread.start()
+            thread.join()
+        self.assertEqual(seen, [None])
+
+
+class MetricsAggregatorTests(unittest.TestCase):
+
+    def execution(self, operation, duration, return_code=0):
+        execution = Execution('ls', operation)
+        execution.finished = execution.started + duration
+        execution.return_code = return_code
+        execution.bytes_out = 10
+        return execution
+
+    def test_report(self):
+        aggregator = MetricsAggregator()
+        for index in range(1, 101):
+            aggregator.finished(self.execution('run', index / 100.0, int(index % 10 == 0)))
+        aggregator.finished(self.execution('stop', 1))
+
+        report = aggregator.report()
+        self.assertEqual(report['run']['count'], 100)
+        self.assertEqual(report['run']['failures'], 10)
+        self.assertEqual(report['run']['bytes_out'], 1000)
+        self.assertAlmostEqual(report['run']['p50'], 0.5)
+        self.assertAlmostEqual(report['run']['p99'], 0.99)
+        self.assertEqual(report['stop']['count'], 1)
+
+        aggregator.reset()
+        self.assertEqual(aggregator.report(), {})
+
+    def test_max_samples(self):
+        aggregator = MetricsAggregator(max_samples=2)
+        for duration in [3, 1, 1]:
+            aggregator.finished(self.execution('run', duration))
+        self.assertEqual(aggregator.report()['run']['p99'], 1)
+        self.assertEqual(aggregator.report()['run']['count'], 3)
+
+    def test_percentile(self):
+        self.assertIsNone(percentile([], 50))
+        self.assertEqual(percentile([1], 1), 1)
+        self.assertEqual(percentile([1, 2, 3, 4], 50), 2)
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+import time
+import unittest
+
+from docker.errors import DockerUnavailableError
+from docker.pool import DockerPool, make_key
+from tests.utils import result
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+
+@mock.patch('docker.manager.Docker.stop', autospec=True, side_effect=lambda self: self)
+@mock.patch('docker.manager.Docker.start', autospec=True, side_effect=lambda self: self)
+class DockerPoolTests(unittest.TestCase):
+
+    def test_prestarts_containers(self, mock_start, mock_stop):
+        pool = DockerPool(size=2, background=False)
+        with pool.container(image='ubuntu') as docker:
+            self.assertEqual(docker.image, 'ubuntu')
+            self.assertEqual(list(pool.stats().values()), [{'idle': 2, 'total': 3}])
+        self.assertEqual(mock_start.call_count, 3)
+
+    @mock.patch('docker.manager.Docker.run', return_value=result(0))
+    def test_reset_and_reuse(self, mock_run, mock_start, mock_stop):
+        pool = DockerPool(size=0, reset_command='rm -rf ~/*', background=False)
+        with pool.container() as first:
+            pass
+        with pool.container() as second:
+            pass
+
+        self.assertIs(first, second)
+        mock_run.assert_has_calls([mock.call('rm -rf ~/*'), mock.call('rm -rf ~/*')])
+        self.assertEqual(mock_start.call_count, 1)
+        self.assertFalse(mock_stop.called)
+
+    @mock.patch('docker.manager.Docker.run', return_value=result(1))
+    def test_failed_reset_recycles(self, mock_run, mock_start, mock_stop):
+        pool = DockerPool(size=1, reset_command='false', background=False)
+        with pool.container() as first:
+            pass
+        with pool.container() as second:
+            pass
+
+        self.assertIsNot(first, second)
+        mock_stop.assert_has_calls([mock.call(first)])
+
+    def test_recycles_without_reset_command(self, mock_start, mock_stop):
+        pool = DockerPool(size=1, background=False)
+        with pool.container() as docker:
+            pass
+        mock_stop.assert_called_once_with(docker)
+        self.assertEqual(list(pool.stats().values()), [{'idle': 1, 'total': 1}])
+
+    def test_exception_discards_container(self, mock_start, mock_stop):
+        pool = DockerPool(size=0, reset_command='true', background=False)
+        with self.assertRaises(RuntimeError):
+            with pool.container() as docker:
+                raise RuntimeError('failed')
+        mock_stop.assert_called_once_with(docker)
+
+    def test_keys(self, mock_start, mock_stop):
+        pool = DockerPool(size=0, background=False)
+        with pool.container(image='ubuntu', env_variables={'CI': 1}):
+            pass
+        with pool.container(image='debian'):
+            pass
+        self.assertEqual(len(pool.stats()), 2)
+        self.assertEqual(make_key((), {'env_variables': {'B': 1, 'A': 2}, 'ports_mapping': ['1']}),
+                         ((), (('env_variables', (('A', 2), ('B', 1))), ('ports_mapping', ('1',)))))
+
+    def test_max_size(self, mock_start, mock_stop):
+        pool = DockerPool(size=0, max_size=1, background=False)
+        docker = pool.acquire()
+        self.assertRaises(DockerUnavailableError, pool.acquire, acquire_timeout=0.01)
+        pool.release(docker)
+        pool.release(pool.acquire(acquire_timeout=0.01))
+
+    def test_idle_eviction(self, mock_start, mock_stop):
+        pool = DockerPool(size=2, idle_timeout=0.01, background=False)
+        pool.release(pool.acquire(), discard=True)
+        time.sleep(0.02)
+        self.assertEqual(pool.evict_idle(), 2)
+        self.assertEqual(list(pool.stats().values()), [{'idle': 0, 'total': 0}])
+
+    def test_container_timeout_is_passed_through(self, mock_start, mock_stop):
+        pool = DockerPool(size=0, background=False)
+        with pool.container(image='ubuntu', timeout=600, acquire_timeout=1) as docker:
+            self.assertEqual(docker.timeout, 600)
+
+    def test_expired_containers_are_not_handed_out(self, mock_start, mock_stop):
+        pool = DockerPool(size=1, reset_command='true', background=False)
+        with mock.patch('docker.manager.Docker.run', return_value=result(0)):
+            first = pool.acquire(timeout=1)
+            pool.release(first)
+            time.sleep(0.95)
+            second = pool.acquire(timeout=1)
+        self.assertIsNot(second, first)
+        self.assertIn(mock.call(first), mock_stop.call_args_list)
+
+    def test_background_refill(self, mock_start, mock_stop):
+        pool = DockerPool(size=2)
+        pool.release(pool.acquire())
+        for _ in range(100):
+            if list(pool.stats().values()) == [{'idle': 2, 'total': 2}]:
+                break
+            time.sleep(0.01)
+        self.assertEqual(list(pool.stats().values()), [{'idle': 2, 'total': 2}])
+
+    def test_wrap_and_close(self, mock_start, mock_stop):
+        pool = DockerPool(size=1, background=False)
+
+        @pool.wrap(image='ubuntu')
+        def wrapped(test, docker):
+            test.assertEqual(docker.image, 'ubuntu')
+            return True
+
+        self.assertTrue(wrapped(self))
+        pool.close()
+        self.assertEqual(list(pool.stats().values()), [{'idle': 0, 'total': 0}])
+        self.assertRaises(DockerUnavailableError, pool.acquire)
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+import socket
+import subprocess
+import sys
+import time
+import unittest
+
+from docker import metrics, reaper
+from docker.errors import DockerWrapperBaseError
+from docker.manager import Docker
+from docker.reaper import Reaper, parse_created
+from tests.utils import result
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+
+def created(age):
+    return time.strftime('%Y-%m-%d %H:%M:%S +0000 UTC', time.gmtime(time.time() - age))
+
+
+class FakeContainers(object):
+    """
+    Emulates docker ps and docker rm with a dict of container ages and a dict of owner labels.
+    """
+
+    def __init__(self, containers):
+        self.containers = containers
+        self.owners = {}
+        self.commands = []
+
+    def __call__(self, command):
+        self.commands.append(command)
+        args = command.split()
+        if args[1] == 'ps':
+            return result(0, ''.join(
+                '{0} {1} {2}\n'.format(name, self.owners.get(name, ''), created(age))
+                for name, age in sorted(self.containers.items())
+            ))
+        if args[1] == 'rm':
+            removed = [name for name in args[3:] if self.containers.pop(name, None) is not None]
+            return result(0 if len(removed) == len(args[3:]) else 1,
+                          ''.join(name + '\n' for name in removed))
+        raise AssertionError(command)
+
+
+class ReapTests(unittest.TestCase):
+
+    def setUp(self):
+        self.fake = FakeContainers({
+            'dyn-old-1': 7200, 'dyn-old-2': 7200, 'dyn-old-3': 7200, 'dyn-new': 10,
+            'other-dyn-1': 7200,
+        })
+        patcher = mock.patch('docker.reaper.execute', side_effect=self.fake)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_parse_created(self):
+        self.assertEqual(parse_created('1970-01-01 02:00:00 +0200 CEST'), 0)
+        self.assertEqual(parse_created('1969-12-31 19:30:00 -0430 VET'), 0)
+
+    def test_reap_in_batches(self):
+        self.assertEqual(Docker.reap(older_than=0, batch_size=2),
+                         ['dyn-new', 'dyn-old-1', 'dyn-old-2', 'dyn-old-3'])
+        self.assertEqual(list(self.fake.containers), ['other-dyn-1'])
+        self.assertEqual([command.split()[1] for command in self.fake.commands],
+                         ['ps', 'rm', 'rm'])
+        self.assertEqual(metrics.gauges[reaper.LEAK_GAUGE], 4)
+
+    def test_reap_older_than(self):
+        self.assertEqual(Docker.reap(),
+                         ['dyn-old-1', 'dyn-old-2', 'dyn-old-3'])
+        self.assertEqual(sorted(self.fake.containers), ['dyn-new', 'other-dyn-1'])
+
+    def test_reap_by_owner(self):
+        process = subprocess.Popen([sys.executable, '-c', ''])
+        process.wait()
+        host = socket.gethostname()
+        self.fake.owners.update({
+            'dyn-new': '{0}:{1}'.format(host, process.pid),
+            'dyn-old-1': reaper.owner(),
+            'dyn-old-2': 'elsewhere:1',
+        })
+        self.assertEqual(Docker.reap(), ['dyn-new', 'dyn-old-2', 'dyn-old-3'])
+        self.assertEqual(sorted(self.fake.containers), ['dyn-old-1', 'other-dyn-1'])
+
+    def test_keeps_containers_of_this_process(self):
+        reaper.register('dyn-old-1')
+        self.addCleanup(reaper.unregister, 'dyn-old-1')
+        self.assertEqual(Docker.reap(older_than=0), ['dyn-new', 'dyn-old-2', 'dyn-old-3'])
+
+    def test_removed_concurrently(self):
+        original = self.fake.__call__
+
+        def remove_first(command):
+            if command.split()[1] == 'rm':
+                self.fake.containers.pop('dyn-new')
+            return original(command)
+
+        with mock.patch('docker.reaper.execute', side_effect=remove_first):
+            self.assertEqual(Docker.reap(older_than=0),
+                             ['dyn-old-1', 'dyn-old-2', 'dyn-old-3'])
+
+    def test_docker_ps_fails(self):
+        with mock.patch('docker.reaper.execute', return_value=result(1)):
+            self.assertRaises(DockerWrapperBaseError, Docker.reap)
+
+    @mock.patch('docker.manager.execute')
+    def test_registers_started_containers(self, mock_execute):
+        docker = Docker().start()
+        self.assertIn(docker.container_name, reaper.active)
+        docker.stop()
+        self.assertNotIn(docker.container_name, reaper.active)
+
+
+class ReaperTests(unittest.TestCase):
+
+    @mock.patch('docker.reaper.reap', return_value=['dyn-1', 'dyn-2'])
+    def test_background_reaps(self, mock_reap):
+        with Reaper(older_than=60, interval=0.01) as background:
+            for _ in range(500):
+                if mock_reap.call_count >= 2:
+                    break
+                time.sleep(0.01)
+        self.assertGreaterEqual(mock_reap.call_count, 2)
+        mock_reap.assert_called_with('dyn', 60, reaper.BATCH_SIZE)
+        self.assertEqual(background.reaped, 2 * mock_reap.call_count)
+
+    @mock.patch('docker.reaper.reap', side_effect=DockerWrapperBaseError('no docker'))
+    def test_errors_are_logged(self, mock_reap):
+        background = Reaper(interval=10).start()
+        for _ in range(500):
+            if mock_reap.called:
+                break
+            time.sleep(0.01)
+        background.stop()
+        self.assertTrue(mock_reap.called)
+        self.assertEqual(background.reaped, 0)
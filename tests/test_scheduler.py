@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+import unittest
+
+from docker.errors import DockerUnavailableError
+from docker.scheduler import PRIORITY, ResourceScheduler
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+
+class ResourceSchedulerTests(unittest.TestCase):
+
+    def setUp(self):
+        self.scheduler = ResourceScheduler(cpus=4, memory='4g')
+
+    def wait_until_queued(self, depth):
+        for _ in range(500):
+            if self.scheduler.queue_depth == depth:
+                return
+            time.sleep(0.01)
+        self.fail('The queue depth did not reach {0}'.format(depth))
+
+    def test_acquire_and_release(self):
+        first = self.scheduler.acquire(cpus=2, memory='1g')
+        second = self.scheduler.acquire(cpus=2, memory='3g')
+        stats = self.scheduler.stats()
+        self.assertEqual(stats['running'], 2)
+        self.assertEqual(stats['cpus_used'], 4)
+        self.assertEqual(stats['memory_used'], 4 * 1024 ** 3)
+        self.scheduler.release(first)
+        self.scheduler.release(second)
+        self.assertEqual(self.scheduler.stats()['cpus_used'], 0)
+
+    def test_defaults(self):
+        scheduler = ResourceScheduler(cpus=2, memory=100, default_cpus=0.5, default_memory=10)
+        reservation = scheduler.acquire()
+        self.assertEqual((reservation.cpus, reservation.memory), (0.5, 10))
+
+    def test_rejects_oversized_request(self):
+        self.assertRaises(DockerUnavailableError, self.scheduler.acquire, cpus=8)
+        self.assertRaises(DockerUnavailableError, self.scheduler.acquire, memory='8g')
+
+    def test_timeout(self):
+        self.scheduler.acquire(cpus=4)
+        self.assertRaises(DockerUnavailableError, self.scheduler.acquire, cpus=1, timeout=0.05)
+        self.assertEqual(self.scheduler.queue_depth, 0)
+
+    def test_waits_for_capacity(self):
+        reservation = self.scheduler.acquire(cpus=3)
+        admitted = []
+        thread = threading.Thread(target=lambda: admitted.append(self.scheduler.acquire(cpus=2)))
+        thread.start()
+        self.wait_until_queued(1)
+        self.assertEqual(admitted, [])
+
+        self.scheduler.release(reservation)
+        thread.join(5)
+        self.assertEqual(len(admitted), 1)
+        stats = self.scheduler.stats()
+        self.assertEqual((stats['queued'], stats['running']), (0, 1))
+        self.assertGreater(stats['wait_p99'], 0)
+
+    def test_head_of_line_is_not_overtaken(self):
+        reservation = self.scheduler.acquire(cpus=3)
+        order = []
+
+        def acquire(name, cpus):
+            self.scheduler.release(self.scheduler.acquire(cpus=cpus))
+            order.append(name)
+
+        large = threading.Thread(target=acquire, args=('large', 4))
+        large.start()
+        self.wait_until_queued(1)
+        small = threading.Thread(target=acquire, args=('small', 1))
+        small.start()
+        self.wait_until_queued(2)
+
+        self.scheduler.release(reservation)
+        large.join(5)
+        small.join(5)
+        self.assertEqual(order, ['large', 'small'])
+
+    def test_priority(self):
+        scheduler = ResourceScheduler(cpus=1, memory=0, policy=PRIORITY)
+        self.scheduler = scheduler
+        reservation = scheduler.acquire()
+        order = []
+
+        def acquire(priority):
+            scheduler.release(scheduler.acquire(priority=priority))
+            order.append(priority)
+
+        threads = []
+        for priority in [0, 2, 1]:
+            threads.append(threading.Thread(target=acquire, args=(priority,)))
+            threads[-1].start()
+            self.wait_until_queued(len(threads))
+
+        scheduler.release(reservation)
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(order, [2, 1, 0])
+
+    def test_unknown_policy(self):
+        self.assertRaises(ValueError, ResourceScheduler, policy='random')
+
+    @mock.patch('docker.manager.Docker.stop')
+    @mock.patch('docker.manager.Docker.start')
+    def test_container(self, mock_start, mock_stop):
+        with self.scheduler.container(image='busybox', cpus=2, memory='1g', priority=1) as docker:
+            self.assertIs(docker, mock_start.return_value)
+            self.assertEqual(self.scheduler.stats()['cpus_used'], 2)
+
+        mock_start.assert_called_once_with()
+        mock_stop.assert_called_once_with()
+        self.assertEqual(self.scheduler.stats()['running'], 0)
+
+    @mock.patch('docker.manager.Docker.stop')
+    @mock.patch('docker.manager.Docker.start', autospec=True, side_effect=lambda self: self)
+    def test_container_timeouts(self, mock_start, mock_stop):
+        with self.scheduler.container(cpus=1, timeout=600, wait_timeout=1) as docker:
+            self.assertEqual(docker.timeout, 600)
+
+        self.scheduler.acquire(cpus=4)
+        with self.assertRaises(DockerUnavailableError):
+            with self.scheduler.container(cpus=1, wait_timeout=0.05):
+                pass
+        self.assertEqual(mock_start.call_count, 1)
+
+    @mock.patch('docker.manager.Docker.stop')
+    @mock.patch('docker.manager.Docker.start')
+    def test_container_start_failure(self, mock_start, mock_stop):
+        mock_start.side_effect = DockerUnavailableError('no docker')
+        with self.assertRaises(DockerUnavailableError):
+            with self.scheduler.container(cpus=1):
+                pass
+        self.assertEqual(self.scheduler.stats()['running'], 0)
+        self.assertFalse(mock_stop.called)
+
+    @mock.patch('docker.manager.Docker.stop')
+    @mock.patch('docker.manager.Docker.start')
+    def test_wrap(self, mock_start, mock_stop):
+        @self.scheduler.wrap(cpus=1)
+        def wrapped(docker):
+            return self.scheduler.stats()['running']
+
+        self.assertEqual(wrapped(), 1)
+        mock_start.assert_called_once_with()
+        mock_stop.assert_called_once_with()
+        self.assertEqual(self.scheduler.stats()['running'], 0)
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from docker.errors import DockerSessionError
+from docker.helpers import ProcessResult
+from docker.manager import Docker
+from docker.session import ShellSession, frame_command
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+
+class FrameCommandTests(unittest.TestCase):
+
+    def test_frame_without_stdin(self):
+        frame = frame_command('ls', 'TOKEN')
+        self.assertTrue(frame.startswith(
+            '( eval "$(printf %s bHM= | base64 -d)"\n) < /dev/null; __docker_wrapper_rc=$?;'
+        ))
+        self.assertIn('printf "%s %d\\n" TOKEN $__docker_wrapper_rc', frame)
+        self.assertIn('printf "%s\\n" TOKEN >&2', frame)
+
+    def test_frame_with_stdin(self):
+        frame = frame_command('cat', 'TOKEN', 'hi')
+        self.assertTrue(frame.startswith(
+            'printf %s aGk= | base64 -d | ( eval "$(printf %s Y2F0 | base64 -d)"\n);'
+        ))
+
+
+class ShellSessionTests(unittest.TestCase):
+    """
+    These tests run the session against a local bash, thus they do not need docker.
+    """
+
+    def setUp(self):
+        self.session = ShellSession(['bash']).open()
+
+    def tearDown(self):
+        self.session.close()
+
+    def test_execute(self):
+        result = self.session.execute('echo hi && echo there >&2')
+        self.assertEqual(result.out, 'hi\n')
+        self.assertEqual(result.err, 'there\n')
+        self.assertEqual(result.return_code, 0)
+        self.assertTrue(result.succeeded)
+
+    def test_return_code(self):
+        self.assertEqual(self.session.execute('exit 4').return_code, 4)
+        self.assertEqual(self.session.execute('true').return_code, 0)
+
+    def test_output_without_newline(self):
+        self.assertEqual(self.session.execute('printf hi').out, 'hi')
+
+    def test_stdin(self):
+        content = 'this is a \'quoted\' "file"\n'
+        self.assertEqual(self.session.execute('cat', stdin=content).out, content)
+
+    def test_commands_does_not_read_session_stdin(self):
+        self.assertEqual(self.session.execute('cat').out, '')
+        self.assertEqual(self.session.execute('echo after').out, 'after\n')
+
+    def test_state_does_not_leak(self):
+        self.session.execute('cd / && FOO=bar')
+        self.assertEqual(self.session.execute('echo $FOO').out, '\n')
+
+    def test_malformed_command(self):
+        for command in ["echo it's", 'if true; then echo']:
+            result = self.session.execute(command)
+            self.assertEqual(result.return_code, 2)
+            self.assertIn('eval', result.err)
+        self.assertEqual(self.session.execute('echo \\').out, '\\\n')
+        self.assertEqual(self.session.execute('echo alive').out, 'alive\n')
+
+    def test_recovers_after_shell_died(self):
+        self.assertRaises(DockerSessionError, self.session.execute, 'kill -9 $$')
+        self.assertFalse(self.session.alive)
+        self.assertEqual(self.session.execute('echo alive').out, 'alive\n')
+
+
+class DockerSessionTests(unittest.TestCase):
+
+    @mock.patch('docker.manager.execute')
+    @mock.patch('docker.session.ShellSession.execute', return_value=ProcessResult('ls'))
+    def test_run_uses_session(self, mock_session_execute, mock_execute):
+        docker = Docker(session=True, env_variables={'CI': 1})
+        docker.run("echo 'hi'", login=True)
+        mock_session_execute.assert_called_once_with('cd ~/ && CI=1 echo \'hi\'', '')
+        self.assertFalse(mock_execute.called)
+        self.assertEqual(docker._sessions[True].args[-1], '--login')
+
+    @mock.patch('docker.manager.execute')
+    @mock.patch('docker.session.ShellSession.execute')
+    def test_tty_does_not_use_session(self, mock_session_execute, mock_execute):
+        docker = Docker(session=True)
+        docker.run('ls', tty=True)
+        self.assertFalse(mock_session_execute.called)
+        self.assertTrue(mock_execute.called)
+
+    @mock.patch('docker.manager.execute')
+    @mock.patch('docker.session.ShellSession.close')
+    def test_stop_closes_sessions(self, mock_close, mock_execute):
+        docker = Docker(session=True)
+        docker._get_session(False)
+        docker.stop()
+        mock_close.assert_called_once_with()
+        self.assertEqual(docker._sessions, {})
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from docker.errors import DockerWrapperBaseError
+from docker.manager import Docker
+from docker.snapshots import SnapshotCache
+from tests.utils import result
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+
+class FakeImages(object):
+    """
+    Emulates docker commit, docker image inspect and docker rmi with a dict of image sizes.
+    """
+
+    def __init__(self, size=100):
+        self.size = size
+        self.images = {}
+
+    def __call__(self, command):
+        args = command.split()
+        if args[1] == 'commit':
+            self.images[args[3]] = self.size
+            return result(0)
+        if args[1] == 'image':
+            if args[-1] in self.images:
+                return result(0, '{0}\n'.format(self.images[args[-1]]))
+            return result(1)
+        if args[1] == 'rmi':
+            return result(0 if self.images.pop(args[2], None) else 1)
+        raise AssertionError(command)
+
+
+class SnapshotCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.images = FakeImages()
+        patcher = mock.patch('docker.snapshots.execute', side_effect=self.images)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_key(self):
+        key = SnapshotCache.key('ubuntu', ['apt-get update', 'make'])
+        self.assertEqual(len(key), 32)
+        self.assertEqual(key, SnapshotCache.key('ubuntu', ['apt-get update', 'make']))
+        self.assertNotEqual(key, SnapshotCache.key('debian', ['apt-get update', 'make']))
+        self.assertNotEqual(key, SnapshotCache.key('ubuntu', ['apt-get update make']))
+        self.assertNotEqual(key, SnapshotCache.key('ubuntu', ['apt-get update', 'make'], '~/src'))
+        self.assertNotEqual(key, SnapshotCache.key('ubuntu', ['apt-get update', 'make'],
+                                                   env_variables={'DEBUG': '1'}))
+
+    def test_commit_and_get(self):
+        cache = SnapshotCache()
+        self.assertIsNone(cache.get('key'))
+        self.assertEqual(cache.commit(Docker(), 'key'), 'docker-wrapper-snapshot:key')
+        self.assertEqual(cache.get('key'), 'docker-wrapper-snapshot:key')
+        self.assertEqual(cache.stats(), {'hits': 1, 'misses': 1, 'hit_rate': 0.5, 'images': 1,
+                                         'size': 100})
+
+    def test_finds_images_of_earlier_processes(self):
+        self.images.images['docker-wrapper-snapshot:key'] = 50
+        cache = SnapshotCache()
+        self.assertEqual(cache.get('key'), 'docker-wrapper-snapshot:key')
+        self.assertEqual(cache.stats()['size'], 50)
+
+    def test_lru_eviction(self):
+        cache = SnapshotCache(max_images=2)
+        for key in ['first', 'second']:
+            cache.commit(Docker(), key)
+        cache.get('first')
+        cache.commit(Docker(), 'third')
+        self.assertEqual(sorted(self.images.images), ['docker-wrapper-snapshot:first',
+                                                      'docker-wrapper-snapshot:third'])
+
+    def test_size_eviction(self):
+        cache = SnapshotCache(max_size=250)
+        for key in ['first', 'second', 'third']:
+            cache.commit(Docker(), key)
+        self.assertEqual(cache.stats()['images'], 2)
+        cache.clear()
+        self.assertEqual(self.images.images, {})
+
+    def test_keeps_the_image_in_use(self):
+        cache = SnapshotCache(max_size=50)
+        self.assertEqual(cache.commit(Docker(), 'first'), 'docker-wrapper-snapshot:first')
+        self.assertEqual(list(self.images.images), ['docker-wrapper-snapshot:first'])
+        cache.commit(Docker(), 'second')
+        self.assertEqual(list(self.images.images), ['docker-wrapper-snapshot:second'])
+
+        self.images.images['docker-wrapper-snapshot:third'] = 100
+        self.assertEqual(cache.get('third'), 'docker-wrapper-snapshot:third')
+        self.assertEqual(list(self.images.images), ['docker-wrapper-snapshot:third'])
+
+    def test_failed_commit(self):
+        with mock.patch('docker.snapshots.execute', return_value=result(1)):
+            self.assertRaises(DockerWrapperBaseError, SnapshotCache().commit, Docker(), 'key')
+
+
+@mock.patch('docker.manager.Docker._remove')
+@mock.patch('docker.manager.Docker.start', autospec=True)
+class DockerCachedSetupTests(unittest.TestCase):
+
+    def setUp(self):
+        self.images = FakeImages()
+        patcher = mock.patch('docker.snapshots.execute', side_effect=self.images)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.cache = SnapshotCache()
+
+    @mock.patch('docker.manager.Docker.run', return_value=result(0))
+    def test_miss_then_hit(self, mock_run, mock_start, mock_remove):
+        first = Docker()
+        first.running = True
+        self.assertFalse(first.cached_setup(['apt-get update', 'make'], cache=self.cache))
+        mock_run.assert_has_calls([mock.call('apt-get update', ''), mock.call('make', '')])
+        self.assertTrue(first.image.startswith('docker-wrapper-snapshot:'))
+        self.assertFalse(mock_start.called)
+
+        second = Docker()
+        second.running = True
+        self.assertTrue(second.cached_setup(['apt-get update', 'make'], cache=self.cache))
+        self.assertEqual(second.image, first.image)
+        mock_remove.assert_called_once_with()
+        mock_start.assert_called_once_with(second)
+        self.assertEqual(mock_run.call_count, 2)
+        self.assertEqual(self.cache.stats()['hit_rate'], 0.5)
+
+    @mock.patch('docker.manager.Docker.run', return_value=result(0))
+    def test_working_directory_and_env_variables_are_keyed(self, mock_run, mock_start,
+                                                           mock_remove):
+        docker = Docker()
+        docker.running = True
+        self.assertFalse(docker.cached_setup(['make'], cache=self.cache))
+        self.assertFalse(Docker().cached_setup(['make'], 'src', cache=self.cache))
+        self.assertFalse(Docker(env_variables={'DEBUG': '1'}).cached_setup(['make'],
+                                                                           cache=self.cache))
+        self.assertTrue(Docker().cached_setup(['make'], '~/', cache=self.cache))
+        self.assertEqual(len(self.images.images), 3)
+
+    @mock.patch('docker.manager.Docker.run', return_value=result(2))
+    def test_failed_setup_is_not_committed(self, mock_run, mock_start, mock_remove):
+        docker = Docker()
+        self.assertRaises(DockerWrapperBaseError, docker.cached_setup, ['false'],
+                          cache=self.cache)
+        mock_start.assert_called_once_with(docker)
+        self.assertEqual(docker.image, 'ubuntu')
+        self.assertEqual(self.images.images, {})
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+import threading
+import unittest
+
+from docker.manager import Docker
+from docker.teardown import TeardownWorker
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+
+class TeardownWorkerTests(unittest.TestCase):
+
+    def test_schedule_and_flush(self):
+        worker = TeardownWorker()
+        done = []
+        worker.schedule(done.append, 1)
+        worker.schedule(done.append, 2)
+        self.assertTrue(worker.flush())
+        self.assertEqual(done, [1, 2])
+        self.assertEqual(worker.pending, 0)
+
+    def test_flush_timeout(self):
+        worker = TeardownWorker()
+        event = threading.Event()
+        worker.schedule(event.wait)
+        self.assertFalse(worker.flush(timeout=0.01))
+        self.assertEqual(worker.pending, 1)
+        event.set()
+        self.assertTrue(worker.flush())
+
+    def test_failing_task(self):
+        worker = TeardownWorker()
+        done = []
+        worker.schedule(lambda: 1 / 0)
+        worker.schedule(done.append, 1)
+        self.assertTrue(worker.flush())
+        self.assertEqual(done, [1])
+
+
+class DockerStopTests(unittest.TestCase):
+
+    @mock.patch('docker.manager.execute')
+    def test_stop(self, mock_execute):
+        docker = Docker()
+        docker.stop()
+        mock_execute.assert_called_once_with('docker rm -f {0}'.format(docker.container_name))
+
+    @mock.patch('docker.manager.teardown.schedule')
+    @mock.patch('docker.manager.execute')
+    def test_deferred_stop(self, mock_execute, mock_schedule):
+        docker = Docker(deferred_stop=True)
+        docker.stop()
+        self.assertFalse(mock_execute.called)
+        mock_schedule.assert_called_once_with(docker._remove)
+
+        docker.stop(wait=True)
+        mock_execute.assert_called_once_with('docker rm -f {0}'.format(docker.container_name))
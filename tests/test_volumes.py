@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from docker.errors import DockerWrapperBaseError
+from docker.manager import Docker
+from docker.volumes import VolumeCache, parse_size
+from tests.utils import result
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+
+def human_size(size):
+    for unit in ('B', 'kB', 'MB'):
+        if size < 1000:
+            return '{0:.4g}{1}'.format(size, unit)
+        size /= 1000.0
+    return '{0:.4g}GB'.format(size)
+
+
+class FakeVolumes(object):
+    """
+    Emulates docker system df and docker volume rm with a dict of volume sizes and users. The
+    sizes are printed like docker does, e.g. 1.5kB.
+    """
+
+    def __init__(self):
+        self.volumes = {}
+
+    def __call__(self, command):
+        args = command.split()
+        if args[1] == 'system':
+            return result(0, json.dumps([
+                {'Driver': 'local', 'Links': str(users), 'Name': name, 'Size': human_size(size)}
+                for name, (size, users) in sorted(self.volumes.items())
+            ]))
+        if args[1] == 'volume':
+            volume = self.volumes.get(args[3])
+            if volume is None or volume[1]:
+                return result(1)
+            del self.volumes[args[3]]
+            return result(0)
+        raise AssertionError(command)
+
+
+class VolumeCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.lockfile = os.path.join(self.directory, 'requirements.txt')
+        with open(self.lockfile, 'w') as file_object:
+            file_object.write('six==1.16.0\n')
+
+        self.fake = FakeVolumes()
+        patcher = mock.patch('docker.volumes.execute', side_effect=self.fake)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_key(self):
+        key = VolumeCache.key('ubuntu', '/root/.cache/pip', [self.lockfile])
+        self.assertEqual(len(key), 32)
+        self.assertEqual(key, VolumeCache.key('ubuntu', '/root/.cache/pip', [self.lockfile]))
+        self.assertNotEqual(key, VolumeCache.key('debian', '/root/.cache/pip', [self.lockfile]))
+        self.assertNotEqual(key, VolumeCache.key('ubuntu', '/root/.npm', [self.lockfile]))
+
+        with open(self.lockfile, 'w') as file_object:
+            file_object.write('six==1.17.0\n')
+        self.assertNotEqual(key, VolumeCache.key('ubuntu', '/root/.cache/pip', [self.lockfile]))
+
+    def test_mount(self):
+        cache = VolumeCache(prefix='deps')
+        self.assertEqual(
+            cache.mount('ubuntu', '/root/.npm'),
+            'deps-{0}:/root/.npm'.format(VolumeCache.key('ubuntu', '/root/.npm'))
+        )
+
+    def test_list_only_cache_volumes(self):
+        self.fake.volumes = {'cache-a': (10, 0), 'cache-b': (20, 1), 'other': (5, 0)}
+        volumes = VolumeCache(prefix='cache').list()
+        self.assertEqual(
+            [(volume['name'], volume['size'], volume['containers']) for volume in volumes],
+            [('cache-a', 10, 0), ('cache-b', 20, 1)]
+        )
+
+    def test_list_sizes(self):
+        self.fake.volumes = {'cache-a': (1500, 2), 'cache-b': (2 * 10 ** 9, 0)}
+        volumes = VolumeCache(prefix='cache').list()
+        self.assertEqual([(volume['size'], volume['containers']) for volume in volumes],
+                         [(1500, 2), (2 * 10 ** 9, 0)])
+
+    def test_parse_size(self):
+        self.assertEqual(parse_size('0B'), 0)
+        self.assertEqual(parse_size('512B'), 512)
+        self.assertEqual(parse_size('1.234MB'), 1234000)
+        self.assertEqual(parse_size('3.5GB'), 3500000000)
+        self.assertEqual(parse_size('N/A'), 0)
+
+    def test_list_fails(self):
+        with mock.patch('docker.volumes.execute', return_value=result(1)):
+            self.assertRaises(DockerWrapperBaseError, VolumeCache().list)
+
+    def test_evict_by_size(self):
+        self.fake.volumes = {'cache-a': (60, 0), 'cache-b': (60, 0), 'cache-c': (60, 0)}
+        cache = VolumeCache(prefix='cache', max_size=100)
+        cache._used.update({'cache-a': 3, 'cache-b': 1, 'cache-c': 2})
+        self.assertEqual(cache.evict(), ['cache-b', 'cache-c'])
+        self.assertEqual(sorted(self.fake.volumes), ['cache-a'])
+
+    def test_evict_skips_mounted_volumes(self):
+        self.fake.volumes = {'cache-a': (10, 1), 'cache-b': (10, 0), 'cache-c': (10, 0)}
+        cache = VolumeCache(prefix='cache', max_volumes=1)
+        self.assertEqual(cache.evict(), ['cache-b', 'cache-c'])
+        self.assertEqual(sorted(self.fake.volumes), ['cache-a'])
+
+    def test_evict_without_limits(self):
+        self.fake.volumes = {'cache-a': (10, 0)}
+        self.assertEqual(VolumeCache(prefix='cache').evict(), [])
+        self.assertEqual(sorted(self.fake.volumes), ['cache-a'])
+
+
+class DockerVolumeTests(unittest.TestCase):
+
+    def test_mounts(self):
+        cache = VolumeCache(prefix='deps')
+        docker = Docker(
+            image='python', volumes=['/data:/data:ro'], tmpfs=['/tmp:size=64m'],
+            cache_volumes={'/root/.cache/pip': []}, volume_cache=cache
+        )
+        volume = cache.mount('python', '/root/.cache/pip')
+        self.assertIn(
+            '-v /data:/data:ro -v {0} --tmpfs /tmp:size=64m --label'.format(volume),
+            docker._get_start_command()
+        )
+
+        docker.argv = True
+        self.assertEqual(
+            docker._get_start_command()[3:9],
+            ['-v', '/data:/data:ro', '-v', volume, '--tmpfs', '/tmp:size=64m']
+        )
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+import shutil
+import tempfile
+
+from docker.helpers import ProcessResult
+from docker.manager import Docker
+
+
+def result(return_code=0, out='', err=''):
+    """
+    Makes the result of a docker command, for mocks of execute.
+
+    :rtype: docker.helpers.ProcessResult
+    """
+    process_result = ProcessResult('docker')
+    process_result.return_code = return_code
+    process_result.out = out
+    process_result.err = err
+    return process_result
+
+
+class LocalDocker(Docker):
+    """
+    A docker manager that runs the commands with the local bash in a temporary home directory
+    instead of in a container. It is used to test the commands built by the manager without
+    docker.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(LocalDocker, self).__init__(*args, **kwargs)
+        self.home = tempfile.mkdtemp()
+
+    def cleanup(self):
+        shutil.rmtree(self.home)
+
+    def _get_shell_command(self, login=False, tty=False, timeout=None):
+        return 'HOME={0} {1}bash'.format(self.home, self._get_timeout_prefix(timeout))
+
+    def _get_shell_args(self, login=False, tty=False, timeout=None):
+        environment = ['{0}={1}'.format(key, value) for key, value in self.env_variables.items()]
+        return (['env', 'HOME={0}'.format(self.home)] + environment +
+                self._get_timeout_args(timeout) + ['bash'])